@@ -0,0 +1,607 @@
+"""
+Micro-benchmarks for the validation pipeline.
+
+Usage:
+    python benchmark.py entities [--sample PATH] [--repeat N] [--scale N]
+    python benchmark.py entity-scaling [--sizes 1,5,10,25,50] [--repeat N]
+    python benchmark.py stages [--documents N] [--size-kb N] [--error-rate F] ...
+                               [--output results.json] [--compare baseline.json]
+    python benchmark.py startup [--repeat N]
+    python benchmark.py entity-tables [--repeat N]
+    python benchmark.py tag-rules [--sizes 3,30,300] [--repeat N]
+    python benchmark.py classify [--repeat N] [--scale N]
+    python benchmark.py incremental [--pages N] [--repeat N]
+    python benchmark.py lint [--documents N] [--size-kb N] [--invalid-entity-ratio F] ...
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from lxml import etree
+from parser import (
+    ENTITY_TO_NUMERIC, replace_entities_with_numeric, preprocess_file_content,
+    sanitize_unescaped_ampersands, preprocess, parse_xml,
+)
+from entity_checker import check_entities
+from tag_checker import validate_tags
+from validator import validate_file, print_error_report
+from synthetic_corpus import write_corpus, add_generator_arguments, generator_params
+from config import CUSTOM_ENTITIES
+
+SAMPLES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Samples")
+DEFAULT_SAMPLE = os.path.join(SAMPLES_FOLDER, "23-4031.FNT")
+
+
+def _best_of(func, repeat):
+    """Returns the fastest of `repeat` timings of func() in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# ========== ENTITY SUBSTITUTION ==========
+def _legacy_replace_entities(xml_str):
+    """The original one-str.replace-per-entity loop, kept for comparison."""
+    for entity, numeric in ENTITY_TO_NUMERIC.items():
+        xml_str = xml_str.replace(f"&{entity};", numeric)
+    return xml_str
+
+
+def bench_entities(sample_path=DEFAULT_SAMPLE, repeat=5, scale=1):
+    """Compares the legacy replace loop against the single-pass substitution."""
+    with open(sample_path, 'r', encoding='utf-8') as f:
+        content = f.read() * scale
+
+    # Same table on both sides so the outputs must agree
+    expected = _legacy_replace_entities(content)
+    actual = replace_entities_with_numeric(content, ENTITY_TO_NUMERIC)
+    if expected != actual:
+        raise AssertionError("single-pass substitution differs from the legacy loop")
+
+    legacy = _best_of(lambda: _legacy_replace_entities(content), repeat)
+    single = _best_of(lambda: replace_entities_with_numeric(content), repeat)
+
+    print(f"\n📏 Entity substitution on {os.path.basename(sample_path)} "
+          f"({len(content) / 1024:.0f} KiB, best of {repeat})")
+    print(f"  legacy loop   : {legacy * 1000:9.2f} ms")
+    print(f"  single pass   : {single * 1000:9.2f} ms")
+    print(f"  speedup       : {legacy / single:9.1f}x")
+    return {"legacy_s": legacy, "single_pass_s": single}
+
+
+# ========== ENTITY CHECKER SCALING ==========
+ONE_LINE_FRAGMENT = (
+    '<EM>Smith</EM> &mdash; <A href="x&amp;y">ref</A> &sect; 12 '
+    '<EMB>&Aacute;lvarez</EMB> &bogus; <SUP>1</SUP> &amp; '
+)
+
+
+def make_one_line_document(size_mb):
+    """Builds a single-line export of roughly size_mb megabytes."""
+    repeat = (size_mb * 1024 * 1024) // len(ONE_LINE_FRAGMENT) + 1
+    return ONE_LINE_FRAGMENT * repeat
+
+
+def bench_entity_scaling(sizes_mb=(1, 5, 10, 25, 50), repeat=3):
+    """Times check_entities on one-line documents to show linear scaling."""
+    print(f"\n📏 check_entities on single-line documents (best of {repeat})")
+    print(f"  {'size':>8} {'time':>10} {'MB/s':>8} {'errors':>9}")
+    rows = []
+    for size_mb in sizes_mb:
+        content = make_one_line_document(size_mb)
+        errors = check_entities(content, CUSTOM_ENTITIES)
+        elapsed = _best_of(lambda: check_entities(content, CUSTOM_ENTITIES), repeat)
+        rows.append({"size_mb": size_mb, "seconds": elapsed, "errors": len(errors)})
+        print(f"  {size_mb:>6}MB {elapsed:>9.3f}s {size_mb / elapsed:>8.1f} {len(errors):>9}")
+
+    # Linear scaling keeps throughput flat; report the spread
+    rates = [row["size_mb"] / row["seconds"] for row in rows]
+    print(f"  throughput spread: {max(rates) / min(rates):.2f}x (1.0 = perfectly linear)")
+    return rows
+
+
+# ========== PIPELINE STAGES ==========
+PIPELINE_STAGES = (
+    "preprocess_file_content",
+    "sanitize_unescaped_ampersands",
+    "replace_entities_with_numeric",
+    "preprocess_single_pass",
+    "lxml_parse",
+    "check_entities",
+    "validate_tags",
+    "reporting",
+)
+
+
+def _time_stage(func, repeat):
+    """Returns (best seconds, value of the last call)."""
+    best = float("inf")
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def time_pipeline_stages(file_path, repeat=3):
+    """Times every pipeline stage on one file; returns {stage: seconds}."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    timings = {}
+
+    timings["preprocess_file_content"], cleaned = _time_stage(
+        lambda: preprocess_file_content(content), repeat)
+    timings["sanitize_unescaped_ampersands"], sanitized = _time_stage(
+        lambda: sanitize_unescaped_ampersands(cleaned), repeat)
+    timings["replace_entities_with_numeric"], _ = _time_stage(
+        lambda: replace_entities_with_numeric(sanitized), repeat)
+    timings["preprocess_single_pass"], preprocessed = _time_stage(
+        lambda: preprocess(content), repeat)
+    timings["lxml_parse"], _ = _time_stage(
+        lambda: parse_xml(content, preprocessed), repeat)
+    timings["check_entities"], _ = _time_stage(
+        lambda: check_entities(content, CUSTOM_ENTITIES), repeat)
+
+    # Recovered tree, so documents with syntax errors still exercise the tag rules
+    tree, _, _ = parse_xml(content, preprocessed, recover=True)
+    timings["validate_tags"], _ = _time_stage(lambda: validate_tags(tree), repeat)
+
+    results = {os.path.basename(file_path): validate_file(file_path, streaming_threshold=None)}
+
+    def report():
+        with contextlib.redirect_stdout(io.StringIO()):
+            print_error_report(results)
+    timings["reporting"], _ = _time_stage(report, repeat)
+    return timings
+
+
+def bench_stages(documents=5, repeat=3, output=None, **params):
+    """
+    Generates a synthetic corpus, times each stage over it and returns a
+    JSON-serialisable result; writes it to `output` when given.
+    """
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        paths = write_corpus(corpus_dir, documents, **dict(params))
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+        totals = dict.fromkeys(PIPELINE_STAGES, 0.0)
+        for path in paths:
+            for stage, seconds in time_pipeline_stages(path, repeat).items():
+                totals[stage] += seconds
+
+    total_mb = total_bytes / (1024 * 1024)
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "lxml": ".".join(map(str, etree.LXML_VERSION)),
+        "params": dict(params, documents=documents, repeat=repeat),
+        "total_bytes": total_bytes,
+        "stages": {
+            stage: {"seconds": seconds, "mb_per_s": total_mb / seconds if seconds else None}
+            for stage, seconds in totals.items()
+        },
+    }
+
+    print(f"\n📏 Pipeline stages over {documents} synthetic documents "
+          f"({total_mb:.1f} MB, best of {repeat})")
+    for stage, row in result["stages"].items():
+        print(f"  {stage:<32} {row['seconds'] * 1000:10.2f} ms")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"  results written to {output}")
+    return result
+
+
+def compare_results(baseline, current, tolerance=0.10):
+    """Prints per-stage ratios and returns the stages slower than baseline by > tolerance."""
+    regressions = []
+    print(f"\n📊 Comparison against baseline from {baseline.get('created', '?')}")
+    if baseline.get("params") != current.get("params"):
+        print("  ⚠ generator parameters differ; ratios are not comparable")
+    for stage, row in current["stages"].items():
+        old = baseline["stages"].get(stage)
+        if not old or not old["seconds"]:
+            print(f"  {stage:<32} (new stage)")
+            continue
+        ratio = row["seconds"] / old["seconds"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  ❌ regression"
+            regressions.append(stage)
+        print(f"  {stage:<32} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+# ========== INCREMENTAL REVALIDATION ==========
+def bench_incremental(pages=1500, repeat=5, seed=0):
+    """
+    Builds a synthetic volume of about `pages` pages, then times a full
+    validate_content run against IncrementalValidator: first validation,
+    revalidating the whole text after editing one page, and replace_page.
+    """
+    from synthetic_corpus import generate_document, LINES_PER_PAGE
+    from page_validator import IncrementalValidator, split_pages
+    from validator import validate_content
+
+    # generate_document sizes by kilobytes: ~130 bytes per line with footnotes
+    content = generate_document(size_kb=pages * LINES_PER_PAGE * 130 // 1024, seed=seed)
+    segments = split_pages(content)
+    middle = len(segments) // 2
+    edited_page = segments[middle].replace("\n", " &bogus; <EM>edit</EM>\n", 1)
+    edited = "".join(segments[:middle] + [edited_page] + segments[middle + 1:])
+
+    full_s = _best_of(lambda: validate_content(content, "volume", recover=True), repeat)
+    validator = IncrementalValidator("volume")
+    first_s = _best_of(lambda: IncrementalValidator("volume").validate(content), repeat)
+    validator.validate(content)
+
+    def revalidate():
+        validator.validate(content)
+        validator.validate(edited)
+    # Each call validates the edit and then undoes it: halve for one edit
+    revalidate_s = _best_of(revalidate, repeat) / 2
+    rescanned, rechecked, reparsed = validator.rescanned, validator.rechecked, validator.reparsed
+
+    def replace():
+        validator.replace_page(middle, segments[middle])
+        validator.replace_page(middle, edited_page)
+    replace_s = _best_of(replace, repeat) / 2
+
+    print(f"\n📄 Incremental revalidation ({len(segments)} pages, "
+          f"{len(content) / 1024 / 1024:.1f} MB, best of {repeat})")
+    print(f"  validate_content (full)       {full_s * 1000:9.2f} ms")
+    print(f"  IncrementalValidator, first   {first_s * 1000:9.2f} ms")
+    print(f"  revalidate after 1-page edit  {revalidate_s * 1000:9.2f} ms"
+          f"  ({rescanned} scanned, {rechecked} rechecked{', reparsed' if reparsed else ''})")
+    print(f"  replace_page                  {replace_s * 1000:9.2f} ms")
+    return {"pages": len(segments), "full_s": full_s, "first_s": first_s,
+            "revalidate_s": revalidate_s, "replace_page_s": replace_s}
+
+
+# ========== ERROR CLASSIFICATION ==========
+# (document or message, expected category). Documents are parsed and their
+# first libxml2 error classified; plain messages come from the checkers.
+CLASSIFIER_CORPUS = [
+    ("<root>a &bogus; b</root>", "Repent"),
+    ("<root>a & b</root>", "Repent"),
+    ("<root>a &amp b</root>", "Repent"),
+    ("<root>&#0;</root>", "Repent"),
+    ('<root><a b="<">x</a></root>', "Repent"),
+    ("<root><a></b></root>", "Reptag"),
+    ("<root><salt></b></root>", "Reptag"),
+    ("<root><length>", "Reptag"),
+    ("<root><example b='1'</root>", "CheckSGM"),
+    ("<root>a < b</root>", "Reptag"),
+    ("<root><a>x</a </root>", "Reptag"),
+    ("<root><a b>x</a></root>", "CheckSGM"),
+    ('<root><a b="1" b="2">x</a></root>', "CheckSGM"),
+    ("<root>\x01</root>", "CheckSGM"),
+    ("<root/><x/>", "CheckSGM"),
+    ("<root><!-- a -- b --></root>", "CheckSGM"),
+    ("<root><![CDATA[x</root>", "CheckSGM"),
+    ("<root><?xml version='1.0'?></root>", "CheckSGM"),
+    ("<root><p:alt/></root>", "CheckSGM"),
+]
+CHECKER_CORPUS = [
+    ("Invalid entity '&bogus;'", "Repent"),
+    ("Invalid entity '&ampx;'", "Repent"),
+    ("<EM> must be inside <FN> tags (found outside)", "Reptag"),
+    ("Only <fnt*> tags allowed inside <FN>, found <salt>", "Reptag"),
+    ("<FN> contains invalid child elements", "Reptag"),
+    ("<fnt> is a non-closing tag (do not use </fnt>)", "Reptag"),
+    ("Invalid UTF-8 byte 0xE9; file decoded as cp1252", "CheckSGM"),
+    ("Unexpected error: default handler failed", "CheckSGM"),
+]
+
+
+def _legacy_classify_syntax(msg):
+    """The keyword scan parse_xml used before error_classifier, kept for comparison."""
+    lower_msg = msg.lower()
+    if any(x in lower_msg for x in [
+        "xmlparseentityref", "unescaped", "no name", "amp", "lt", "gt", "semicolon"
+    ]):
+        return "Repent"
+    if "tag mismatch" in lower_msg or "misnested" in lower_msg or "start tag" in lower_msg:
+        return "Reptag"
+    return "CheckSGM"
+
+
+def _legacy_classify_message(msg):
+    """The keyword scan categorize_errors used for uncategorized messages."""
+    msg_lower = msg.lower()
+    if any(kw in msg_lower for kw in ["unescaped", "xmlparseentityref", "no name", "amp", "lt", "gt", "semicolon"]):
+        return "Repent"
+    if any(kw in msg_lower for kw in [
+        "tag mismatch", "misnested", "unknown tag", "must be inside", "must not be inside"
+    ]):
+        return "Reptag"
+    return "CheckSGM"
+
+
+def _first_error_entry(document):
+    parser = etree.XMLParser(recover=False)
+    try:
+        etree.fromstring(document.encode("utf-8"), parser)
+    except etree.XMLSyntaxError:
+        pass
+    return parser.error_log[0]
+
+
+def bench_classifier(repeat=5, scale=1000):
+    """
+    Checks both classifiers against CLASSIFIER_CORPUS / CHECKER_CORPUS and
+    times them on the corpus repeated `scale` times.
+    Returns {"legacy": {...}, "coded": {...}} with accuracy and seconds.
+    """
+    from error_classifier import classify_entry, classify_message
+    entries = [(_first_error_entry(document), expected) for document, expected in CLASSIFIER_CORPUS]
+
+    def check(label, classify_syntax, classify_plain):
+        misfiled = []
+        for entry, expected in entries:
+            got = classify_syntax(entry)
+            if got != expected:
+                misfiled.append((entry.message.strip(), expected, got))
+        for message, expected in CHECKER_CORPUS:
+            got = classify_plain(message)
+            if got != expected:
+                misfiled.append((message, expected, got))
+        syntax_items = [entry for entry, _ in entries] * scale
+        plain_items = [message for message, _ in CHECKER_CORPUS] * scale
+        seconds = _best_of(lambda: ([classify_syntax(e) for e in syntax_items],
+                                    [classify_plain(m) for m in plain_items]), repeat)
+        return {"misfiled": misfiled, "seconds": seconds,
+                "total": len(entries) + len(CHECKER_CORPUS),
+                "items": len(syntax_items) + len(plain_items)}
+
+    results = {
+        "legacy": check("legacy", lambda e: _legacy_classify_syntax(e.message.strip()),
+                        _legacy_classify_message),
+        "coded": check("coded", classify_entry, classify_message),
+    }
+
+    print(f"\n🏷  Error classification ({results['coded']['items']} errors, best of {repeat})")
+    for label, row in results.items():
+        correct = row["total"] - len(row["misfiled"])
+        print(f"  {label:<8} {row['seconds'] * 1000:8.2f} ms   {correct}/{row['total']} correct")
+        for message, expected, got in row["misfiled"]:
+            print(f"      ✗ {message[:60]!r}: {got}, expected {expected}")
+    print(f"  Speedup: {results['legacy']['seconds'] / results['coded']['seconds']:.1f}x")
+    return results
+
+
+# Entry points timed by the startup benchmark: (label, python arguments)
+STARTUP_COMMANDS = [
+    ("cli --help", ["cli.py", "--help"]),
+    ("import validator", ["-c", "import validator"]),
+    ("cli sample", ["cli.py", DEFAULT_SAMPLE, "-q", "-f", "summary"]),
+]
+
+
+def parse_importtime(stderr):
+    """Returns [(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def bench_startup(repeat=5, top=8):
+    """
+    Runs each STARTUP_COMMANDS entry in a fresh interpreter with
+    -X importtime; prints the best wall time, the total import time and the
+    slowest top-level imports of the best run.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for label, arguments in STARTUP_COMMANDS:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-X", "importtime", *arguments],
+                                       cwd=here, capture_output=True, text=True)
+            wall = time.perf_counter() - start
+            if best is None or wall < best[0]:
+                best = (wall, parse_importtime(completed.stderr))
+        wall, modules = best
+        top_level = sorted((m for m in modules if m[3] == 0), key=lambda m: -m[2])
+        results[label] = {
+            "wall_s": wall,
+            "import_us": sum(m[2] for m in top_level),
+            "top": [(name, cumulative) for name, _, cumulative, _ in top_level[:top]],
+        }
+
+    print(f"\n🚀 Startup (best of {repeat}, fresh interpreter each run)")
+    for label, row in results.items():
+        print(f"  {label:<20} {row['wall_s'] * 1000:8.1f} ms wall, "
+              f"{row['import_us'] / 1000:6.1f} ms imports")
+        for name, cumulative in row["top"]:
+            print(f"      {name:<28} {cumulative / 1000:6.1f} ms")
+    return results
+
+
+def _padded_relationships(rule_count):
+    """
+    TAG_RELATIONSHIPS plus synthetic rules up to rule_count, half of them
+    on tags every document uses (with parents that never occur), so the
+    extra rules are consulted for real elements.
+    """
+    from config import TAG_RELATIONSHIPS
+    relationships = {tag: dict(rules) for tag, rules in TAG_RELATIONSHIPS.items()}
+    common = ("EM", "EMB", "SUP", "SUB", "T", "A", "P20")
+    for i in range(max(0, rule_count - len(relationships))):
+        if i % 2:
+            relationships.setdefault(common[i // 2 % len(common)], {}) \
+                .setdefault("forbidden_parent", f"X{i}")
+        else:
+            relationships[f"X{i}"] = {"allowed_children": [f"Y{i}", "fnt*"]}
+    return relationships
+
+
+def bench_tag_rules(rule_counts=(3, 30, 300), repeat=5, size_kb=500):
+    """
+    Times validate_tags on one recovered tree with TagRules compiled from
+    TAG_RELATIONSHIPS padded to each rule count; compile time is reported
+    separately. The walk should not slow down as rules are added.
+    """
+    from synthetic_corpus import generate_document
+    from tag_checker import TagRules
+    content = generate_document(size_kb=size_kb, error_rate=0.02, seed=1)
+    tree, _, _ = parse_xml(content, preprocess(content), recover=True)
+    elements = sum(1 for _ in tree.iter())
+    print(f"\n🧭 Tag rules ({elements} elements, best of {repeat})")
+    print(f"  {'rules':>6} {'tags':>6} {'compile ms':>11} {'walk ms':>9} {'errors':>7}")
+    rows = []
+    for count in rule_counts:
+        relationships = _padded_relationships(count)
+        start = time.perf_counter()
+        rules = TagRules(tag_relationships=relationships)
+        compile_s = time.perf_counter() - start
+        errors = validate_tags(tree, rules=rules)
+        walk_s = _best_of(lambda: validate_tags(tree, rules=rules), repeat)
+        rows.append({"rules": count, "tags": len(rules.names) - 1, "compile_s": compile_s,
+                     "walk_s": walk_s, "errors": len(errors)})
+        print(f"  {count:>6} {len(rules.names) - 1:>6} {compile_s * 1000:>11.2f} "
+              f"{walk_s * 1000:>9.2f} {len(errors):>7}")
+    walks = [row["walk_s"] for row in rows]
+    print(f"  walk time spread: {max(walks) / min(walks):.2f}x (1.0 = independent of rule count)")
+    return rows
+
+
+def bench_entity_tables(repeat=5):
+    """
+    Times the three ways a process gets the config and entity tables:
+    rebuilding them from config.py and the entity sets, reading the marshal
+    cache, and unpacking the payload a pool initializer receives.
+    """
+    import pickle
+    import config_snapshot
+    from config_snapshot import build_snapshot, read_snapshot, snapshot_payload, install_snapshot
+    snapshot = config_snapshot.load_snapshot()
+    stamp = config_snapshot._source_stamp()
+    if read_snapshot(stamp=stamp) is None:
+        config_snapshot.save_snapshot(snapshot, stamp=stamp)
+    payload = pickle.dumps(snapshot_payload(snapshot))
+
+    def unpack():
+        install_snapshot(pickle.loads(payload))
+        config_snapshot._installed = None
+
+    results = {
+        "rebuild": _best_of(build_snapshot, repeat),
+        "cache file": _best_of(lambda: read_snapshot(stamp=config_snapshot._source_stamp()), repeat),
+        "initializer": _best_of(unpack, repeat),
+    }
+    print(f"\n📚 Entity tables ({len(snapshot.allowed_entities)} names, "
+          f"{len(snapshot.entity_substitutions)} substitutions, "
+          f"{len(snapshot.unresolved_entities)} unresolved; best of {repeat})")
+    print(f"  cache file size: {os.path.getsize(config_snapshot.SNAPSHOT_PATH) / 1024:.1f} KiB, "
+          f"initializer payload: {len(payload) / 1024:.1f} KiB")
+    for label, seconds in results.items():
+        print(f"  {label:<12} {seconds * 1000:8.3f} ms")
+    return results
+
+
+def bench_lint(documents=5, repeat=3, **params):
+    """
+    Compares lint_file with validate_file on a synthetic corpus, then a
+    lint-first triage run with the full pipeline on every file.
+    """
+    from lint import lint_file, needs_full_validation, triage_files
+    from validator import validate_files
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        paths = write_corpus(corpus_dir, documents, **dict(params))
+        total_mb = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+        flagged = sum(1 for path in paths if needs_full_validation(lint_file(path)))
+        results = {
+            "lint_file": _best_of(lambda: [lint_file(path) for path in paths], repeat),
+            "validate_file": _best_of(lambda: [validate_file(path) for path in paths], repeat),
+            "triage_files": _best_of(lambda: triage_files(paths, verbose=False), repeat),
+            "validate_files": _best_of(lambda: validate_files(paths, verbose=False), repeat),
+        }
+
+    print(f"\n🧹 Lint vs full pipeline ({documents} documents, {total_mb:.1f} MB, "
+          f"{flagged} flagged by lint; best of {repeat})")
+    for label, seconds in results.items():
+        print(f"  {label:<16} {seconds * 1000:10.2f} ms  {total_mb / seconds:8.1f} MB/s")
+    print(f"  lint speedup: {results['validate_file'] / results['lint_file']:.1f}x")
+    return dict(results, flagged=flagged)
+
+
+BENCHMARKS = {
+    "entities": bench_entities,
+    "entity-scaling": bench_entity_scaling,
+    "stages": bench_stages,
+    "startup": bench_startup,
+    "classify": bench_classifier,
+    "incremental": bench_incremental,
+    "entity-tables": bench_entity_tables,
+    "tag-rules": bench_tag_rules,
+    "lint": bench_lint,
+}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Validator micro-benchmarks")
+    arg_parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    arg_parser.add_argument("--sample", default=DEFAULT_SAMPLE)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--scale", type=int, default=1,
+                            help="repeat the sample text N times")
+    arg_parser.add_argument("--sizes", default="1,5,10,25,50",
+                            help="comma-separated document sizes in MB")
+    arg_parser.add_argument("--documents", type=int, default=5)
+    arg_parser.add_argument("--pages", type=int, default=1500, help="volume size for 'incremental'")
+    arg_parser.add_argument("--output", help="write stage results to this JSON file")
+    arg_parser.add_argument("--compare", help="baseline JSON file from an earlier run")
+    arg_parser.add_argument("--tolerance", type=float, default=0.10,
+                            help="allowed slowdown before a stage counts as a regression")
+    add_generator_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+
+    if args.benchmark == "entities":
+        bench_entities(args.sample, args.repeat, args.scale)
+    elif args.benchmark == "entity-scaling":
+        sizes = tuple(int(size) for size in args.sizes.split(","))
+        bench_entity_scaling(sizes, args.repeat)
+    elif args.benchmark == "stages":
+        result = bench_stages(args.documents, args.repeat, args.output, **generator_params(args))
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            if compare_results(baseline, result, args.tolerance):
+                return 1
+    elif args.benchmark == "startup":
+        bench_startup(args.repeat)
+    elif args.benchmark == "incremental":
+        bench_incremental(args.pages, args.repeat)
+    elif args.benchmark == "tag-rules":
+        sizes = (3, 30, 300) if args.sizes == arg_parser.get_default("sizes") else \
+            tuple(int(size) for size in args.sizes.split(","))
+        bench_tag_rules(sizes, args.repeat)
+    elif args.benchmark == "entity-tables":
+        bench_entity_tables(args.repeat)
+    elif args.benchmark == "classify":
+        bench_classifier(args.repeat, args.scale * 1000)
+    elif args.benchmark == "lint":
+        bench_lint(args.documents, args.repeat, **generator_params(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Command-line entry point.
+
+Usage:
+    python cli.py PATH [PATH ...] [options]
+    find . -name '*.FNT' | python cli.py - [options]
+
+PATH is a file, a folder (its .FNT/.XML files) or a glob pattern
+("data/**/*.FNT"); "-" reads one path per line from stdin.
+
+Exit codes (categories are OR-ed together):
+    0   no issues
+    1   validation could not run
+    2   bad command line
+    4   Repent (entity) issues
+    8   Reptag (tag) issues
+    16  CheckSGM (other syntax) issues
+"""
+import argparse
+import glob
+import os
+import sys
+from errors import ErrorSink, ListSink, ConsoleSink, print_error_report, STREAM_TRUNCATED
+from config import VALIDATED_EXTENSIONS, CACHE_DIR, CACHE_MAX_BYTES, STREAMING_THRESHOLD_BYTES
+
+# validator (lxml, multiprocessing) and openpyxl are imported only once a mode needs them
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+CATEGORY_EXIT_CODES = {
+    "Repent": 4,
+    "Reptag": 8,
+    "CheckSGM": 16,
+}
+OUTPUT_FORMATS = ("report", "stream", "summary", "csv", "jsonl", "xlsx")
+FILE_FORMATS = ("csv", "jsonl", "xlsx")
+
+
+class CategoryCountSink(ErrorSink):
+    """
+    ErrorSink counting issues per category, used for the exit code; also
+    lists the streamed files whose recovery stopped early.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.counts = {}
+        self.truncated = []
+
+    def begin_file(self, file_id):
+        self.files += 1
+
+    def emit(self, error):
+        self.counts[error.category] = self.counts.get(error.category, 0) + 1
+        if error.code == STREAM_TRUNCATED:
+            self.truncated.append(error.file_id)
+
+    def result(self):
+        return dict(self.counts)
+
+    def exit_code(self):
+        code = EXIT_OK
+        for category in self.counts:
+            code |= CATEGORY_EXIT_CODES.get(category, EXIT_FAILURE)
+        return code
+
+    def print_summary(self):
+        total = sum(self.counts.values())
+        by_category = ", ".join(f"{category} {count}" for category, count in sorted(self.counts.items()))
+        print(f"📊 SUMMARY: {self.files} files scanned, {total} total issues"
+              f"{' (' + by_category + ')' if by_category else ''}", file=sys.stderr)
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(
+        prog="unified-validator",
+        description="Validate FNT/XML files (entities, tags, XML syntax)",
+        epilog="Exit code: 0 clean, 1 failure, 2 usage, else 4 Repent | 8 Reptag | 16 CheckSGM",
+    )
+    arg_parser.add_argument("paths", nargs="+",
+                            help="files, folders or glob patterns; '-' reads paths from stdin")
+    arg_parser.add_argument("-j", "--workers", type=int, default=1,
+                            help="worker processes (0 = all cores, default 1)")
+    arg_parser.add_argument("--chunksize", type=int, default=4,
+                            help="files handed to a worker per dispatch")
+    arg_parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS,
+                            help="report (default), stream, summary, or a report file "
+                                 "format; inferred from --output when omitted")
+    arg_parser.add_argument("-o", "--output", help="report file for csv/jsonl/xlsx")
+    arg_parser.add_argument("--no-context", action="store_true",
+                            help="leave source lines out of the output")
+    arg_parser.add_argument("--cache", action="store_true", help="reuse results of unchanged files")
+    arg_parser.add_argument("--cache-dir", help="cache folder (implies --cache)")
+    arg_parser.add_argument("--cache-max-mb", type=float, help="cache size limit in MiB")
+    arg_parser.add_argument("--purge-cache", action="store_true",
+                            help="empty the cache before validating")
+    arg_parser.add_argument("--streaming-threshold-mb", type=float,
+                            help="stream files of this size or more (MiB)")
+    arg_parser.add_argument("--no-streaming", action="store_true",
+                            help="always validate in memory")
+    arg_parser.add_argument("--recover", action="store_true",
+                            help="report every syntax error and keep checking")
+    mode = arg_parser.add_mutually_exclusive_group()
+    mode.add_argument("--lint", action="store_true",
+                      help="lexer-only checks, no XML parse (cache, streaming and --recover "
+                           "do not apply)")
+    mode.add_argument("--triage", action="store_true",
+                      help="lint every file and run the full validation only on files "
+                           "lint finds errors in")
+    arg_parser.add_argument("--profile", metavar="PATH",
+                            help="write per-file, per-stage timings to PATH as JSON lines")
+    arg_parser.add_argument("--profile-memory", action="store_true",
+                            help="with --profile, also record peak traced memory per stage")
+    arg_parser.add_argument("-q", "--quiet", action="store_true", help="no progress lines")
+    return arg_parser
+
+
+def expand_paths(patterns, stdin=None):
+    """
+    Expands folders, glob patterns and '-' (paths from stdin) into a sorted,
+    de-duplicated list of files. Missing paths are returned separately.
+    """
+    files = set()
+    missing = []
+    for pattern in patterns:
+        if pattern == "-":
+            stdin = stdin or sys.stdin
+            candidates = [line.strip() for line in stdin if line.strip()]
+        elif glob.has_magic(pattern):
+            candidates = glob.glob(pattern, recursive=True)
+            if not candidates:
+                missing.append(pattern)
+        else:
+            candidates = [pattern]
+
+        for path in candidates:
+            if os.path.isdir(path):
+                files.update(
+                    os.path.join(path, name) for name in os.listdir(path)
+                    if name.lower().endswith(VALIDATED_EXTENSIONS)
+                )
+            elif os.path.isfile(path):
+                files.add(path)
+            elif pattern == "-" or not glob.has_magic(pattern):
+                missing.append(path)
+    return sorted(files), missing
+
+
+def _resolve_format(args, arg_parser):
+    output_format = args.format
+    extension = os.path.splitext(args.output)[1].lower().lstrip(".") if args.output else ""
+    if output_format is None:
+        output_format = extension if extension in FILE_FORMATS else "report"
+    if output_format in FILE_FORMATS:
+        if not args.output:
+            arg_parser.error(f"--format {output_format} needs --output")
+        if extension != output_format:
+            arg_parser.error(f"--output {args.output} does not match --format {output_format} "
+                             f"(expected a .{output_format} file)")
+    elif args.output and args.format is None:
+        arg_parser.error(f"no report format for --output {args.output} "
+                         f"(use a .csv, .jsonl or .xlsx file)")
+    elif args.output:
+        arg_parser.error("--output is only used with --format csv, jsonl or xlsx")
+    return output_format
+
+
+def _make_cache(args):
+    if not (args.cache or args.cache_dir or args.purge_cache):
+        return None
+    from result_cache import ValidationCache
+    max_bytes = int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb else CACHE_MAX_BYTES
+    cache = ValidationCache(args.cache_dir or CACHE_DIR, max_bytes)
+    if args.purge_cache:
+        print(f"🧹 Removed {cache.purge()} cache entries", file=sys.stderr)
+    return cache
+
+
+def main(argv=None):
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+    output_format = _resolve_format(args, arg_parser)
+    if args.profile and args.lint:
+        arg_parser.error("--profile times the validation pipeline; --lint does not run it")
+    if args.profile_memory and not args.profile:
+        arg_parser.error("--profile-memory needs --profile")
+
+    file_paths, missing = expand_paths(args.paths)
+    for path in missing:
+        print(f"⚠ No such file or match: {path}", file=sys.stderr)
+    if not file_paths:
+        print("❌ No .FNT/.XML files to validate", file=sys.stderr)
+        return EXIT_FAILURE if missing else EXIT_OK
+
+    cache = _make_cache(args)
+    if args.no_streaming:
+        streaming_threshold = None
+    elif args.streaming_threshold_mb is not None:
+        streaming_threshold = int(args.streaming_threshold_mb * 1024 * 1024)
+    else:
+        streaming_threshold = STREAMING_THRESHOLD_BYTES
+
+    from report_writers import TeeSink
+    counter = CategoryCountSink()
+    if output_format == "report":
+        sink = ListSink()
+    elif output_format == "stream":
+        sink = ConsoleSink(show_context=not args.no_context)
+    elif output_format == "summary":
+        sink = None
+    else:
+        from report_writers import REPORT_SINKS
+        try:
+            sink = REPORT_SINKS["." + output_format](args.output, include_context=not args.no_context)
+        except OSError as e:
+            print(f"❌ Cannot write report: {str(e)}", file=sys.stderr)
+            return EXIT_FAILURE
+
+    workers = None if args.workers == 0 else args.workers
+    target = TeeSink(counter, sink) if sink is not None else counter
+    exporter = None
+    instrumentation = None
+    if args.profile:
+        from instrumentation import Instrumentation, JsonLinesExporter
+        try:
+            exporter = JsonLinesExporter(args.profile)
+        except OSError as e:
+            print(f"❌ Cannot write profile: {str(e)}", file=sys.stderr)
+            return EXIT_FAILURE
+        instrumentation = Instrumentation(args.profile_memory, callbacks=[exporter])
+    try:
+        if args.lint:
+            from lint import lint_files
+            lint_files(file_paths, workers, args.chunksize, sink=target, verbose=not args.quiet)
+        else:
+            if args.triage:
+                from lint import triage_files as run
+            else:
+                from validator import validate_files as run
+            run(
+                file_paths,
+                workers=workers,
+                chunksize=args.chunksize,
+                streaming_threshold=streaming_threshold,
+                cache=cache,
+                recover=args.recover,
+                instrumentation=instrumentation,
+                sink=target,
+                verbose=not args.quiet,
+            )
+    except (OSError, ValueError) as e:
+        print(f"\n❌ Error during validation: {str(e)}", file=sys.stderr)
+        return EXIT_FAILURE
+    finally:
+        if exporter is not None:
+            exporter.close()
+    if instrumentation is not None and not args.quiet:
+        instrumentation.print_summary()
+
+    if output_format == "report":
+        print_error_report(sink.result())
+    elif output_format in FILE_FORMATS:
+        print(f"✅ Report saved to: {args.output}", file=sys.stderr)
+    if output_format in FILE_FORMATS or output_format == "summary":
+        counter.print_summary()
+    if counter.truncated:
+        print(f"⚠ Streamed files only checked up to an unrecoverable error (use --no-streaming): "
+              f"{', '.join(sorted(counter.truncated))}", file=sys.stderr)
+    return counter.exit_code()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -111,9 +111,21 @@ TAG_RELATIONSHIPS = {
         'required_parent': 'FN',
         'allowed_siblings': []
     },
-    # Add similar entries for fnt1, fnt2, fnt3
+    # 'fnt*' also covers fnt1, fnt2, FNT3, ... (tag_checker.TagRules)
     'fnr': {
         'forbidden_parent': 'FN',  # Must NOT be inside FN
         'allowed_siblings': []  # No specific sibling requirements
     }
 }
+
+# File extensions picked up when validating a folder
+VALIDATED_EXTENSIONS = ('.fnt', '.xml')
+
+# Files at or above this size are validated in streaming mode (bytes)
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+# Characters read per chunk in streaming mode
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# On-disk validation result cache (used when a cache is passed to validate_all_files)
+CACHE_DIR = ".validator_cache"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
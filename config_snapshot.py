@@ -0,0 +1,184 @@
+"""
+Frozen, precompiled view of config.py for fast startup.
+
+The snapshot holds the config tables as frozensets plus the lookups derived
+from them (lowercase tag sets, the entity_registry tables). It is built
+once, stored with marshal in config.CACHE_DIR, and loaded from there
+while config.py, entity_registry.py, this module and the entity sets are
+unchanged; where CACHE_DIR is not writable it is rebuilt per process. Process pools hand it to their workers (install_snapshot), so a
+worker neither rebuilds nor re-reads it.
+"""
+import marshal
+import os
+import sys
+from collections import namedtuple
+import config
+from entity_registry import entity_set_files
+
+# Bump when the snapshot fields or how they are derived change
+SNAPSHOT_VERSION = 2
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_PATH = os.path.join(
+    config.CACHE_DIR,
+    f"config_snapshot.{sys.implementation.cache_tag}.v{SNAPSHOT_VERSION}.marshal"
+)
+# Sources whose contents the snapshot is derived from
+SNAPSHOT_SOURCES = ("config.py", "entity_registry.py", "config_snapshot.py")
+
+ConfigSnapshot = namedtuple("ConfigSnapshot", [
+    "custom_entities",       # frozenset of entity names
+    "supported_tags",        # frozenset
+    "non_closing_tags",      # frozenset
+    "supported_lower",       # frozenset of lowercased SUPPORTED_TAGS
+    "non_closing_lower",     # frozenset of lowercased NON_CLOSING_TAGS
+    "fn_allowed_children",   # frozenset from TAG_RELATIONSHIPS['FN']
+    "tag_relationships",     # {tag: {key: tuple}}
+    "entity_substitutions",  # {name: '&#N;'} used by the preprocessor
+    "standard_entities",     # frozenset: valid names besides CUSTOM_ENTITIES
+    "allowed_entities",      # frozenset: standard_entities + CUSTOM_ENTITIES
+    "unresolved_entities",   # frozenset: allowed names without a substitution
+    "fingerprint",           # sha256 of the tables above
+])
+
+
+def _freeze_relationships(relationships):
+    return {
+        tag: {key: tuple(value) if isinstance(value, (list, set, tuple)) else value
+              for key, value in rules.items()}
+        for tag, rules in relationships.items()
+    }
+
+
+def _fingerprint(custom_entities, supported_tags, non_closing_tags, relationships, substitutions,
+                 allowed_entities):
+    import hashlib  # Build-time only, like tempfile below
+    digest = hashlib.sha256()
+    for table in (custom_entities, supported_tags, non_closing_tags, allowed_entities):
+        digest.update("\0".join(sorted(table)).encode("utf-8") + b"\1")
+    digest.update(repr(sorted((tag, sorted(rules.items())) for tag, rules in relationships.items()))
+                  .encode("utf-8"))
+    digest.update(repr(sorted(substitutions.items())).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_snapshot(entity_files=None):
+    """Builds a snapshot from config.py and the entity sets (entity_registry)."""
+    from entity_registry import build_tables  # Build-time only
+    custom_entities = frozenset(config.CUSTOM_ENTITIES)
+    supported_tags = frozenset(config.SUPPORTED_TAGS)
+    non_closing_tags = frozenset(config.NON_CLOSING_TAGS)
+    relationships = _freeze_relationships(config.TAG_RELATIONSHIPS)
+    entities = build_tables(custom_entities, entity_files)
+    return ConfigSnapshot(
+        custom_entities=custom_entities,
+        supported_tags=supported_tags,
+        non_closing_tags=non_closing_tags,
+        supported_lower=frozenset(t.lower() for t in supported_tags),
+        non_closing_lower=frozenset(t.lower() for t in non_closing_tags),
+        fn_allowed_children=frozenset(
+            relationships.get('FN', {}).get('allowed_children') or ()
+        ),
+        tag_relationships=relationships,
+        entity_substitutions=entities.substitutions,
+        standard_entities=entities.standard,
+        allowed_entities=entities.declared,
+        unresolved_entities=entities.unresolved,
+        fingerprint=_fingerprint(custom_entities, supported_tags, non_closing_tags,
+                                 relationships, entities.substitutions, entities.declared),
+    )
+
+
+def _source_stamp():
+    """
+    (name, mtime_ns, size) of every source file and entity set; any edit,
+    or an entity set added or removed, invalidates the snapshot.
+    """
+    stamp = []
+    paths = [os.path.join(_MODULE_DIR, name) for name in SNAPSHOT_SOURCES] + entity_set_files()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        stamp.append((os.path.relpath(path, _MODULE_DIR), stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def save_snapshot(snapshot, path=SNAPSHOT_PATH, stamp=None):
+    """Writes the snapshot atomically; failures (read-only install) are ignored."""
+    import tempfile
+    payload = (SNAPSHOT_VERSION, stamp or _source_stamp(), tuple(snapshot))
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            marshal.dump(payload, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+
+def read_snapshot(path=SNAPSHOT_PATH, stamp=None):
+    """Returns the stored snapshot if it matches the current sources, else None."""
+    try:
+        with open(path, 'rb') as f:
+            version, stored_stamp, fields = marshal.load(f)
+        if version != SNAPSHOT_VERSION or stored_stamp != (stamp or _source_stamp()):
+            return None
+        return ConfigSnapshot(*fields)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """
+    Returns the snapshot installed by the parent process, else the stored
+    one, rebuilding and storing it when stale. The default path is loaded
+    once per process and shared by every module that asks for it.
+    """
+    global _loaded
+    if _installed is not None:
+        return _installed
+    if path == SNAPSHOT_PATH and _loaded is not None:
+        return _loaded
+    stamp = _source_stamp()
+    snapshot = read_snapshot(path, stamp) if stamp is not None else None
+    if snapshot is None:
+        snapshot = build_snapshot()
+        if stamp is not None:
+            save_snapshot(snapshot, path, stamp)
+    if path == SNAPSHOT_PATH:
+        _loaded = snapshot
+    return snapshot
+
+
+# Snapshot returned by load_snapshot() for the default path
+_loaded = None
+
+
+# ========== WORKER SHARING ==========
+# Set in pool workers by install_snapshot, before parser is imported there
+_installed = None
+
+
+def snapshot_payload(snapshot):
+    """Picklable form of snapshot for a pool initializer (see install_snapshot)."""
+    return SNAPSHOT_VERSION, tuple(snapshot)
+
+
+def install_snapshot(payload):
+    """
+    Pool initializer: makes load_snapshot() return the parent's tables, so
+    spawned workers skip the stamp check, the file read and any rebuild.
+    A no-op for forked workers, which already share the parent's modules.
+    """
+    global _installed
+    version, fields = payload
+    if version == SNAPSHOT_VERSION:
+        _installed = ConfigSnapshot(*fields)
@@ -1,37 +1,181 @@
 import re
 import os
+import io
+import argparse
+import multiprocessing
+import tempfile
+from file_loader import detect_encoding, iter_line_chunks, DETECT_BLOCK_SIZE
 
-def convert_sgml_to_xml(input_path, output_path):
-    open_tags = []
-    xml_lines = []
+# [CN], [PG], [DK], ... at the start of a line open a section
+SECTION_PATTERN = re.compile(r'\s*\[(\w+)\]')
+IO_BUFFER_SIZE = 1024 * 1024
+CONVERTED_EXTENSION = ".xml"
 
-    with open(input_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
 
+def iter_converted_lines(lines):
+    """
+    Converts SGML lines to XML lines one at a time.
+    A [TAG] line becomes <TAG>; the section stays open until the next
+    section marker, whose line starts with the closing tag (</CN><PG>), or
+    until the end of input. Output has exactly one line per input line, so
+    line numbers reported on the XML match the SGML source.
+    """
+    open_tag = None
     for line in lines:
-        stripped = line.strip()
-
-        # Convert [TAG] to <TAG> and track open tags
-        tag_match = re.match(r'\[(\w+)\]', stripped)
+        # Cheap check first: most lines are not section markers
+        first = line[:1]
+        tag_match = SECTION_PATTERN.match(line) if first == '[' or first.isspace() else None
         if tag_match:
             tag = tag_match.group(1)
-            xml_lines.append(f"<{tag}>")
-            open_tags.append(tag)
+            closing = f"</{open_tag}>" if open_tag else ""
+            yield f"{closing}<{tag}>\n"
+            open_tag = tag
         else:
-            xml_lines.append(line.rstrip())
+            yield line.rstrip() + "\n"
+    if open_tag:
+        yield f"</{open_tag}>\n"
+
+
+def read_source_lines(input_path, decode_errors=None):
+    """
+    Yields the lines of input_path without their line breaks, decoded the
+    way file_loader decodes validator input (BOM / UTF-16 detection, the
+    cp1252 fallback recorded in decode_errors) and read in blocks.
+    """
+    with open(input_path, 'rb') as f:
+        encoding, bom_length = detect_encoding(f.read(DETECT_BLOCK_SIZE))
+    for _, piece in iter_line_chunks(input_path, IO_BUFFER_SIZE, encoding, bom_length, decode_errors):
+        lines = piece.split("\n")
+        if not lines[-1]:
+            lines.pop()  # The piece ended with a line break
+        yield from lines
+
+
+def convert_stream(source, target):
+    """Converts an SGML text stream into target (any object with write())."""
+    pending = []
+    size = 0
+    for line in iter_converted_lines(source):
+        pending.append(line)
+        size += len(line)
+        if size >= IO_BUFFER_SIZE:
+            target.write("".join(pending))
+            pending = []
+            size = 0
+    target.write("".join(pending))
+
+
+def _report_decode_errors(input_path, decode_errors):
+    for _, line, column, message in decode_errors:
+        print(f"⚠ {os.path.basename(input_path)} line {line}, column {column}: {message}")
+
+
+def convert_to_string(input_path):
+    """Returns the converted XML of input_path without writing a file."""
+    output = io.StringIO()
+    decode_errors = []
+    convert_stream(read_source_lines(input_path, decode_errors), output)
+    _report_decode_errors(input_path, decode_errors)
+    return output.getvalue()
 
-    # Close all tags in reverse order
-    for tag in reversed(open_tags):
-        xml_lines.append(f"</{tag}>")
 
-    # Write to output XML file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(xml_lines))
+def convert_sgml_to_xml(input_path, output_path):
+    decode_errors = []
+    with open(output_path, 'w', encoding='utf-8', buffering=IO_BUFFER_SIZE) as target:
+        convert_stream(read_source_lines(input_path, decode_errors), target)
+    _report_decode_errors(input_path, decode_errors)
 
     print(f"\n✅ Converted XML saved to: {output_path}")
+    return output_path
+
+
+def _convert_task(paths):
+    input_path, output_path = paths
+    return convert_sgml_to_xml(input_path, output_path)
+
+
+def convert_folder(input_dir, output_dir, workers=None, extensions=('.fnt', '.sgm', '.sgml')):
+    """
+    Converts every matching file of input_dir into output_dir (same name,
+    .xml extension) using a process pool; workers=1 converts in-process.
+    Returns the output paths sorted by name.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [
+        (os.path.join(input_dir, name),
+         os.path.join(output_dir, os.path.splitext(name)[0] + CONVERTED_EXTENSION))
+        for name in sorted(os.listdir(input_dir))
+        if name.lower().endswith(extensions)
+    ]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+
+    if workers <= 1:
+        return [_convert_task(task) for task in tasks]
+    with multiprocessing.Pool(processes=workers) as pool:
+        return sorted(pool.imap_unordered(_convert_task, tasks, chunksize=4))
+
+
+def convert_and_validate(input_path, recover=False):
+    """
+    Converts input_path into a temporary UTF-8 file and validates that file
+    (streamed when large, see validator.validate_file); returns the errors,
+    with an ENCODING error first when the input was not valid in its
+    detected encoding.
+    """
+    from validator import validate_file
+    from file_loader import load_file
+    from line_index import LineIndex
+    from errors import ValidationError, ENCODING
+    file_id = os.path.basename(input_path)
+    decode_errors = []
+    loaded = None
+    handle, converted_path = tempfile.mkstemp(suffix=CONVERTED_EXTENSION)
+    try:
+        with open(handle, 'w', encoding='utf-8', buffering=IO_BUFFER_SIZE) as target:
+            convert_stream(read_source_lines(input_path, decode_errors), target)
+        errors = validate_file(converted_path, recover=recover)
+        if decode_errors:
+            # Lines match the source one to one, and so do page markers
+            loaded = load_file(converted_path)
+            line_index = LineIndex(loaded.scan_buffer, loaded.encoding)
+            errors[:0] = [
+                ValidationError(category, file_id, line, column, line_index.page_for_line(line),
+                                ENCODING, message, source=line_index)
+                for category, line, column, message in decode_errors
+            ]
+        for error in errors:
+            error.file_id = file_id
+            # Read the context now: the converted file is removed below
+            error.resolve()
+        return errors
+    finally:
+        if loaded is not None:
+            loaded.close()
+        os.remove(converted_path)
+
 
 # === Example Usage ===
 if __name__ == "__main__":
-    input_file = r"C:\Users\nbs\OneDrive\Desktop\UnifiedXMLvalidator\Samples\23-4031.FNT"   # Replace with your path
-    output_file = r"C:\Users\nbs\OneDrive\Desktop\UnifiedXMLvalidator\Samples\sample_output.xml"
-    convert_sgml_to_xml(input_file, output_file)
+    arg_parser = argparse.ArgumentParser(description="Convert SGML section markers to XML")
+    arg_parser.add_argument("input", help="SGML file or folder")
+    arg_parser.add_argument("output", nargs="?", help="output file or folder")
+    arg_parser.add_argument("--workers", type=int, default=None, help="processes for folders")
+    arg_parser.add_argument("--validate", action="store_true",
+                            help="validate the converted XML instead of writing it")
+    args = arg_parser.parse_args()
+
+    if args.validate:
+        from validator import print_error_report
+        inputs = [args.input]
+        if os.path.isdir(args.input):
+            inputs = [os.path.join(args.input, name) for name in sorted(os.listdir(args.input))
+                      if name.lower().endswith(('.fnt', '.sgm', '.sgml'))]
+        print_error_report({os.path.basename(path): convert_and_validate(path) for path in inputs})
+    elif os.path.isdir(args.input):
+        convert_folder(args.input, args.output or args.input, args.workers)
+    else:
+        convert_sgml_to_xml(
+            args.input, args.output or os.path.splitext(args.input)[0] + CONVERTED_EXTENSION
+        )
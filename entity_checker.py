@@ -1,43 +1,67 @@
 import re
-from config import CUSTOM_ENTITIES, SUPPORTED_TAGS
+from config import CUSTOM_ENTITIES
+from line_index import LineIndex
+from config_snapshot import load_snapshot
 
-DEFAULT_ENTITIES = {
-    'amp', 'lt', 'gt', 'quot', 'apos',
-    'mdash', 'sect', 'nbsp', 'copy'  # Add more as needed
-}
+CONFIG_SNAPSHOT = load_snapshot()
 
-def check_entities(file_content, custom_entities=None):
+# Valid whatever custom_entities is: XML predefined, entity_registry's base
+# names and every name declared in the loaded entity sets
+DEFAULT_ENTITIES = CONFIG_SNAPSHOT.standard_entities
+
+# Union for the usual custom_entities=CUSTOM_ENTITIES call, built once
+DEFAULT_ALLOWED_ENTITIES = CONFIG_SNAPSHOT.allowed_entities
+
+# One token per tag or entity reference; tags may span lines but never
+# contain another '<', so a stray '<' cannot swallow the rest of the file
+TOKEN_PATTERN = re.compile(
+    r'<\/?[a-zA-Z][a-zA-Z0-9]*(?:\s+[^<>]*)?>'
+    r'|&(#[0-9]+|#x[0-9a-fA-F]+|[a-zA-Z0-9]+);'
+)
+# For byte buffers (file_loader's mmap); entity names are ASCII
+TOKEN_PATTERN_BYTES = re.compile(TOKEN_PATTERN.pattern.encode("ascii"))
+DEFAULT_ALLOWED_ENTITIES_BYTES = frozenset(name.encode("ascii") for name in DEFAULT_ALLOWED_ENTITIES)
+
+
+def check_entities(file_content, custom_entities=None, line_index=None):
     """
     Entity checker that focuses ONLY on invalid entities (ignores unescaped chars)
     Checks for:
     - Invalid named entities
     - Does NOT check for unescaped <, >, or & characters
+    Tokenizes the whole document in one pass, so entities inside tags
+    (attributes) are skipped without per-line span lists. Line/column are
+    resolved through line_index (built on the first error if not given).
+    file_content may be a str or a bytes-like buffer in an ASCII-compatible
+    encoding (scanned without decoding; pass its byte LineIndex).
     """
     errors = []
-    lines = file_content.splitlines()
-    allowed_entities = DEFAULT_ENTITIES.union(custom_entities or set())
-    
-    # Pattern to match XML/SGML tags
-    tag_pattern = re.compile(r'<\/?[a-zA-Z][a-zA-Z0-9]*(\s+[^>]*)?>')
-    # Pattern to match both named and numeric entities
-    entity_pattern = re.compile(r'&(#[0-9]+|#x[0-9a-fA-F]+|[a-zA-Z0-9]+);')
-
-    for line_num, line in enumerate(lines, 1):
-        # First find all valid tags in the line
-        tag_positions = []
-        for match in tag_pattern.finditer(line):
-            tag_positions.append((match.start(), match.end()))
-        
-        # Check for invalid named entities only
-        for match in entity_pattern.finditer(line):
-            entity = match.group(1)
-            # Only validate named entities (ignore numeric entities)
-            if not entity.startswith('#') and entity not in allowed_entities:
-                # Check if this is inside a tag (like an attribute)
-                inside_tag = any(start <= match.start() <= end for start, end in tag_positions)
-                if not inside_tag:
-                    col = match.start() + 1
-                    errors.append(("Repent", line_num, col, 
-                                 f"Invalid entity '&{entity};'"))
-
-    return errors
\ No newline at end of file
+    if custom_entities is CUSTOM_ENTITIES:
+        allowed_entities = DEFAULT_ALLOWED_ENTITIES
+    else:
+        allowed_entities = DEFAULT_ENTITIES.union(custom_entities or set())
+
+    binary = not isinstance(file_content, str)
+    if binary:
+        token_pattern, numeric = TOKEN_PATTERN_BYTES, ord('#')
+        if allowed_entities is DEFAULT_ALLOWED_ENTITIES:
+            allowed_entities = DEFAULT_ALLOWED_ENTITIES_BYTES
+        else:
+            allowed_entities = {name.encode("ascii") for name in allowed_entities if name.isascii()}
+    else:
+        token_pattern, numeric = TOKEN_PATTERN, '#'
+
+    for match in token_pattern.finditer(file_content):
+        entity = match.group(1)
+        # Tags have no group; numeric entities are not validated
+        if entity is None or entity[0] == numeric or entity in allowed_entities:
+            continue
+        if line_index is None:
+            line_index = LineIndex(file_content)
+        line_num, col = line_index.line_column(match.start())
+        if binary:
+            entity = entity.decode("ascii")
+        errors.append(("Repent", line_num, col,
+                       f"Invalid entity '&{entity};'"))
+
+    return errors
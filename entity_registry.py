@@ -0,0 +1,199 @@
+"""
+Single source of entity knowledge for the checker, the preprocessor and the
+page validator.
+
+Declared names (valid in a document):
+    XML predefined + BASE_ENTITIES + config.CUSTOM_ENTITIES
+    + every name declared in an entity set (*.ent) in ENTITY_SET_DIR
+Replacement text, later sources winning:
+    1. the HTML5 table (only for names declared above)
+    2. ISO/SGML entity sets in ENTITY_SET_DIR, in name order
+    3. ENTITY_TO_NUMERIC
+    4. ENTITY_SET_DIR/project.ent (project overrides)
+Declared names left without a replacement are listed in
+EntityTables.unresolved; lxml reports them as undefined entities.
+
+build_tables() is only run when the config snapshot is rebuilt (see
+config_snapshot.py); `python entity_registry.py` prints what it resolved.
+"""
+import os
+import re
+import config
+
+ENTITY_SET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "entities")
+PROJECT_ENTITY_SET = "project.ent"
+
+XML_PREDEFINED_ENTITIES = frozenset(("amp", "lt", "gt", "quot", "apos"))
+# Always valid, whatever config.CUSTOM_ENTITIES says
+BASE_ENTITIES = frozenset(("mdash", "sect", "nbsp", "copy"))
+
+# One scan finds every named reference; the table lookup picks the replacement.
+# Faster than a ~400-way alternation since re does not build a trie.
+ENTITY_REF_PATTERN = re.compile(r"&([a-zA-Z0-9]+);")
+ENTITY_NAME_PATTERN = re.compile(r"[a-zA-Z0-9]+")
+
+# ========== EXPLICIT MAPPINGS ==========
+ENTITY_TO_NUMERIC = {
+    "mdash": "&#8212;",
+    "nbsp": "&#160;",
+    "copy": "&#169;",
+    "AElig": "&#198;",
+    'Aacute': '&#193;', 'Abreve': '&#258;', 'Acirc': '&#194;', 'Agrave': '&#192;', 'Amacr': '&#256;',
+    'Aogon': '&#260;', 'Aring': '&#197;', 'Atilde': '&#195;', 'Auml': '&#196;', 'Cacute': '&#262;',
+    'Ccaron': '&#268;', 'Ccedil': '&#199;', 'Ccirc': '&#264;', 'Cdot': '&#266;', 'Dcaron': '&#270;',
+    'Dstrok': '&#272;', 'ENG': '&#330;', 'ETH': '&#208;', 'Eacute': '&#201;', 'Ecaron': '&#282;',
+    'Ecirc': '&#202;', 'Edot': '&#278;', 'Egrave': '&#200;', 'Emacr': '&#274;', 'Eogon': '&#280;',
+    'Euml': '&#203;', 'Gbreve': '&#286;', 'Gcedil': '&#290;', 'Gcirc': '&#284;', 'Gdot': '&#288;',
+    'Hcirc': '&#292;', 'Hstrok': '&#294;', 'IJlig': '&#306;', 'Iacute': '&#205;', 'Icirc': '&#206;',
+    'Idot': '&#304;', 'Igrave': '&#204;', 'Imacr': '&#298;', 'Iogon': '&#302;', 'Itilde': '&#296;',
+    'Iuml': '&#207;', 'Jcirc': '&#308;', 'Kcedil': '&#310;', 'Lacute': '&#313;', 'Lcaron': '&#317;',
+    'Lcedil': '&#315;', 'Lmidot': '&#319;', 'Lstrok': '&#321;', 'Nacute': '&#323;', 'Ncaron': '&#327;',
+    'Ncedil': '&#325;', 'Ntilde': '&#209;', 'OElig': '&#338;', 'Oacute': '&#211;', 'Ocirc': '&#212;',
+    'Odblac': '&#336;', 'Ograve': '&#210;', 'Omacr': '&#332;', 'Oslash': '&#216;', 'Otilde': '&#213;',
+    'Ouml': '&#214;', 'Racute': '&#340;', 'Rcaron': '&#344;', 'Rcedil': '&#342;', 'Sacute': '&#346;',
+    'Scaron': '&#352;', 'Scedil': '&#350;', 'Scirc': '&#348;', "sect": "&#167;", 'THORN': '&#222;',
+    'Tcaron': '&#356;', 'Tcedil': '&#354;', 'Tstrok': '&#358;', 'Uacute': '&#218;', 'Ubreve': '&#364;',
+    'Ucirc': '&#219;', 'Udblac': '&#368;', 'Ugrave': '&#217;', 'Umacr': '&#362;', 'Uogon': '&#370;',
+    'Uring': '&#366;', 'Utilde': '&#360;', 'Uuml': '&#220;', 'Wcirc': '&#372;', 'Yacute': '&#221;',
+    'Ycirc': '&#374;', 'Yuml': '&#376;', 'Zacute': '&#377;', 'Zcaron': '&#381;', 'Zdot': '&#379;',
+    'aacute': '&#225;', 'abreve': '&#259;', 'acirc': '&#226;', 'aelig': '&#230;', 'agrave': '&#224;',
+    'amacr': '&#257;', 'aogon': '&#261;', 'aring': '&#229;', 'atilde': '&#227;', 'auml': '&#228;',
+    'cacute': '&#263;', 'ccaron': '&#269;', 'ccedil': '&#231;', 'ccirc': '&#265;', 'cdot': '&#267;',
+    'dcaron': '&#271;', 'dstrok': '&#273;', 'eacute': '&#233;', 'ecaron': '&#283;', 'ecirc': '&#234;',
+    'edot': '&#279;', 'egrave': '&#232;', 'emacr': '&#275;', 'eng': '&#331;', 'eogon': '&#281;',
+    'eth': '&#240;', 'euml': '&#235;', 'gacute': '&#501;', 'gbreve': '&#287;', 'gcirc': '&#285;',
+    'gdot': '&#289;', 'hcirc': '&#293;', 'hstrok': '&#295;', 'iacute': '&#237;', 'icirc': '&#238;',
+    'igrave': '&#236;', 'ijlig': '&#307;', 'imacr': '&#299;', 'inodot': '&#305;', 'iogon': '&#303;',
+    'itilde': '&#297;', 'iuml': '&#239;', 'jcirc': '&#309;', 'kcedil': '&#311;', 'kgreen': '&#312;',
+    'lacute': '&#314;', 'lcaron': '&#318;', 'lcedil': '&#316;', 'lmidot': '&#320;', 'lstrok': '&#322;',
+    'nacute': '&#324;', 'napos': '&#329;', 'ncaron': '&#328;', 'ncedil': '&#326;', 'ntilde': '&#241;',
+    'oacute': '&#243;', 'ocirc': '&#244;', 'odblac': '&#337;', 'oelig': '&#339;', 'ograve': '&#242;',
+    'omacr': '&#333;', 'oslash': '&#248;', 'otilde': '&#245;', 'ouml': '&#246;', 'racute': '&#341;',
+    'rcaron': '&#345;', 'rcedil': '&#343;', 'sacute': '&#347;', 'scaron': '&#353;', 'scedil': '&#351;',
+    'scirc': '&#349;', 'szlig': '&#223;', 'tcaron': '&#357;', 'tcedil': '&#355;', 'thorn': '&#254;',
+    'tstrok': '&#359;', 'uacute': '&#250;', 'ubreve': '&#365;', 'ucirc': '&#251;', 'udblac': '&#369;',
+    'ugrave': '&#249;', 'umacr': '&#363;', 'uogon': '&#371;', 'uring': '&#367;', 'utilde': '&#361;',
+    'uuml': '&#252;', 'wcirc': '&#373;', 'yacute': '&#253;', 'ycirc': '&#375;', 'yuml': '&#255;',
+    'zacute': '&#378;', 'zcaron': '&#382;', 'zdot': '&#380;'
+}
+
+
+# ========== ENTITY SETS ==========
+COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+# <!ENTITY name "&#x3B1;">, <!ENTITY name CDATA "&#945;">,
+# <!ENTITY name SDATA "[alpha ]"--comment-->; parameter entities (%) are skipped
+ENTITY_DECL_PATTERN = re.compile(
+    r"""<!ENTITY\s+(%\s+)?([^\s"']+)\s+(?:(CDATA|SDATA|PI)\s+)?(?:"([^"]*)"|'([^']*)')"""
+)
+CHAR_REF_PATTERN = re.compile(r"&#(?:x([0-9a-fA-F]+)|([0-9]+));?")
+
+
+def _expand_char_refs(literal):
+    """Text of an entity literal, or None if it refers to other entities."""
+    text = CHAR_REF_PATTERN.sub(
+        lambda m: chr(int(m.group(1), 16) if m.group(1) else int(m.group(2))), literal
+    )
+    if "&" in text or "%" in text or not text:
+        return None
+    return text
+
+
+def parse_entity_set(text):
+    """
+    Returns {name: replacement text or None} for the general entities
+    declared in an XML or SGML entity set. SDATA entities (ISO SGML sets
+    describe the character, e.g. "[aacgr ]") and entities built from other
+    entities are declared with None; names the substitution pattern cannot
+    match are skipped.
+    """
+    entities = {}
+    for match in ENTITY_DECL_PATTERN.finditer(COMMENT_PATTERN.sub("", text)):
+        parameter, name, kind = match.group(1), match.group(2), match.group(3)
+        if parameter or not ENTITY_NAME_PATTERN.fullmatch(name) or name in entities:
+            continue  # First declaration wins, as in SGML and XML
+        literal = match.group(4) if match.group(4) is not None else match.group(5)
+        entities[name] = None if kind == "SDATA" else _expand_char_refs(literal)
+    return entities
+
+
+def entity_set_files(directory=ENTITY_SET_DIR):
+    """The *.ent files of directory in load order: name order, project set last."""
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.lower().endswith(".ent"))
+    except OSError:
+        return []
+    names.sort(key=lambda n: n == PROJECT_ENTITY_SET)
+    return [os.path.join(directory, n) for n in names]
+
+
+def read_entity_set(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return parse_entity_set(f.read())
+
+
+# ========== TABLES ==========
+class EntityTables:
+    """Result of build_tables(); frozen sets and a plain dict (marshal-friendly)."""
+    __slots__ = ("standard", "declared", "substitutions", "unresolved")
+
+    def __init__(self, standard, declared, substitutions, unresolved):
+        self.standard = standard              # valid without config.CUSTOM_ENTITIES
+        self.declared = declared              # standard + CUSTOM_ENTITIES
+        self.substitutions = substitutions    # {name: '&#N;'} for the preprocessor
+        self.unresolved = unresolved          # declared names lxml will not know
+
+
+def to_numeric(text):
+    """'ά' -> '&#940;'; multi-character replacements give several references."""
+    return "".join(f"&#{ord(ch)};" for ch in text)
+
+
+def build_tables(custom_entities=None, entity_files=None):
+    """
+    Builds EntityTables from the sources listed in the module docstring.
+    custom_entities defaults to config.CUSTOM_ENTITIES and entity_files to
+    entity_set_files().
+    """
+    from html.entities import html5  # Only needed when the tables are rebuilt
+    if custom_entities is None:
+        custom_entities = config.CUSTOM_ENTITIES
+    if entity_files is None:
+        entity_files = entity_set_files()
+
+    standard = set(XML_PREDEFINED_ENTITIES | BASE_ENTITIES)
+    iso_values, project_values = {}, {}
+    for path in entity_files:
+        declared = read_entity_set(path)
+        standard.update(declared)
+        target = project_values if os.path.basename(path) == PROJECT_ENTITY_SET else iso_values
+        target.update((name, value) for name, value in declared.items() if value is not None)
+    standard = frozenset(standard)
+    declared = standard.union(custom_entities)
+
+    substitutions = {}
+    for name in declared:
+        value = html5.get(name + ";")
+        if value:
+            substitutions[name] = to_numeric(value)
+    substitutions.update((name, to_numeric(value)) for name, value in iso_values.items())
+    substitutions.update(ENTITY_TO_NUMERIC)
+    substitutions.update((name, to_numeric(value)) for name, value in project_values.items())
+    for name in XML_PREDEFINED_ENTITIES:
+        substitutions.pop(name, None)  # lxml handles these itself
+
+    unresolved = frozenset(name for name in declared
+                           if name not in substitutions and name not in XML_PREDEFINED_ENTITIES)
+    return EntityTables(standard, declared, substitutions, unresolved)
+
+
+if __name__ == "__main__":
+    files = entity_set_files()
+    tables = build_tables(entity_files=files)
+    print(f"📚 Entity sets: {', '.join(os.path.basename(p) for p in files) or 'none'}")
+    print(f"   {len(tables.declared)} declared names, {len(tables.substitutions)} substitutions")
+    if tables.unresolved:
+        print(f"⚠️ {len(tables.unresolved)} declared names have no replacement "
+              f"(lxml reports them as undefined):")
+        print("   " + " ".join(sorted(tables.unresolved)))
+    else:
+        print("✅ Every declared name has a replacement")
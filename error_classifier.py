@@ -0,0 +1,115 @@
+"""
+Maps errors to Repent / Reptag / CheckSGM.
+
+libxml2 errors are classified by their structured code (entry.domain,
+entry.type) through a table built once at import; messages without a code
+(checker output, plain strings from older callers) go through an explicit
+prefix table. Nothing is matched by substring, so "attribute" or "length"
+no longer land in Repent because they contain "lt"/"gt".
+"""
+from lxml import etree
+
+REPENT = "Repent"
+REPTAG = "Reptag"
+CHECKSGM = "CheckSGM"
+CATEGORIES = (REPENT, REPTAG, CHECKSGM)
+SYNTAX_PREFIX = "XML Syntax error: "
+
+# lxml ErrorTypes names per category; names missing from the installed
+# libxml2 are skipped when the table is built
+ENTITY_ERROR_TYPES = (
+    "ERR_UNDECLARED_ENTITY", "WAR_UNDECLARED_ENTITY",
+    "ERR_ENTITYREF_SEMICOL_MISSING", "ERR_ENTITYREF_NO_NAME", "ERR_ENTITYREF_AT_EOF",
+    "ERR_ENTITYREF_IN_PROLOG", "ERR_ENTITYREF_IN_EPILOG", "ERR_ENTITYREF_IN_DTD",
+    "ERR_CHARREF_AT_EOF", "ERR_CHARREF_IN_PROLOG", "ERR_CHARREF_IN_EPILOG",
+    "ERR_CHARREF_IN_DTD", "ERR_INVALID_CHARREF", "ERR_INVALID_DEC_CHARREF",
+    "ERR_INVALID_HEX_CHARREF", "ERR_UNPARSED_ENTITY", "ERR_ENTITY_IS_EXTERNAL",
+    "ERR_ENTITY_IS_PARAMETER", "ERR_ENTITY_LOOP", "ERR_ENTITY_BOUNDARY",
+    "ERR_ENTITY_PE_INTERNAL", "ERR_ENTITY_NOT_FINISHED", "ERR_LT_IN_ATTRIBUTE",
+)
+TAG_ERROR_TYPES = (
+    "ERR_TAG_NAME_MISMATCH", "ERR_TAG_NOT_FINISHED", "ERR_GT_REQUIRED",
+    "ERR_LTSLASH_REQUIRED", "ERR_ELEMCONTENT_NOT_STARTED", "ERR_ELEMCONTENT_NOT_FINISHED",
+    "ERR_NOT_WELL_BALANCED",
+)
+
+
+def _build_type_table():
+    table = {}
+    for category, names in ((REPENT, ENTITY_ERROR_TYPES), (REPTAG, TAG_ERROR_TYPES)):
+        for name in names:
+            code = getattr(etree.ErrorTypes, name, None)
+            if code is not None:
+                table[code] = category
+    return table
+
+
+# {ErrorTypes code: category}; any other parser code is CheckSGM
+CATEGORY_BY_TYPE = _build_type_table()
+
+# libxml2 reuses some codes for unrelated cases; told apart by the start
+# of the message
+AMBIGUOUS_TYPES = {
+    etree.ErrorTypes.ERR_NAME_REQUIRED: (
+        ("xmlParseEntityRef", REPENT),   # '&' not followed by a name
+        ("StartTag:", REPTAG),           # '<' not followed by a tag name
+    ),
+    etree.ErrorTypes.ERR_INVALID_CHAR: (
+        ("xmlParseCharRef", REPENT),     # &#N; naming a forbidden character
+    ),
+}
+
+# Messages without an lxml code: checker output first, then the libxml2
+# messages of the codes above for callers that only kept the text
+FALLBACK_PREFIXES = (
+    ("Invalid entity", REPENT),
+    ("Only <fnt", REPTAG),
+    ("<FN> contains", REPTAG),
+    ("Opening and ending tag mismatch", REPTAG),
+    ("Premature end of data in tag", REPTAG),
+    ("Couldn't find end of Start Tag", REPTAG),
+    ("StartTag:", REPTAG),
+    ("Entity '", REPENT),
+    ("xmlParseEntityRef", REPENT),
+    ("EntityRef:", REPENT),
+    ("xmlParseCharRef", REPENT),
+    ("CharRef:", REPENT),
+    ("Unescaped '<'", REPENT),
+)
+# Tag checker messages that start with the tag: "<x> must be inside <FN> ...",
+# matched on the text after "<x> "
+FALLBACK_TAG_PREFIXES = (
+    ("must be inside <FN>", REPTAG),
+    ("is a non-closing tag", REPTAG),
+    ("is not in SUPPORTED_TAGS", REPTAG),  # lint.py
+)
+
+
+def classify_entry(entry):
+    """Category of an lxml error log entry, from its domain and type codes."""
+    if entry.domain != etree.ErrorDomains.PARSER:
+        return CHECKSGM
+    category = CATEGORY_BY_TYPE.get(entry.type)
+    if category is not None:
+        return category
+    refinements = AMBIGUOUS_TYPES.get(entry.type)
+    if refinements:
+        for prefix, category in refinements:
+            if entry.message.startswith(prefix):
+                return category
+    return CHECKSGM
+
+
+def classify_message(msg):
+    """Category of a message that carries no lxml code (see FALLBACK_PREFIXES)."""
+    if msg.startswith(SYNTAX_PREFIX):
+        msg = msg[len(SYNTAX_PREFIX):]
+    for prefix, category in FALLBACK_PREFIXES:
+        if msg.startswith(prefix):
+            return category
+    if msg.startswith("<"):
+        rest = msg.partition("> ")[2]
+        for prefix, category in FALLBACK_TAG_PREFIXES:
+            if rest.startswith(prefix):
+                return category
+    return CHECKSGM
@@ -1,12 +1,20 @@
+import os
 from typing import List, Tuple, Dict
-from parser import parse_xml, preprocess_file_content
-from config import CUSTOM_ENTITIES, DEFAULT_REQUIRED_TAGS, NON_CLOSING_TAGS, SUPPORTED_TAGS
+from parser import parse_xml, preprocess, POST_RECOVERY_NOTE
+from config import CUSTOM_ENTITIES, DEFAULT_REQUIRED_TAGS, NON_CLOSING_TAGS
 from entity_checker import check_entities
 from tag_checker import validate_tags
+from instrumentation import NULL_INSTRUMENTATION
+from file_loader import load_file
+from error_classifier import classify_message, CATEGORIES, SYNTAX_PREFIX
 
 
 def categorize_errors(errors: List[Tuple]) -> Dict[str, List[Tuple]]:
-    """Categorizes errors into REPENT, REPTAG, CHECKSGM."""
+    """
+    Categorizes errors into REPENT, REPTAG, CHECKSGM.
+    Errors that carry a category keep it; the rest are classified by
+    error_classifier.classify_message.
+    """
     categorized = {
         "REPENT": [],
         "REPTAG": [],
@@ -21,66 +29,68 @@ def categorize_errors(errors: List[Tuple]) -> Dict[str, List[Tuple]]:
             category = None
 
         # Clean the message by removing "XML Syntax error: " prefix
-        msg = msg.replace("XML Syntax error: ", "")
-        msg_lower = msg.lower()
-
-        if category == "Repent" or any(kw in msg_lower for kw in ["unescaped", "xmlparseentityref", "no name", "amp", "lt", "gt", "semicolon"]):
-            categorized["REPENT"].append((line, msg))  # Removed column number
-        elif category == "Reptag" or any(kw in msg_lower for kw in [
-            "tag mismatch", "misnested", "unknown tag", "must be inside", "must not be inside"
-        ]):
-            categorized["REPTAG"].append((line, msg))  # Removed column number
-        else:
-            categorized["CHECKSGM"].append((line, msg))  # Removed column number
+        msg = msg.replace(SYNTAX_PREFIX, "")
+        if category not in CATEGORIES:
+            category = classify_message(msg)
+        categorized[category.upper()].append((line, msg))  # Removed column number
 
     return categorized
 
 
-def run_all_checks(file_path, custom_entities=None, required_tags=None) -> Dict[str, List[Tuple]]:
+def run_all_checks(file_path, custom_entities=None, required_tags=None,
+                   recover=False, instrumentation=None) -> Dict[str, List[Tuple]]:
     """
     Main validation function.
     Uses raw content for line references,
     but parses cleaned content for XML structure.
+    With recover=True, all syntax errors are reported and the entity/tag
+    checks still run on the recovered tree instead of stopping early.
+    instrumentation (see instrumentation.Instrumentation) records each stage.
+    required_tags is deprecated and ignored, like validate_tags' allowed_tags.
     """
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+    file_id = os.path.basename(file_path)
     all_errors = []
 
-    # Step 1: Read raw content
-    with open(file_path, 'r', encoding='utf-8') as f:
-        raw_content = f.read()
+    # Step 1: Read raw content; undecodable bytes are reported, not fatal
+    with instrumentation.stage(file_id, "read"):
+        loaded = load_file(file_path)
+        raw_content = loaded.text
+    all_errors.extend(loaded.decode_errors)
 
-    # Step 2: Preprocess content for parsing, keep line mapping
-    cleaned_content = preprocess_file_content(raw_content)
+    # Step 2: Preprocess content once for parsing
+    with instrumentation.stage(file_id, "preprocess"):
+        preprocessed = preprocess(raw_content)
 
     # Step 3: Parse cleaned XML
-    tree, parse_errors, _ = parse_xml(raw_content)
-    
-    # Clean parse errors before extending
-    cleaned_parse_errors = []
-    for error in parse_errors:
-        if len(error) == 4:
-            cat, line, col, msg = error
-            cleaned_parse_errors.append((cat, line, msg.replace("XML Syntax error: ", "")))
-        else:
-            line, col, msg = error
-            cleaned_parse_errors.append((line, msg.replace("XML Syntax error: ", "")))
-    
-    all_errors.extend(cleaned_parse_errors)
+    with instrumentation.stage(file_id, "parse") as probe:
+        tree, parse_errors, position_map = parse_xml(raw_content, preprocessed, recover=recover)
+        probe.errors = len(parse_errors)
+
+    # Keep (category, line, col, msg); categorize_errors strips prefix and column
+    all_errors.extend(parse_errors)
 
-    # Step 4: Stop here if not parsable
+    # Step 4: Stop here if not parsable (or nothing was recovered)
     if tree is None:
         return categorize_errors(all_errors)
 
     # Step 5: Entity validation on raw content
-    entity_errors = check_entities(raw_content, custom_entities or CUSTOM_ENTITIES)
-    all_errors.extend([(line, msg) for _, line, _, msg in entity_errors])  # Remove column
+    with instrumentation.stage(file_id, "check_entities") as probe:
+        entity_errors = check_entities(raw_content, custom_entities or CUSTOM_ENTITIES)
+        probe.errors = len(entity_errors)
+    all_errors.extend(entity_errors)
 
     # Step 6: Tag validation with corrected line numbers
-    tag_errors = validate_tags(
-        tree,
-        allowed_tags=required_tags or SUPPORTED_TAGS,
-        non_closing_tags=NON_CLOSING_TAGS,
-    )
-    all_errors.extend([(line, msg) for _, line, _, msg in tag_errors])  # Remove column
+    with instrumentation.stage(file_id, "validate_tags") as probe:
+        tag_errors = validate_tags(
+            tree,
+            non_closing_tags=NON_CLOSING_TAGS,
+            position_map=position_map,
+        )
+        probe.errors = len(tag_errors)
+    if recover and parse_errors:
+        tag_errors = [(cat, line, col, msg + POST_RECOVERY_NOTE) for cat, line, col, msg in tag_errors]
+    all_errors.extend(tag_errors)
 
     return categorize_errors(all_errors)
 
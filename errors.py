@@ -0,0 +1,230 @@
+import os
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+# Message codes
+XML_SYNTAX = "XML_SYNTAX"
+INVALID_ENTITY = "INVALID_ENTITY"
+TAG_RULE = "TAG_RULE"
+UNEXPECTED = "UNEXPECTED"
+ENCODING = "ENCODING"
+UNSUPPORTED_TAG = "UNSUPPORTED_TAG"
+NEEDS_PARSE = "NEEDS_PARSE"  # tag_lexer.py: a construct only the full parse can check
+STREAM_TRUNCATED = "STREAM_TRUNCATED"  # stream_validator.py: recovery stopped before the end
+
+# Appended to tag findings made on a tree libxml2 had to repair (recover=True)
+POST_RECOVERY_NOTE = " (post-recovery)"
+
+CATEGORY_COLORS = {
+    "Repent": "\033[91m",    # Red
+    "Reptag": "\033[93m",    # Yellow
+    "CheckSGM": "\033[96m",  # Cyan
+    "Other": "\033[90m"      # Gray
+}
+COLOR_RESET = "\033[0m"
+
+
+class ValidationError:
+    """
+    One validation finding. The context line is not copied when the error
+    is created: it is read from `source` (a LineIndex) the first time
+    .context is used, or given up front when already known.
+    """
+
+    __slots__ = ("category", "file_id", "line", "column", "page", "code", "message",
+                 "_source", "_context")
+
+    def __init__(self, category, file_id, line, column, page, code, message,
+                 source=None, context=None):
+        self.category = category
+        self.file_id = file_id
+        self.line = line
+        self.column = column
+        self.page = page
+        self.code = code
+        self.message = message
+        self._source = source
+        self._context = context
+
+    @property
+    def context(self):
+        if self._context is None:
+            self._context = self._source.line_text(self.line).strip() if self._source else ""
+            self._source = None
+        return self._context
+
+    def resolve(self):
+        """Resolves the context now and drops the reference to the source text."""
+        self.context
+        return self
+
+    def key(self):
+        """Identity of the finding, independent of its context text."""
+        return (self.category, self.line, self.page, self.message)
+
+    def to_dict(self):
+        return {
+            "category": self.category,
+            "file": self.file_id,
+            "line": self.line,
+            "column": self.column,
+            "page": self.page,
+            "code": self.code,
+            "message": self.message,
+            "context": self.context,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["category"], data["file"], data["line"], data["column"],
+                   data["page"], data["code"], data["message"], context=data["context"])
+
+    def __reduce__(self):
+        # Crossing a process boundary: send the context line, not the whole source
+        return (ValidationError, (self.category, self.file_id, self.line, self.column,
+                                  self.page, self.code, self.message, None, self.context))
+
+    def __eq__(self, other):
+        if not isinstance(other, ValidationError):
+            return NotImplemented
+        return self.key() == other.key() and self.file_id == other.file_id
+
+    def __hash__(self):
+        return hash((self.file_id,) + self.key())
+
+    def __repr__(self):
+        return (f"ValidationError({self.category!r}, {self.file_id!r}, line={self.line}, "
+                f"page={self.page!r}, code={self.code!r}, message={self.message!r})")
+
+
+# ========== FILE IDS ==========
+def file_ids(file_paths):
+    """
+    Names the files are reported under: their paths relative to the
+    deepest folder they share, so the files of one folder keep their bare
+    names and same-named files from different folders stay apart.
+    """
+    paths = [os.path.abspath(path) for path in file_paths]
+    if not paths:
+        return []
+    try:
+        root = os.path.commonpath([os.path.dirname(path) for path in paths])
+    except ValueError:  # Different drives
+        return paths
+    return [os.path.relpath(path, root) for path in paths]
+
+
+# ========== SINKS ==========
+class ErrorSink(ABC):
+    """
+    Receives errors as they are produced. validate_all_files calls
+    begin_file/emit/end_file per file (see emit_file) and close() once at
+    the end; result() is what validate_all_files returns. Subclasses
+    implement emit.
+    """
+
+    def begin_file(self, file_id):
+        pass
+
+    @abstractmethod
+    def emit(self, error):
+        pass
+
+    def end_file(self, file_id, error_count):
+        pass
+
+    def close(self):
+        pass
+
+    def result(self):
+        return None
+
+
+def emit_file(sink, file_id, errors):
+    """Reports one file's errors to sink: begin_file, emit per error, end_file."""
+    sink.begin_file(file_id)
+    for error in errors:
+        sink.emit(error)
+    sink.end_file(file_id, len(errors))
+
+
+class ListSink(ErrorSink):
+    """Collects errors per file in memory: {file_id: [ValidationError]}."""
+
+    def __init__(self):
+        self.results = {}
+
+    def begin_file(self, file_id):
+        self.results[file_id] = []
+
+    def emit(self, error):
+        # Resolve now so the stored error does not keep the document text alive
+        self.results.setdefault(error.file_id, []).append(error.resolve())
+
+    def result(self):
+        return {file_id: self.results[file_id] for file_id in sorted(self.results)}
+
+
+class ConsoleSink(ErrorSink):
+    """Prints every error as it is produced; only per-file counts are kept."""
+
+    def __init__(self, show_context=True):
+        self.show_context = show_context
+        self.counts = {}
+
+    def emit(self, error):
+        color = CATEGORY_COLORS.get(error.category, "")
+        print(f"{color}[{error.category}]{COLOR_RESET} {error.file_id} "
+              f"[Page {error.page}, Line {error.line}] {error.message}")
+        if self.show_context:
+            print(f"       Context: '{error.context[:100]}'")
+
+    def end_file(self, file_id, error_count):
+        self.counts[file_id] = error_count
+        if error_count == 0:
+            print(f"✅ {file_id}: No errors found")
+
+    def close(self):
+        total_errors = sum(self.counts.values())
+        print(f"\n📊 SUMMARY: {len(self.counts)} files scanned, {total_errors} total issues")
+
+    def result(self):
+        return dict(self.counts)
+
+
+def group_by_category(errors):
+    """Returns {category: [errors]} preserving order."""
+    groups = defaultdict(list)
+    for error in errors:
+        groups[error.category].append(error)
+    return groups
+
+
+def print_error_report(results):
+    """Prints the validation report with context and page numbers"""
+    # Built as one string: a print() per line is slow for large reports
+    lines = ["", "=" * 40, "✅ XML VALIDATION REPORT".center(40), "=" * 40]
+
+    for filename, errors in results.items():
+        if not errors:
+            lines.append(f"\n✅ {filename}: No errors found")
+            continue
+
+        lines.append(f"\n❌ {filename}: {len(errors)} ISSUES FOUND")
+
+        # Print errors by category
+        for category, group in group_by_category(errors).items():
+            lines.append(f"\n{CATEGORY_COLORS.get(category, '')}══ {category.upper()} ERRORS ({len(group)}) ══{COLOR_RESET}")
+
+            for error in group:
+                lines.append(f"  [Page {error.page}, Line {error.line}] {error.message}")
+                lines.append(f"       Context: '{error.context[:100]}'...")
+                lines.append("")  # Blank line after each error
+
+    # Print summary
+    total_files = len(results)
+    total_errors = sum(len(errs) for errs in results.values())
+    lines.append("\n" + "=" * 40)
+    lines.append(f"📊 SUMMARY: {total_files} files scanned, {total_errors} total issues")
+    lines.append("=" * 40)
+    print("\n".join(lines))
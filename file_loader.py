@@ -0,0 +1,177 @@
+import codecs
+import mmap
+import os
+from config import STREAM_CHUNK_SIZE
+
+# Bytes inspected to pick an encoding
+DETECT_BLOCK_SIZE = 64 * 1024
+# Used when a file without BOM is not valid UTF-8 (older sources)
+FALLBACK_ENCODING = "cp1252"
+
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+# Encodings where '<', '&', newline etc. are single ASCII bytes, so the
+# page-marker and entity scans can run on the raw bytes
+ASCII_COMPATIBLE = {"utf-8", "cp1252", "latin-1", "ascii"}
+
+
+def detect_encoding(head):
+    """
+    Returns (encoding, bom_length) from the first block of a file: a BOM
+    wins, then UTF-16 recognised by its NUL bytes, else UTF-8. Files that
+    are not valid UTF-8 are caught when decoding (see LoadedFile.text).
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    # ASCII text in UTF-16 without BOM: every other byte is NUL
+    if len(head) >= 2 and head.count(0) * 4 >= len(head):
+        return ("utf-16-le" if head[1::2].count(0) > head[0::2].count(0) else "utf-16-be"), 0
+    return "utf-8", 0
+
+
+class LoadedFile:
+    """
+    One input file: raw bytes through a read-only mmap, text decoded on
+    first use. A file that is not valid in its detected encoding is
+    decoded with FALLBACK_ENCODING instead and the first bad byte is
+    recorded in decode_errors as ("CheckSGM", line, column, message).
+    """
+
+    def __init__(self, buffer, encoding, bom_length=0, path=None, text=None):
+        self.buffer = buffer
+        self.encoding = encoding
+        self.bom_length = bom_length
+        self.path = path
+        self._text = text
+        self.decode_errors = []
+
+    @classmethod
+    def from_text(cls, text):
+        """Wraps content that is already a string (no bytes to scan)."""
+        return cls(None, "utf-8", text=text)
+
+    @property
+    def byte_scannable(self):
+        """True when byte-level scans can run on scan_buffer."""
+        return self.buffer is not None and self.encoding in ASCII_COMPATIBLE
+
+    @property
+    def scan_buffer(self):
+        """
+        The mapped bytes after the BOM for byte-level scans (offsets then
+        line up with the decoded text's lines), else the decoded text.
+        """
+        if not self.byte_scannable:
+            return self.text
+        if self.bom_length:
+            return memoryview(self.buffer)[self.bom_length:]
+        return self.buffer
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = self._decode()
+        return self._text
+
+    def _decode(self):
+        data = memoryview(self.buffer)[self.bom_length:]
+        try:
+            # str() decodes straight from the mmap; no intermediate bytes copy
+            return str(data, self.encoding)
+        except UnicodeDecodeError as e:
+            position = self.bom_length + e.start
+            line = self.buffer[:position].count(b"\n") + 1
+            line_start = self.buffer.rfind(b"\n", 0, position) + 1
+            column = len(str(self.buffer[line_start:position], self.encoding, "replace")) + 1
+            bad_byte = self.buffer[position]
+            self.decode_errors.append((
+                "CheckSGM", line, column,
+                f"Invalid {self.encoding.upper()} byte 0x{bad_byte:02X}; "
+                f"file decoded as {FALLBACK_ENCODING}"
+            ))
+            self.encoding = FALLBACK_ENCODING
+            return str(data, FALLBACK_ENCODING, "replace")
+        finally:
+            data.release()
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            try:
+                self.buffer.close()
+            except BufferError:
+                pass  # A scan_buffer view is still alive; released with it
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def load_file(file_path):
+    """
+    Memory-maps file_path and detects its encoding from the first block.
+    The map is released when the LoadedFile (and any LineIndex built on
+    its buffer) is garbage collected, or explicitly with close().
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            buffer = b""  # mmap cannot map an empty file
+        else:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    encoding, bom_length = detect_encoding(buffer[:DETECT_BLOCK_SIZE])
+    return LoadedFile(buffer, encoding, bom_length, file_path)
+
+
+def iter_line_chunks(file_path, chunk_size=STREAM_CHUNK_SIZE, encoding="utf-8", bom_length=0,
+                     decode_errors=None):
+    """
+    Yields (first_line, text) pieces of roughly chunk_size characters that
+    always end on a line break, so no preprocessing or entity pattern is
+    split across pieces. A single line longer than chunk_size is yielded whole.
+    Bytes are decoded incrementally with encoding (after a BOM of bom_length
+    bytes). On the first invalid byte the rest of the file is decoded with
+    file_loader.FALLBACK_ENCODING and a ("CheckSGM", line, column, message)
+    tuple is appended to decode_errors.
+    """
+    first_line = 1
+    carry = ""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(file_path, 'rb') as f:
+        f.seek(bom_length)
+        while True:
+            raw = f.read(chunk_size)
+            try:
+                block = decoder.decode(raw, final=not raw)
+            except UnicodeDecodeError as e:
+                # e.object is the decoder's pending bytes plus raw
+                good = carry + e.object[:e.start].decode(encoding)
+                line_start = good.rfind("\n") + 1
+                if decode_errors is not None:
+                    decode_errors.append((
+                        "CheckSGM", first_line + good.count("\n"), len(good) - line_start + 1,
+                        f"Invalid {encoding.upper()} byte 0x{e.object[e.start]:02X}; "
+                        f"file decoded as {FALLBACK_ENCODING}"
+                    ))
+                decoder = codecs.getincrementaldecoder(FALLBACK_ENCODING)("replace")
+                block = e.object[:e.start].decode(encoding) + decoder.decode(e.object[e.start:])
+            buffer = carry + block
+            cut = buffer.rfind("\n") + 1
+            if cut == 0:
+                carry = buffer
+            else:
+                piece, carry = buffer[:cut], buffer[cut:]
+                yield first_line, piece
+                first_line += piece.count("\n")
+            if not raw:
+                break
+    if carry:
+        yield first_line, carry
@@ -0,0 +1,167 @@
+import json
+import time
+from collections import defaultdict
+
+
+class _StageProbe:
+    """Context manager timing one stage; the caller may set .errors inside it."""
+
+    __slots__ = ("owner", "file_id", "name", "errors", "_wall", "_cpu", "_memory")
+
+    def __init__(self, owner, file_id, name):
+        self.owner = owner
+        self.file_id = file_id
+        self.name = name
+        self.errors = 0
+
+    def __enter__(self):
+        if self.owner.trace_memory:
+            import tracemalloc
+            tracemalloc.reset_peak()
+            self._memory = tracemalloc.get_traced_memory()[0]
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        # Peak allocated on top of what was live when the stage started
+        peak = None
+        if self.owner.trace_memory:
+            import tracemalloc
+            peak = tracemalloc.get_traced_memory()[1] - self._memory
+        self.owner.record({
+            "file": self.file_id,
+            "stage": self.name,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_bytes": peak,
+            "errors": self.errors,
+        })
+        return False
+
+
+class _NullProbe:
+    """Shared no-op probe used when instrumentation is disabled."""
+
+    __slots__ = ()
+    errors = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass  # Discard probe.errors = ...
+
+
+_NULL_PROBE = _NullProbe()
+
+
+class NullInstrumentation:
+    """Disabled instrumentation: stage() hands out one shared no-op probe."""
+
+    enabled = False
+    trace_memory = False
+
+    def stage(self, file_id, name):
+        return _NULL_PROBE
+
+    def extend(self, records):
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class Instrumentation:
+    """
+    Records wall time, CPU time, peak traced memory (trace_memory=True) and
+    error counts per file and pipeline stage. Usage:
+
+        with instrumentation.stage(file_id, "parse") as probe:
+            tree, errors, _ = parse_xml(...)
+            probe.errors = len(errors)
+
+    Every record is a dict passed to each registered callback as it is made.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=False, callbacks=()):
+        self.trace_memory = trace_memory
+        self.callbacks = list(callbacks)
+        self.records = []
+        if trace_memory:
+            # Imported on demand: most runs never trace memory
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def stage(self, file_id, name):
+        return _StageProbe(self, file_id, name)
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def record(self, record):
+        self.records.append(record)
+        for callback in self.callbacks:
+            callback(record)
+
+    def extend(self, records):
+        """Merges records produced elsewhere (e.g. in a worker process)."""
+        for record in records:
+            self.record(record)
+
+    def summary(self):
+        """Returns per-stage totals: calls, wall_s, cpu_s, peak_bytes (max), errors."""
+        totals = defaultdict(lambda: {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                      "peak_bytes": None, "errors": 0})
+        for record in self.records:
+            row = totals[record["stage"]]
+            row["calls"] += 1
+            row["wall_s"] += record["wall_s"]
+            row["cpu_s"] += record["cpu_s"]
+            row["errors"] += record["errors"]
+            if record["peak_bytes"] is not None:
+                row["peak_bytes"] = max(row["peak_bytes"] or 0, record["peak_bytes"])
+        return dict(totals)
+
+    def print_summary(self):
+        """Prints the per-stage summary table."""
+        totals = self.summary()
+        total_wall = sum(row["wall_s"] for row in totals.values()) or 1.0
+        print("\n" + "=" * 78)
+        print("⏱ PIPELINE STAGE SUMMARY".center(78))
+        print("=" * 78)
+        print(f"{'stage':<22}{'calls':>7}{'wall ms':>11}{'%':>7}{'cpu ms':>11}"
+              f"{'peak KiB':>11}{'errors':>9}")
+        for stage, row in totals.items():
+            peak = f"{row['peak_bytes'] / 1024:.0f}" if row["peak_bytes"] is not None else "-"
+            print(f"{stage:<22}{row['calls']:>7}{row['wall_s'] * 1000:>11.1f}"
+                  f"{100 * row['wall_s'] / total_wall:>7.1f}{row['cpu_s'] * 1000:>11.1f}"
+                  f"{peak:>11}{row['errors']:>9}")
+
+
+class JsonLinesExporter:
+    """Instrumentation callback writing one JSON object per stage record."""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,98 @@
+from array import array
+import bisect
+import re
+
+# <Page N> markers (as rewritten by preprocess_file_content) and <P20>N</P20> page numbers
+PAGE_MARKER_PATTERN = re.compile(
+    r"<[^\S\n]*(?i:page)[^\S\n]+(\d+)[^\S\n]*>|<P20>(\d+)</P20>"
+)
+NEWLINE_PATTERN = re.compile(r"\n")
+# Same patterns for byte buffers (mmap) of ASCII-compatible encodings
+PAGE_MARKER_PATTERN_BYTES = re.compile(PAGE_MARKER_PATTERN.pattern.encode("ascii"))
+NEWLINE_PATTERN_BYTES = re.compile(rb"\n")
+
+
+class PageTable:
+    """Sorted (first line, label) page boundaries with O(log n) lookup."""
+
+    def __init__(self):
+        self.page_lines = array('q')
+        self.page_labels = []
+
+    def add(self, line, label):
+        """Records a page starting at line; lines must be added in order."""
+        self.page_lines.append(line)
+        self.page_labels.append(label)
+
+    def page_for_line(self, line, default="?"):
+        """Returns the label of the page a line belongs to."""
+        i = bisect.bisect_right(self.page_lines, line)
+        return self.page_labels[i - 1] if i else default
+
+
+class LineIndex:
+    """
+    Per-document lookup tables built once from the raw content:
+    - line start offsets (array) for line text and offset -> line/column
+    - sorted page-boundary table for the page of any line
+    All lookups are O(log n). Lines and columns are 1-based.
+    text may also be a bytes-like buffer (e.g. file_loader's mmap) in an
+    ASCII-compatible encoding: offsets are then byte offsets, while
+    line_column() and line_text() still return character columns and str.
+    """
+
+    def __init__(self, text, encoding="utf-8"):
+        self.text = text
+        self.encoding = encoding
+        self.binary = not isinstance(text, str)
+        newline = NEWLINE_PATTERN_BYTES if self.binary else NEWLINE_PATTERN
+        page_marker = PAGE_MARKER_PATTERN_BYTES if self.binary else PAGE_MARKER_PATTERN
+        self.line_starts = array('q', [0])
+        self.line_starts.extend(m.end() for m in newline.finditer(text))
+
+        # Page boundaries: first line of each page and its label, in line order
+        self.pages = PageTable()
+        for match in page_marker.finditer(text):
+            label = match.group(1) or match.group(2)
+            self.pages.add(self.line_of(match.start()), label.decode("ascii") if self.binary else label)
+
+    @property
+    def line_count(self):
+        return len(self.line_starts)
+
+    def line_of(self, offset):
+        """Returns the 1-based line containing offset."""
+        return bisect.bisect_right(self.line_starts, offset)
+
+    def line_column(self, offset):
+        """Returns (line, column) for an offset into the text."""
+        line = self.line_of(offset)
+        start = self.line_starts[line - 1]
+        if self.binary:
+            return line, len(str(self.text[start:offset], self.encoding, "replace")) + 1
+        return line, offset - start + 1
+
+    def offset(self, line, column=1):
+        """
+        Returns the offset of (line, column); clamped to the text bounds.
+        On a byte buffer the column is counted in bytes.
+        """
+        if line < 1:
+            return 0
+        if line > len(self.line_starts):
+            return len(self.text)
+        return min(self.line_starts[line - 1] + max(column, 1) - 1, len(self.text))
+
+    def line_text(self, line):
+        """Returns the text of a line without its line ending ('' if out of range)."""
+        if line < 1 or line > len(self.line_starts):
+            return ""
+        start = self.line_starts[line - 1]
+        end = self.line_starts[line] - 1 if line < len(self.line_starts) else len(self.text)
+        if self.binary:
+            return str(self.text[start:end], self.encoding, "replace").rstrip("\r")
+        return self.text[start:end].rstrip("\r")
+
+    def page_for_line(self, line, default="?"):
+        """Returns the label of the page a line belongs to."""
+        return self.pages.page_for_line(line, default)
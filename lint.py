@@ -0,0 +1,329 @@
+"""
+Lexer-only lint for triaging batches: tag_lexer's tokenizer over the raw
+text, with no preprocessing, entity substitution or lxml tree. Imports
+neither lxml nor the parser.
+
+Findings:
+- unbalanced tags, checked on a stack the way libxml2 recovers from them:
+  <Page N> and the preprocessor's fnt/fmt rewrites are empty elements, a
+  mismatched closing tag closes the current element, and only the
+  innermost element left open at the end is reported
+- tag_rules' compiled rules (TagRules) on every start tag, and closing
+  tags of fnt variants (Rule 2)
+- tags not in SUPPORTED_TAGS ('fnt*' covers fnt4, ...), once per name
+- entities that are not allowed or have no substitution, bad character
+  references, control characters, malformed or repeated attributes,
+  double hyphens in comments, XML declarations and stray '<'
+- NEEDS_PARSE for what the lexer cannot rule out: namespace prefixes and
+  declarations, non-ASCII names, other reserved processing instructions,
+  CDATA sections, ']]>', nesting near libxml2's depth limit and documents
+  past its text length limit
+
+The full pipeline does not report unsupported tags, so a file whose only
+findings are unsupported tags is clean there as long as lint covers every
+error the pipeline can raise for it: triage_files runs
+validator.validate_files on all other files, NEEDS_PARSE ones included.
+Attributes, and references inside the fnt tags the preprocessor rewrites,
+are checked more strictly than the pipeline does, so lint may send on a
+file the pipeline then passes.
+"""
+import os
+import re
+from line_index import LineIndex
+from file_loader import load_file
+from tag_rules import DEFAULT_RULES, CHILD_ERRORS, CHILD_INVALID, TAG_FRAME, TAG_NO_CLOSE, \
+    TAG_SUPPORTED, CONFIG_SNAPSHOT, ROOT_TAG
+from entity_registry import XML_PREDEFINED_ENTITIES
+from tag_lexer import TAG_TOKEN_PATTERN, MAX_SAFE_DEPTH, MAX_SAFE_LENGTH, AT_START, AT_END, \
+    INVALID_NAME, close_tag_findings, start_tag_findings, comment_findings, markup_findings, text_findings
+from errors import ErrorSink, ListSink, ValidationError, emit_file, file_ids, XML_SYNTAX, INVALID_ENTITY, \
+    TAG_RULE, ENCODING, UNSUPPORTED_TAG, NEEDS_PARSE
+
+ENTITY_NAME_REF_PATTERN = re.compile(r"&([A-Za-z0-9]+);")
+
+# Entities the checker allows and the preprocessor can substitute
+DEFAULT_VALID_ENTITIES = frozenset(
+    name for name in CONFIG_SNAPSHOT.allowed_entities
+    if name in CONFIG_SNAPSHOT.entity_substitutions or name in XML_PREDEFINED_ENTITIES
+)
+
+def _scan_tags(content, rules, findings):
+    """
+    Runs the tag stack over TAG_TOKEN_PATTERN tokens. Tokens come from
+    findall (no match objects), so findings are recorded as (token index,
+    AT_*, category, code, message, index of the token {line} refers to)
+    and located afterwards, only when there are any.
+    """
+    ids, flags, transitions = rules.ids, rules.flags, rules.transitions
+    root_id = rules.tag_id(ROOT_TAG)
+    stack = []  # Open elements: [name, tag_id, token index, has_invalid_child]
+    unsupported = set()
+
+    def check_child(name, tag_id, index):
+        parent = stack[-1] if stack else None
+        parent_id = parent[1] if parent else root_id
+        bits = transitions[parent_id][tag_id]
+        if not bits:
+            return
+        if bits & CHILD_ERRORS:
+            for message in rules.child_errors(bits, parent_id, tag_id, name):
+                findings.append((index, AT_START, "Reptag", TAG_RULE, message, None))
+        if bits & CHILD_INVALID and parent:
+            parent[3] = True
+
+    def close_frame(frame):
+        name, tag_id, index, has_invalid_child = frame
+        if has_invalid_child and flags[tag_id] & TAG_FRAME:
+            findings.append((index, AT_START, "Reptag", TAG_RULE, rules.frame_error(tag_id), None))
+
+    for index, (page, empty, close, name, rest, comment, markup) in enumerate(
+            TAG_TOKEN_PATTERN.findall(content)):
+        if name:
+            tag_id = ids.get(name)
+            if tag_id is None:
+                tag_id = rules.tag_id(name)
+            if close:
+                if rest and not rest.isspace():
+                    findings.extend((index,) + finding + (None,) for finding in close_tag_findings(rest))
+                elif flags[tag_id] & TAG_NO_CLOSE:
+                    # Rule 2: fnt variants cannot have closing tags
+                    findings.append((index, AT_START, "Reptag", TAG_RULE,
+                                     f"<{name}> is a non-closing tag (do not use </{name}>)", None))
+                elif not stack:
+                    findings.append((index, AT_END, "Reptag", XML_SYNTAX,
+                                     f"Opening and ending tag mismatch: {ROOT_TAG} line 1 and {name}",
+                                     None))
+                else:
+                    top = stack.pop()
+                    if top[0] != name:
+                        # Like libxml2, a mismatched closing tag still closes the current element
+                        findings.append((index, AT_END, "Reptag", XML_SYNTAX,
+                                         f"Opening and ending tag mismatch: {top[0]} line {{line}} "
+                                         f"and {name}", top[2]))
+                    if top[3]:
+                        close_frame(top)
+                continue
+
+            if rest:
+                rest_findings, opens = start_tag_findings(rest)
+                findings.extend((index,) + finding + (None,) for finding in rest_findings)
+                if not opens:
+                    continue
+            if not flags[tag_id] & TAG_SUPPORTED and name not in unsupported:
+                unsupported.add(name)
+                findings.append((index, AT_START, "Reptag", UNSUPPORTED_TAG,
+                                 f"<{name}> is not in SUPPORTED_TAGS", None))
+            # Most start tags have no parent rule: one table lookup decides
+            if transitions[stack[-1][1] if stack else root_id][tag_id]:
+                check_child(name, tag_id, index)
+            if not rest or not rest.rstrip().endswith("/"):
+                stack.append([name, tag_id, index, False])
+                if len(stack) == MAX_SAFE_DEPTH:
+                    findings.append((index, AT_START, "CheckSGM", NEEDS_PARSE,
+                                     f"Nesting of {MAX_SAFE_DEPTH} elements is not checked by lint", None))
+
+        elif page or empty:
+            name = "Page" if page else empty.lower()
+            check_child(name, rules.tag_id(name), index)
+
+        else:
+            if comment:
+                token_findings = comment_findings(comment)
+            elif markup:
+                token_findings = markup_findings(markup)
+            else:
+                token_findings = [INVALID_NAME]
+            findings.extend((index,) + finding + (None,) for finding in token_findings)
+
+    return stack
+
+
+def _locate_tag_findings(content, tag_findings, findings):
+    """Turns _scan_tags findings into (offset, category, code, message, ref offset) entries."""
+    wanted = {finding[0] for finding in tag_findings}
+    wanted.update(finding[5] for finding in tag_findings if finding[5] is not None)
+    last = max(wanted)
+    spans = {}
+    for index, match in enumerate(TAG_TOKEN_PATTERN.finditer(content)):
+        if index in wanted:
+            spans[index] = (match.start(), match.end(), match.start("rest"))
+            if index == last:
+                break
+    for index, where, category, code, message, ref in tag_findings:
+        findings.append((spans[index][where], category, code, message,
+                         None if ref is None else spans[ref][AT_START]))
+
+
+def lint_content(content, file_id="<content>", rules=None, valid_entities=None):
+    """
+    Lints a document held as a string; returns errors.ValidationError
+    records in text order. rules defaults to tag_rules.DEFAULT_RULES and
+    valid_entities to the names that pass both the entity checker and the
+    preprocessor.
+    """
+    rules = rules or DEFAULT_RULES
+    valid_entities = DEFAULT_VALID_ENTITIES if valid_entities is None else valid_entities
+    findings = []  # (offset, category, code, message, offset the message's {line} refers to)
+
+    tag_findings = []
+    stack = _scan_tags(content, rules, tag_findings)
+    if tag_findings:
+        _locate_tag_findings(content, tag_findings, findings)
+    if stack:
+        # As parse_xml reports it: </root> closes the innermost element and
+        # libxml2 stops there
+        name, _, index, _ = stack[-1]
+        end = len(content) - 1 if content.endswith("\n") else len(content)
+        opened = []
+        _locate_tag_findings(content, [(index, AT_START, None, None, None, None)], opened)
+        findings.append((end, "Reptag", XML_SYNTAX,
+                         f"Opening and ending tag mismatch: {name} line {{line}} and {ROOT_TAG}",
+                         opened[0][0]))
+
+    if not valid_entities.issuperset(ENTITY_NAME_REF_PATTERN.findall(content)):
+        for match in ENTITY_NAME_REF_PATTERN.finditer(content):
+            if match.group(1) not in valid_entities:
+                findings.append((match.start(), "Repent", INVALID_ENTITY,
+                                 f"Invalid entity '{match.group(0)}'", None))
+    for offset, category, code, message in text_findings(content):
+        findings.append((offset, category, code, message, None))
+    if len(content) >= MAX_SAFE_LENGTH:
+        findings.append((0, "CheckSGM", NEEDS_PARSE,
+                         f"Documents of {MAX_SAFE_LENGTH} characters or more are not checked by lint",
+                         None))
+
+    if not findings:
+        return []
+    line_index = LineIndex(content)
+    errors = []
+    for offset, category, code, message, ref in sorted(findings, key=lambda f: f[0]):
+        line, column = line_index.line_column(offset)
+        if ref is not None:
+            message = message.replace("{line}", str(line_index.line_of(ref)))
+        errors.append(ValidationError(category, file_id, line, column,
+                                      line_index.page_for_line(line), code, message,
+                                      source=line_index))
+    return errors
+
+
+def lint_file(file_path, file_id=None):
+    """
+    lint_content on a file; a file that is not valid UTF-8 gets an ENCODING
+    finding. file_id defaults to the file name.
+    """
+    file_id = file_id or os.path.basename(file_path)
+    with load_file(file_path) as loaded:
+        content = loaded.text
+        decode_errors = loaded.decode_errors
+    errors = lint_content(content, file_id)
+    if decode_errors:
+        line_index = LineIndex(content)
+        errors[:0] = [
+            ValidationError(category, file_id, line, column, line_index.page_for_line(line),
+                            ENCODING, message, source=line_index)
+            for category, line, column, message in decode_errors
+        ]
+    return errors
+
+
+def needs_full_validation(errors):
+    """True when lint found more than unsupported tags."""
+    return any(error.code != UNSUPPORTED_TAG for error in errors)
+
+
+# ========== BATCHES ==========
+def _lint_task(task):
+    file_path, file_id = task
+    errors = lint_file(file_path, file_id)
+    return file_path, file_id, [error.resolve() for error in errors]
+
+
+class _LintFindingsSink(ErrorSink):
+    """Forwards to sink, adding each file's lint-only findings before its end_file."""
+
+    def __init__(self, sink, findings):
+        self.sink = sink
+        self.findings = findings
+
+    def begin_file(self, file_id):
+        self.sink.begin_file(file_id)
+
+    def emit(self, error):
+        self.sink.emit(error)
+
+    def end_file(self, file_id, error_count):
+        extra = self.findings.get(file_id, ())
+        for error in extra:
+            self.sink.emit(error)
+        self.sink.end_file(file_id, error_count + len(extra))
+
+    def close(self):
+        self.sink.close()
+
+    def result(self):
+        return self.sink.result()
+
+
+def iter_lint_results(file_paths, workers=1, chunksize=16):
+    """
+    Yields (file_path, file_id, lint errors) in input order, file_id as in
+    errors.file_ids; workers as in validate_files.
+    """
+    file_paths = list(file_paths)
+    tasks = list(zip(file_paths, file_ids(file_paths)))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(file_paths))
+    if workers <= 1:
+        for task in tasks:
+            yield _lint_task(task)
+        return
+    # Imported here: serial runs do not need them
+    import multiprocessing
+    from config_snapshot import install_snapshot, snapshot_payload
+    with multiprocessing.Pool(processes=workers, initializer=install_snapshot,
+                              initargs=(snapshot_payload(CONFIG_SNAPSHOT),)) as pool:
+        yield from pool.imap(_lint_task, tasks, chunksize=max(1, chunksize))
+
+
+def lint_files(file_paths, workers=1, chunksize=16, sink=None, verbose=True):
+    """
+    Lints the given files, reporting each one to sink (default ListSink)
+    like validator.validate_files.
+    Returns: sink.result()
+    """
+    sink = sink if sink is not None else ListSink()
+    for _, filename, errors in iter_lint_results(file_paths, workers, chunksize):
+        if verbose:
+            print(f"🧹 Linted: {filename} ({len(errors)} issues)")
+        emit_file(sink, filename, errors)
+    sink.close()
+    return sink.result()
+
+
+def triage_files(file_paths, workers=1, chunksize=4, sink=None, verbose=True, **options):
+    """
+    Lints every file and runs validator.validate_files (workers, chunksize,
+    verbose and options such as recover or cache) only on files that need
+    it (see needs_full_validation). Every file is reported once to sink:
+    clean files with their lint findings, the others with the pipeline's
+    errors followed by their unsupported-tag findings.
+    Returns: sink.result(); for the default ListSink, {filename: [errors]}
+    """
+    from validator import validate_files
+    sink = sink if sink is not None else ListSink()
+    file_paths = list(file_paths)
+    failing = []
+    failing_ids = []
+    lint_only = {}
+    for file_path, filename, errors in iter_lint_results(file_paths, workers):
+        if needs_full_validation(errors):
+            failing.append(file_path)
+            failing_ids.append(filename)
+            lint_only[filename] = [error for error in errors if error.code == UNSUPPORTED_TAG]
+        else:
+            emit_file(sink, filename, errors)
+    if verbose:
+        print(f"🧹 Lint: {len(failing)} of {len(file_paths)} files need full validation")
+    return validate_files(failing, workers, chunksize, sink=_LintFindingsSink(sink, lint_only),
+                          verbose=verbose, ids=failing_ids, **options)
@@ -0,0 +1,369 @@
+"""
+Page-level incremental revalidation of one document.
+
+The document is split into segments at the lines holding <Page N> markers.
+Each segment is scanned once by tag_lexer's tokenizer (no lxml parse); the
+scan keeps the segment's entity errors, the tag-rule errors decidable
+inside the page, and the few tag events that depend on elements opened on
+earlier pages. A cross-page pass then runs those events over a stack of
+open elements to find FN nesting errors across page boundaries.
+
+On revalidation only segments whose text changed are scanned again, and
+the cross-page pass skips every unchanged segment whose incoming stack is
+the same as last time, so editing one page of a long volume costs about
+one page of work.
+
+The lexer only settles documents whose tags balance and whose syntax it
+can rule out; there, tag_rules' transitions give the same verdicts as
+TagRuleWalker, and the results are the errors of
+validate_content(recover=True), in line order within each code. A page
+with anything else (a stray '<', a bad character reference, a
+mismatched, unmatched or fnt closing tag, a construct tag_lexer marks
+NEEDS_PARSE) or elements still open at the end make the whole document go
+through validate_content(recover=True) instead; the page scans are kept
+for the next run.
+"""
+import re
+from line_index import LineIndex
+from entity_checker import check_entities
+from tag_rules import rules_for, DEFAULT_RULES, CHILD_ERRORS, CHILD_INVALID, TAG_FRAME, TAG_NO_CLOSE, \
+    CONFIG_SNAPSHOT, ROOT_TAG
+from tag_lexer import TAG_TOKEN_PATTERN, MAX_SAFE_DEPTH, MAX_SAFE_LENGTH, start_tag_findings, \
+    comment_findings, markup_findings, text_findings
+from entity_registry import ENTITY_REF_PATTERN, XML_PREDEFINED_ENTITIES
+from errors import ValidationError, XML_SYNTAX, INVALID_ENTITY, TAG_RULE, POST_RECOVERY_NOTE
+from config import CUSTOM_ENTITIES
+
+# parser.Preprocessor's substitutions, read without importing the parser
+ENTITY_SUBSTITUTIONS = CONFIG_SNAPSHOT.entity_substitutions
+
+# A segment starts at the beginning of the line holding a <Page N> marker
+PAGE_MARKER_PATTERN = re.compile(r"<[^\S\n]*Page[^\S\n]+\d+[^\S\n]*>", re.IGNORECASE)
+
+# Report order, as in validate_file: syntax, then entity, then tag rule errors
+CODE_ORDER = {XML_SYNTAX: 0, INVALID_ENTITY: 1, TAG_RULE: 2}
+
+# Boundary operations recorded by a segment scan
+OP_CHILD = 0  # element whose parent was opened on an earlier page
+OP_CLOSE = 1  # closing tag of an element opened on an earlier page
+OP_OPEN = 2   # element left open at the end of the page
+
+
+def split_pages(content):
+    """Splits content before each line holding a <Page N> marker; "".join() restores it."""
+    cuts = [0]
+    for match in PAGE_MARKER_PATTERN.finditer(content):
+        line_start = content.rfind("\n", 0, match.start()) + 1
+        if line_start > cuts[-1]:
+            cuts.append(line_start)
+    cuts.append(len(content))
+    return [content[start:end] for start, end in zip(cuts, cuts[1:]) if end > start]
+
+
+class PageSegment:
+    """
+    One page of text and the results of scanning it. Positions are kept
+    relative to the segment (offsets, or lines starting at 1) so a segment
+    is reused unchanged when pages before it grow or shrink.
+    Errors are (category, code, segment, offset, message, ref) where ref is
+    None or (segment, offset) of an opening tag whose absolute line replaces
+    "{line}" in message.
+    """
+
+    __slots__ = ("text", "line_index", "line_count", "last_label", "first_line",
+                 "default_label", "errors", "ops", "settled", "depth", "incoming", "outgoing",
+                 "boundary_errors", "boundary_settled", "materialized", "rules")
+
+    def __init__(self, text):
+        self.text = text
+        self.line_index = LineIndex(text)
+        # A trailing newline starts no new line in the document
+        self.line_count = self.line_index.line_count - (1 if text.endswith("\n") else 0)
+        labels = self.line_index.pages.page_labels
+        self.last_label = labels[-1] if labels else None
+        # Placed in the document by IncrementalValidator on every run
+        self.first_line = 1
+        self.default_label = "?"
+        self.errors = []
+        self.ops = []
+        self.settled = False
+        self.depth = 0  # Deepest stack of elements opened on this page
+        # Cross-page pass state from the last run
+        self.incoming = None
+        self.outgoing = None
+        self.boundary_errors = []
+        self.boundary_settled = False
+        self.rules = DEFAULT_RULES
+        # ((first_line, default_label), [ValidationError]) from the last run
+        self.materialized = None
+
+    def position(self, offset):
+        """(absolute line, column) of a segment offset."""
+        line, column = self.line_index.line_column(offset)
+        return self.first_line + line - 1, column
+
+    def scan(self, rules=DEFAULT_RULES, custom_entities=CUSTOM_ENTITIES):
+        """
+        Finds the page-local errors and records the boundary operations.
+        Stops with settled False at the first thing only the parser decides.
+        """
+        errors = self.errors = []
+        ops = self.ops = []
+        self.rules = rules
+        self.settled = False
+        self.depth = 0
+        if text_findings(self.text):
+            return
+
+        for match in ENTITY_REF_PATTERN.finditer(self.text):
+            name = match.group(1)
+            if name not in ENTITY_SUBSTITUTIONS and name not in XML_PREDEFINED_ENTITIES:
+                errors.append(("Repent", XML_SYNTAX, self, match.end(),
+                               f"Entity '{name}' not defined", None))
+        for _, line, column, msg in check_entities(self.text, custom_entities, self.line_index):
+            offset = self.line_index.offset(line, column)
+            errors.append(("Repent", INVALID_ENTITY, self, offset, msg, None))
+
+        stack = []  # Local frames: [name, offset, has_invalid_child]
+        for match in TAG_TOKEN_PATTERN.finditer(self.text):
+            page, empty, close, name, rest, comment, markup = match.groups()
+            offset = match.start()
+            if name:
+                if close:
+                    if (rest and not rest.isspace()) or not self._close(name, stack):
+                        return
+                    continue
+                # A rest that does not open an element always comes with findings
+                if rest and start_tag_findings(rest)[0]:
+                    return
+                is_empty = rest.rstrip().endswith("/")
+            elif page or empty:
+                name, is_empty = ("Page" if page else empty.lower()), True
+            else:
+                if comment:
+                    unsettled = comment_findings(comment)
+                elif markup:
+                    unsettled = markup_findings(markup)
+                else:
+                    unsettled = True  # A stray '<'
+                if unsettled:
+                    return
+                continue
+
+            tag_id = rules.tag_id(name)
+            if stack:
+                _check_child(errors, self, name, tag_id, offset, stack[-1])
+            else:
+                ops.append((OP_CHILD, name, offset, tag_id))
+            if not is_empty:
+                stack.append([name, offset, False])
+                self.depth = max(self.depth, len(stack))
+
+        for name, offset, has_invalid_child in stack:
+            ops.append((OP_OPEN, name, offset, has_invalid_child))
+        self.settled = True
+
+    def _close(self, name, stack):
+        """Closes the current element, or leaves name to the cross-page pass; False when only the parser can tell."""
+        if self.rules.flags[self.rules.tag_id(name)] & TAG_NO_CLOSE:
+            # The preprocessor made <fnt3> empty: libxml2 reports the closing tag as a mismatch
+            return False
+        if not stack:
+            self.ops.append((OP_CLOSE, name))
+            return True
+        if stack[-1][0] != name:
+            return False
+        _close_frame(self.errors, self, stack.pop())
+        return True
+
+    def run_boundary(self, incoming):
+        """
+        Applies the boundary operations to the stack of elements left open by
+        earlier pages: a tuple of (name, segment, offset, has_invalid_child).
+        Returns the stack at the end of the page; errors go to boundary_errors,
+        and boundary_settled is False when a closing tag does not match.
+        """
+        stack = list(incoming)
+        errors = []
+        settled = self.settled and len(incoming) + self.depth < MAX_SAFE_DEPTH
+        for op in self.ops if settled else ():
+            kind = op[0]
+            if kind == OP_CHILD:
+                _, name, offset, tag_id = op
+                top = stack[-1] if stack else None
+                if _check_child(errors, self, name, tag_id, offset, top):
+                    stack[-1] = top[:3] + (True,)
+            elif kind == OP_CLOSE:
+                if not stack or stack[-1][0] != op[1]:
+                    settled = False
+                    break
+                top_name, top_segment, top_offset, has_invalid_child = stack.pop()
+                _close_frame(errors, top_segment, (top_name, top_offset, has_invalid_child))
+            else:
+                _, name, offset, has_invalid_child = op
+                stack.append((name, self, offset, has_invalid_child))
+
+        self.incoming = incoming
+        self.outgoing = tuple(stack)
+        self.boundary_errors = errors
+        self.boundary_settled = settled
+        self.materialized = None
+        return self.outgoing
+
+
+def _check_child(errors, segment, name, tag_id, offset, parent):
+    """
+    tag_checker's start-event rules for an element whose parent frame is
+    parent ([name, ...] or None: the <root> wrapper). Returns True when the
+    parent now has an invalid child (local frames are updated in place).
+    """
+    rules = segment.rules
+    parent_id = rules.tag_id(parent[0] if parent is not None else ROOT_TAG)
+    bits = rules.transitions[parent_id][tag_id]
+    if not bits:
+        return False
+    if bits & CHILD_ERRORS:
+        for message in rules.child_errors(bits, parent_id, tag_id, name):
+            errors.append(("Reptag", TAG_RULE, segment, offset, message, None))
+    if not bits & CHILD_INVALID:
+        return False
+    if isinstance(parent, list):
+        parent[2] = True
+    return True
+
+
+def _close_frame(errors, segment, frame):
+    """Reports a frame element (FN) that had an invalid child; frame is (name, offset, has_invalid_child)."""
+    name, offset, has_invalid_child = frame
+    rules = segment.rules
+    tag_id = rules.tag_id(name)
+    if has_invalid_child and rules.flags[tag_id] & TAG_FRAME:
+        errors.append(("Reptag", TAG_RULE, segment, offset, rules.frame_error(tag_id), None))
+
+
+class IncrementalValidator:
+    """
+    Keeps per-page results for one document between validations.
+
+        validator = IncrementalValidator("23-4031.FNT")
+        errors = validator.validate(content)         # every page scanned
+        errors = validator.validate(edited_content)  # changed pages only
+        errors = validator.replace_page(41, text)    # editor knows the page
+
+    Returns errors.ValidationError lists like validate_content(recover=True);
+    after each run `rescanned` holds the number of pages scanned again,
+    `rechecked` the number that went through the cross-page pass and
+    `reparsed` whether the lexer left the document to the full pipeline.
+    """
+
+    def __init__(self, file_id="<document>", custom_entities=CUSTOM_ENTITIES, classifier=None):
+        self.file_id = file_id
+        self.custom_entities = custom_entities
+        self.rules = rules_for(classifier)
+        self.segments = []
+        self.rescanned = 0
+        self.rechecked = 0
+        self.reparsed = False
+
+    @property
+    def page_count(self):
+        return len(self.segments)
+
+    def validate(self, content):
+        """Validates content, reusing the results of pages whose text did not change."""
+        # Keyed by page text: the dict hashes each page once, and a hit is
+        # confirmed by comparing the texts, so there are no false matches
+        previous = {}
+        for segment in self.segments:
+            previous.setdefault(segment.text, []).append(segment)
+
+        segments = []
+        self.rescanned = 0
+        for text in split_pages(content):
+            reusable = previous.get(text)
+            if reusable:
+                segments.append(reusable.pop(0))
+            else:
+                segments.append(self._scanned(PageSegment(text)))
+        self.segments = segments
+        return self._collect()
+
+    def replace_page(self, index, text):
+        """Replaces the text of segment index (as split by split_pages) and revalidates."""
+        self.rescanned = 0
+        self.segments[index] = self._scanned(PageSegment(text))
+        return self._collect()
+
+    def _scanned(self, segment):
+        segment.scan(self.rules, self.custom_entities)
+        self.rescanned += 1
+        return segment
+
+    def _collect(self):
+        first_line = 1
+        label = "?"
+        stack = ()
+        settled = True
+        self.rechecked = 0
+        for segment in self.segments:
+            segment.first_line = first_line
+            first_line += segment.line_count
+            segment.default_label = label
+            if segment.last_label is not None:
+                label = segment.last_label
+            # Unchanged page entered with the same open elements: same result
+            if segment.incoming is None or segment.incoming != stack:
+                segment.run_boundary(stack)
+                self.rechecked += 1
+            settled = settled and segment.boundary_settled
+            stack = segment.outgoing
+
+        # Elements still open at the end are reported by libxml2 only
+        self.reparsed = (not settled or bool(stack)
+                         or sum(len(segment.text) for segment in self.segments) >= MAX_SAFE_LENGTH)
+        if self.reparsed:
+            return self._reparse()
+
+        errors = []
+        for segment in self.segments:
+            errors.extend(self._segment_errors(segment))
+        if any(error.code == XML_SYNTAX for error in errors):
+            # An undefined entity: parse_xml(recover=True) repaired the tree
+            errors = [
+                ValidationError(e.category, e.file_id, e.line, e.column, e.page, e.code,
+                                e.message + POST_RECOVERY_NOTE, context=e.context)
+                if e.code == TAG_RULE else e
+                for e in errors
+            ]
+
+        # Already in line order within each code, apart from a few boundary errors
+        errors.sort(key=lambda e: (CODE_ORDER.get(e.code, 3), e.line, e.column))
+        return errors
+
+    def _reparse(self):
+        """validate_content(recover=True) on the whole document."""
+        from validator import validate_content  # lxml: only for documents the lexer cannot settle
+        return validate_content("".join(segment.text for segment in self.segments), self.file_id,
+                                recover=True, custom_entities=self.custom_entities, rules=self.rules)
+
+    def _segment_errors(self, segment):
+        """The segment's errors as ValidationErrors, rebuilt only when it moved or was rechecked."""
+        key = (segment.first_line, segment.default_label)
+        if segment.materialized is not None and segment.materialized[0] == key:
+            return segment.materialized[1]
+        errors = []
+        for category, code, owner, offset, msg, ref in segment.errors + segment.boundary_errors:
+            line, column = owner.position(offset)
+            if ref is not None:
+                msg = msg.replace("{line}", str(ref[0].position(ref[1])[0]))
+            errors.append(self._error(category, code, owner, line, column, msg))
+        segment.materialized = (key, errors)
+        return errors
+
+    def _error(self, category, code, segment, line, column, msg):
+        relative = line - segment.first_line + 1
+        return ValidationError(
+            category, self.file_id, line, column,
+            segment.line_index.page_for_line(relative, segment.default_label),
+            code, msg, context=segment.line_index.line_text(relative).strip()
+        )
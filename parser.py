@@ -1,78 +1,51 @@
 from lxml import etree
+import bisect
+import functools
+from array import array
 import re
+from line_index import LineIndex
+from config_snapshot import load_snapshot
+from entity_registry import ENTITY_TO_NUMERIC, XML_PREDEFINED_ENTITIES, ENTITY_REF_PATTERN  # noqa: F401
+from error_classifier import classify_entry, SYNTAX_PREFIX
+from errors import POST_RECOVERY_NOTE  # noqa: F401
 
 # ========== CLEANER ==========
-# In parser.py
-# In parser.py
+# Handle Page tags
+PAGE_TAG_PATTERN = re.compile(r"<\s*Page\s+\d+\s*>", re.IGNORECASE)
+# Handle non-closing tags (fnr*, fnt*, fmt*, etc.)
+NON_CLOSING_PATTERN = re.compile(r"<\s*(fnr\*|fnt\*|fmt\*|fnt\d+|fmt\d+|fnt)\b[^>]*>", re.IGNORECASE)
+
+
 def preprocess_file_content(raw_content):
     """Convert special tags to make XML valid."""
-    # Handle Page tags
-    page_tag_pattern = re.compile(r"<\s*Page\s+\d+\s*>", re.IGNORECASE)
-    # Handle non-closing tags (fnr*, fnt*, fmt*, etc.)
-    non_closing_pattern = re.compile(r"<\s*(fnr\*|fnt\*|fmt\*|fnt\d+|fmt\d+|fnt)\b[^>]*>", re.IGNORECASE)
-    
     cleaned_lines = []
     for line in raw_content.splitlines():
         # Handle Page tags
-        new_line = page_tag_pattern.sub("<Page/>", line)
+        new_line = PAGE_TAG_PATTERN.sub("<Page/>", line)
         # Handle non-closing tags by converting them to self-closing tags
-        new_line = non_closing_pattern.sub(lambda m: f"<{m.group(1).lower()}/>", new_line)
+        new_line = NON_CLOSING_PATTERN.sub(lambda m: f"<{m.group(1).lower()}/>", new_line)
         cleaned_lines.append(new_line)
 
     return "\n".join(cleaned_lines)
 
 # ========== ENTITY CONVERTER ==========
-ENTITY_TO_NUMERIC = {
-    "mdash": "&#8212;",
-    "nbsp": "&#160;",
-    "copy": "&#169;",
-    "AElig": "&#198;",
-    'Aacute': '&#193;', 'Abreve': '&#258;', 'Acirc': '&#194;', 'Agrave': '&#192;', 'Amacr': '&#256;',
-    'Aogon': '&#260;', 'Aring': '&#197;', 'Atilde': '&#195;', 'Auml': '&#196;', 'Cacute': '&#262;',
-    'Ccaron': '&#268;', 'Ccedil': '&#199;', 'Ccirc': '&#264;', 'Cdot': '&#266;', 'Dcaron': '&#270;',
-    'Dstrok': '&#272;', 'ENG': '&#330;', 'ETH': '&#208;', 'Eacute': '&#201;', 'Ecaron': '&#282;',
-    'Ecirc': '&#202;', 'Edot': '&#278;', 'Egrave': '&#200;', 'Emacr': '&#274;', 'Eogon': '&#280;',
-    'Euml': '&#203;', 'Gbreve': '&#286;', 'Gcedil': '&#290;', 'Gcirc': '&#284;', 'Gdot': '&#288;',
-    'Hcirc': '&#292;', 'Hstrok': '&#294;', 'IJlig': '&#306;', 'Iacute': '&#205;', 'Icirc': '&#206;',
-    'Idot': '&#304;', 'Igrave': '&#204;', 'Imacr': '&#298;', 'Iogon': '&#302;', 'Itilde': '&#296;',
-    'Iuml': '&#207;', 'Jcirc': '&#308;', 'Kcedil': '&#310;', 'Lacute': '&#313;', 'Lcaron': '&#317;',
-    'Lcedil': '&#315;', 'Lmidot': '&#319;', 'Lstrok': '&#321;', 'Nacute': '&#323;', 'Ncaron': '&#327;',
-    'Ncedil': '&#325;', 'Ntilde': '&#209;', 'OElig': '&#338;', 'Oacute': '&#211;', 'Ocirc': '&#212;',
-    'Odblac': '&#336;', 'Ograve': '&#210;', 'Omacr': '&#332;', 'Oslash': '&#216;', 'Otilde': '&#213;',
-    'Ouml': '&#214;', 'Racute': '&#340;', 'Rcaron': '&#344;', 'Rcedil': '&#342;', 'Sacute': '&#346;',
-    'Scaron': '&#352;', 'Scedil': '&#350;', 'Scirc': '&#348;', "sect": "&#167;", 'THORN': '&#222;',
-    'Tcaron': '&#356;', 'Tcedil': '&#354;', 'Tstrok': '&#358;', 'Uacute': '&#218;', 'Ubreve': '&#364;',
-    'Ucirc': '&#219;', 'Udblac': '&#368;', 'Ugrave': '&#217;', 'Umacr': '&#362;', 'Uogon': '&#370;',
-    'Uring': '&#366;', 'Utilde': '&#360;', 'Uuml': '&#220;', 'Wcirc': '&#372;', 'Yacute': '&#221;',
-    'Ycirc': '&#374;', 'Yuml': '&#376;', 'Zacute': '&#377;', 'Zcaron': '&#381;', 'Zdot': '&#379;',
-    'aacute': '&#225;', 'abreve': '&#259;', 'acirc': '&#226;', 'aelig': '&#230;', 'agrave': '&#224;',
-    'amacr': '&#257;', 'aogon': '&#261;', 'aring': '&#229;', 'atilde': '&#227;', 'auml': '&#228;',
-    'cacute': '&#263;', 'ccaron': '&#269;', 'ccedil': '&#231;', 'ccirc': '&#265;', 'cdot': '&#267;',
-    'dcaron': '&#271;', 'dstrok': '&#273;', 'eacute': '&#233;', 'ecaron': '&#283;', 'ecirc': '&#234;',
-    'edot': '&#279;', 'egrave': '&#232;', 'emacr': '&#275;', 'eng': '&#331;', 'eogon': '&#281;',
-    'eth': '&#240;', 'euml': '&#235;', 'gacute': '&#501;', 'gbreve': '&#287;', 'gcirc': '&#285;',
-    'gdot': '&#289;', 'hcirc': '&#293;', 'hstrok': '&#295;', 'iacute': '&#237;', 'icirc': '&#238;',
-    'igrave': '&#236;', 'ijlig': '&#307;', 'imacr': '&#299;', 'inodot': '&#305;', 'iogon': '&#303;',
-    'itilde': '&#297;', 'iuml': '&#239;', 'jcirc': '&#309;', 'kcedil': '&#311;', 'kgreen': '&#312;',
-    'lacute': '&#314;', 'lcaron': '&#318;', 'lcedil': '&#316;', 'lmidot': '&#320;', 'lstrok': '&#322;',
-    'nacute': '&#324;', 'napos': '&#329;', 'ncaron': '&#328;', 'ncedil': '&#326;', 'ntilde': '&#241;',
-    'oacute': '&#243;', 'ocirc': '&#244;', 'odblac': '&#337;', 'oelig': '&#339;', 'ograve': '&#242;',
-    'omacr': '&#333;', 'oslash': '&#248;', 'otilde': '&#245;', 'ouml': '&#246;', 'racute': '&#341;',
-    'rcaron': '&#345;', 'rcedil': '&#343;', 'sacute': '&#347;', 'scaron': '&#353;', 'scedil': '&#351;',
-    'scirc': '&#349;', 'szlig': '&#223;', 'tcaron': '&#357;', 'tcedil': '&#355;', 'thorn': '&#254;',
-    'tstrok': '&#359;', 'uacute': '&#250;', 'ubreve': '&#365;', 'ucirc': '&#251;', 'udblac': '&#369;',
-    'ugrave': '&#249;', 'umacr': '&#363;', 'uogon': '&#371;', 'uring': '&#367;', 'utilde': '&#361;',
-    'uuml': '&#252;', 'wcirc': '&#373;', 'yacute': '&#253;', 'ycirc': '&#375;', 'yuml': '&#255;',
-    'zacute': '&#378;', 'zcaron': '&#382;', 'zdot': '&#380;'
-}
-
-def replace_entities_with_numeric(xml_str):
-    """Replaces named entities with numeric character references."""
-    for entity, numeric in ENTITY_TO_NUMERIC.items():
-        xml_str = xml_str.replace(f"&{entity};", numeric)
-    return xml_str
+# Frozen config and entity_registry tables, loaded from the stored snapshot
+# when config and the entity sets are unchanged
+CONFIG_SNAPSHOT = load_snapshot()
+ENTITY_SUBSTITUTIONS = CONFIG_SNAPSHOT.entity_substitutions
+
+
+def replace_entities_with_numeric(xml_str, entity_table=None):
+    """Replaces named entities with numeric character references in one pass."""
+    table = ENTITY_SUBSTITUTIONS if entity_table is None else entity_table
+    return ENTITY_REF_PATTERN.sub(lambda m: table.get(m.group(1), m.group(0)), xml_str)
 
 # ========== AMPERSAND SANITIZER ==========
+UNESCAPED_AMPERSAND_PATTERN = re.compile(r'&(?!#|amp;|lt;|gt;|quot;|apos;|[a-zA-Z0-9]+;)')
+LEGAL_AMPERSAND_PATTERN = re.compile(r'[ ]&[ ]')
+PUNCTUATED_AMPERSAND_PATTERN = re.compile(r'&[,.;:)]')
+
+
 def sanitize_unescaped_ampersands(xml_str):
     """
     Replaces unsafe & with &amp;, while preserving:
@@ -88,81 +61,303 @@ def sanitize_unescaped_ampersands(xml_str):
         if full_match in {'&amp;', '&lt;', '&gt;', '&quot;', '&apos;'}:
             return full_match
         # Skip legal-style & surrounded by spaces
-        if re.match(r'[ ]&[ ]', full_match):
+        if LEGAL_AMPERSAND_PATTERN.match(full_match):
             return full_match
         # Skip & followed by punctuation
-        if re.match(r'&[,.;:)]', full_match):
+        if PUNCTUATED_AMPERSAND_PATTERN.match(full_match):
             return full_match
         return '&amp;'
 
-    return re.sub(r'&(?!#|amp;|lt;|gt;|quot;|apos;|[a-zA-Z0-9]+;)', replacer, xml_str)
-# ========== PARSER ==========
-def parse_xml(raw_content):
+    return UNESCAPED_AMPERSAND_PATTERN.sub(replacer, xml_str)
+# ========== SHARED PREPROCESSOR ==========
+class PreprocessedContent:
     """
-    Parses XML after cleaning page tags and escaping bad characters.
-    Returns: (tree, errors, None)
+    Cleaned buffer produced by Preprocessor.run() plus a map back to the raw file.
+    Rewrites never add or remove newlines, so line numbers are shared between
+    the two buffers; offsets are mapped through the edit table, which is
+    built on the first lookup (documents without errors never need it).
     """
-    try:
-        # STEP 1: Pre-cleaning
-        cleaned_content = preprocess_file_content(raw_content)
 
-        # STEP 2: Sanitize & only after validation — so nothing is lost before validation
-        cleaned_content = sanitize_unescaped_ampersands(cleaned_content)
+    def __init__(self, raw, text, preprocessor):
+        self.raw = raw
+        self.text = text
+        self.preprocessor = preprocessor
+        # Parallel arrays: end of each edit in the cleaned and in the raw buffer
+        self._clean_offsets = None
+        self._raw_offsets = None
 
-        # STEP 3: Replace known entities AFTER validation
-        cleaned_content = replace_entities_with_numeric(cleaned_content)
+    def _ensure_edit_table(self):
+        if self._clean_offsets is None:
+            self._clean_offsets, self._raw_offsets = self.preprocessor.edit_table(self.raw)
 
-        wrapped = f"<root>{cleaned_content}</root>"
-        parser = etree.XMLParser(recover=False)
-        tree = etree.fromstring(wrapped.encode("utf-8"), parser)
-        return tree, [], None
+    @property
+    def clean_offsets(self):
+        self._ensure_edit_table()
+        return self._clean_offsets
 
-    except etree.XMLSyntaxError as e:
-        categorized_errors = []
-        seen_positions = set()  # Tracks unique (line, column)
+    @property
+    def raw_offsets(self):
+        self._ensure_edit_table()
+        return self._raw_offsets
 
-        for entry in e.error_log:
-           msg = entry.message.strip()
-           key = (entry.line, entry.column)
+    def to_raw_offset(self, offset):
+        """Maps an offset in the cleaned buffer to the matching raw offset."""
+        self._ensure_edit_table()
+        clean_offsets, raw_offsets = self._clean_offsets, self._raw_offsets
+        i = bisect.bisect_right(clean_offsets, offset)
+        raw = offset if i == 0 else raw_offsets[i - 1] + (offset - clean_offsets[i - 1])
+        # Inside a replacement longer than its source: stay within the raw span
+        if i < len(raw_offsets) and raw > raw_offsets[i]:
+            raw = raw_offsets[i]
+        return raw
 
-        # Skip duplicates from same position
-           if key in seen_positions:
-              continue
-           seen_positions.add(key)
-
-        # Category classification
-           lower_msg = msg.lower()
-           if any(x in lower_msg for x in [
-               "xmlparseentityref", "unescaped", "no name", "amp", "lt", "gt", "semicolon"
-           ]):
-               category = "Repent"
-           elif "tag mismatch" in lower_msg or "misnested" in lower_msg or "start tag" in lower_msg:
-               category = "Reptag"
-           else:
-               category = "CheckSGM"
-
-           categorized_errors.append((
-               category,
-               entry.line,
-               entry.column,
-               f"XML Syntax error: {msg}"
-            ))
-
-        return None, categorized_errors, None
 
-    except Exception as e:
-        return None, [("CheckSGM", 0, 0, f"Unexpected error: {str(e)}")], None
+# Pattern sources shared by run() and edit_table(), so the cleaned text
+# and its offset map come from the same definitions.
+# Whitespace classes exclude newlines so no match crosses a line; both tag
+# rewrites share the '<' prefix: one branch per lead character keeps the
+# scan about twice as fast as separate top-level alternatives.
+TAG_REWRITE_SOURCE = (r"<[^\S\n]*(?:(?P<page>Page[^\S\n]+\d+[^\S\n]*>)"
+                      r"|(?P<tag>fnr\*|fnt\*|fmt\*|fnt\d+|fmt\d+|fnt)\b[^>\n]*>)")
+ENTITY_NAME_SOURCE = r"[a-zA-Z0-9]+"
+# Never substituted; matched in any case
+PREDEFINED_SOURCE = r"amp|lt|gt|quot|apos"
+
+PREPROCESS_TAG_PATTERN = re.compile(TAG_REWRITE_SOURCE, re.IGNORECASE)
+BARE_AMPERSAND_PATTERN = re.compile(rf"&(?!#|{ENTITY_NAME_SOURCE};)")
+SUBSTITUTED_ENTITY_PATTERN = re.compile(rf"&(?!(?i:{PREDEFINED_SOURCE});)({ENTITY_NAME_SOURCE});")
+# edit_table's single scan: a tag rewrite, or any '&' (ref is None for a bare one)
+EDIT_SCAN_PATTERN = re.compile(
+    TAG_REWRITE_SOURCE
+    + rf"|&(?P<ref>#|(?:{PREDEFINED_SOURCE});|(?P<name>{ENTITY_NAME_SOURCE});)?",
+    re.IGNORECASE,
+)
+
+
+def _rewrite_tag(match):
+    return "<Page/>" if match.group("page") is not None else f"<{match.group('tag').lower()}/>"
+
+
+class Preprocessor:
+    """
+    Performs page-tag rewriting, non-closing-tag rewriting, ampersand
+    sanitizing and entity substitution.
+    Output matches preprocess_file_content -> sanitize_unescaped_ampersands
+    -> replace_entities_with_numeric.
+
+    run() chains three re.sub passes, which leave the per-match work to C;
+    the offsets of the edits come from a separate scan (edit_table) that
+    only runs when a position has to be mapped back to the raw file.
+    """
+
+    def __init__(self, entity_table=None):
+        self.entity_table = ENTITY_SUBSTITUTIONS if entity_table is None else entity_table
+
+    def run(self, raw_content):
+        """Returns a PreprocessedContent for raw_content."""
+        lookup = self.entity_table.get
+        text = PREPROCESS_TAG_PATTERN.sub(_rewrite_tag, raw_content)
+        text = BARE_AMPERSAND_PATTERN.sub("&amp;", text)
+        text = SUBSTITUTED_ENTITY_PATTERN.sub(lambda m: lookup(m.group(1), m.group(0)), text)
+        return PreprocessedContent(raw_content, text, self)
+
+    def edit_table(self, raw_content):
+        """(clean_offsets, raw_offsets): the end of each edit run() made, in both buffers."""
+        entity_table = self.entity_table
+        clean_offsets = array('q')
+        raw_offsets = array('q')
+        last = 0
+        clean_pos = 0
+
+        for match in EDIT_SCAN_PATTERN.finditer(raw_content):
+            if match.group("page") is not None or match.group("tag") is not None:
+                replacement = _rewrite_tag(match)
+            elif match.group("ref") is None:
+                replacement = "&amp;"
+            else:
+                name = match.group("name")
+                if name is None or name not in entity_table:
+                    continue
+                replacement = entity_table[name]
+
+            start, end = match.span()
+            if replacement == match.group(0):
+                continue
+            clean_pos += (start - last) + len(replacement)
+            clean_offsets.append(clean_pos)
+            raw_offsets.append(end)
+            last = end
+
+        return clean_offsets, raw_offsets
+
+
+DEFAULT_PREPROCESSOR = Preprocessor()
+
+
+def preprocess(raw_content):
+    """Runs the shared preprocessing pipeline."""
+    return DEFAULT_PREPROCESSOR.run(raw_content)
 
 
-    
+# ========== POSITION MAP ==========
+ROOT_OPEN = "<root>"
+ROOT_CLOSE = "</root>"
 
 
-        
+class PositionMap:
+    """
+    Maps (line, column) positions reported by lxml on the wrapped, cleaned
+    buffer back to the raw file. Lines are shared between the buffers, so
+    only columns move: a cleaned column becomes an offset, goes through the
+    edit table (bisect, O(log edits)) and comes back as a raw column.
+    Columns are 1-based like lxml's. first_line places a streamed piece in
+    its document; the <root> prefix only shifts the document's first line.
+    """
+
+    def __init__(self, preprocessed, raw_index=None, first_line=1, prefix_length=len(ROOT_OPEN)):
+        self.preprocessed = preprocessed
+        self.first_line = first_line
+        self.prefix_length = prefix_length if first_line == 1 else 0
+        self._raw_index = raw_index
+        self._clean_index = None
+
+    @property
+    def raw_index(self):
+        if self._raw_index is None:
+            self._raw_index = LineIndex(self.preprocessed.raw)
+        return self._raw_index
+
+    @property
+    def clean_index(self):
+        if self._clean_index is None:
+            self._clean_index = LineIndex(self.preprocessed.text)
+        return self._clean_index
+
+    def covers(self, line):
+        return self.first_line <= line < self.first_line + self.clean_index.line_count
+
+    def _raw_column(self, local_line, clean_offset):
+        line, column = self.raw_index.line_column(self.preprocessed.to_raw_offset(clean_offset))
+        # An offset past the end of a line (e.g. at </root>) stays on that line
+        if line != local_line:
+            return len(self.raw_index.line_text(local_line)) + 1
+        return column
+
+    def raw_position(self, line, column):
+        """Returns the raw (line, column) for a cleaned (line, column)."""
+        if line < 1 or column < 1:
+            return line, column
+        local_line = line - self.first_line + 1
+        if local_line == 1:
+            column = max(1, column - self.prefix_length)
+        clean_index = self.clean_index
+        if local_line > clean_index.line_count:
+            return line, column
+        line_length = len(clean_index.line_text(local_line))
+        offset = clean_index.offset(local_line, min(column, line_length + 1))
+        return line, self._raw_column(local_line, offset)
+
+    def _find_column(self, line, pattern, occurrence=0):
+        local_line = line - self.first_line + 1
+        if not 1 <= local_line <= self.clean_index.line_count:
+            return 0
+        text = self.clean_index.line_text(local_line)
+        for i, match in enumerate(pattern.finditer(text)):
+            if i == occurrence:
+                offset = self.clean_index.offset(local_line) + match.start()
+                return self._raw_column(local_line, offset)
+        return 0
+
+    def element_column(self, line, tag, occurrence=0):
+        """
+        Raw column of the start tag of the occurrence-th <tag> element
+        starting on line (lxml elements carry no column); 0 if not found.
+        """
+        return self._find_column(line, _start_tag_pattern(tag), occurrence)
+
+    def closing_tag_column(self, line, tag):
+        """Raw column of the first </tag> on line; 0 if not found."""
+        return self._find_column(line, _closing_tag_pattern(tag))
+
+
+@functools.lru_cache(maxsize=512)
+def _start_tag_pattern(tag):
+    return re.compile(r"<" + re.escape(tag) + r"(?=[\s/>])")
+
+
+@functools.lru_cache(maxsize=512)
+def _closing_tag_pattern(tag):
+    return re.compile(r"</" + re.escape(tag) + r"\s*>", re.IGNORECASE)
 
 
-    
+# ========== PARSER ==========
+
+def categorize_syntax_errors(error_log):
+    """Turns an lxml error log into (category, line, column, message) tuples."""
+    categorized_errors = []
+    seen_positions = set()  # Tracks unique (line, column)
+
+    for entry in error_log:
+        key = (entry.line, entry.column)
+
+        # Skip duplicates from same position
+        if key in seen_positions:
+            continue
+        seen_positions.add(key)
+
+        categorized_errors.append((
+            classify_entry(entry),
+            entry.line,
+            entry.column,
+            f"{SYNTAX_PREFIX}{entry.message.strip()}"
+        ))
 
+    return categorized_errors
 
 
+def map_error_positions(errors, position_map):
+    """Rewrites (category, line, column, message) tuples to raw file positions."""
+    mapped = []
+    for category, line, column, msg in errors:
+        line, column = position_map.raw_position(line, column)
+        mapped.append((category, line, column, msg))
+    return mapped
 
 
+def parse_xml(raw_content, preprocessed=None, recover=False, line_index=None):
+    """
+    Parses XML after cleaning page tags and escaping bad characters.
+    Pass the PreprocessedContent from preprocess() to avoid recomputing it,
+    and the raw content's LineIndex to share it with the position map.
+    With recover=True, libxml2 repairs the document instead of stopping:
+    every syntax error is reported and the recovered tree is returned
+    (None only if nothing could be recovered).
+    Error positions refer to the raw content.
+    Returns: (tree, errors, position_map) -- position_map maps tree
+    positions back to the raw content (see validate_tags)
+    """
+    parser = etree.XMLParser(recover=recover)
+    position_map = None
+    try:
+        # Page/non-closing tags, & sanitizing and entity substitution, once per file
+        if preprocessed is None:
+            preprocessed = preprocess(raw_content)
+        position_map = PositionMap(preprocessed, line_index)
+        cleaned_content = preprocessed.text
+
+        # Trailing newlines dropped so </root> stays on the last line
+        cleaned_content = cleaned_content.rstrip("\r\n")
+        wrapped = f"{ROOT_OPEN}{cleaned_content}{ROOT_CLOSE}"
+        tree = etree.fromstring(wrapped.encode("utf-8"), parser)
+        if recover:
+            errors = categorize_syntax_errors(parser.error_log)
+            return tree, map_error_positions(errors, position_map), position_map
+        return tree, [], position_map
+
+    except etree.XMLSyntaxError:
+        # The parser's own log: e.error_log also holds earlier parses in this thread
+        errors = categorize_syntax_errors(parser.error_log)
+        return None, map_error_positions(errors, position_map), position_map
+
+    except Exception as e:
+        return None, [("CheckSGM", 0, 0, f"Unexpected error: {str(e)}")], position_map
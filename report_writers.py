@@ -0,0 +1,165 @@
+import csv
+import json
+import os
+from errors import ErrorSink
+
+REPORT_COLUMNS = ["File", "Category", "Page", "Line", "Column", "Code", "Message", "Context"]
+EXCEL_CATEGORIES = ["Repent", "Reptag", "CheckSGM"]
+EXCEL_MAX_ROWS = 1048576
+
+
+def _row(error, include_context):
+    return [error.file_id, error.category, error.page, error.line, error.column,
+            error.code, error.message, error.context if include_context else ""]
+
+
+class _FileReportSink(ErrorSink):
+    """Base for sinks writing rows to a file; keeps only per-file counts."""
+
+    def __init__(self, path, include_context=True):
+        self.path = path
+        self.include_context = include_context
+        self.counts = {}
+
+    def end_file(self, file_id, error_count):
+        self.counts[file_id] = error_count
+
+    def result(self):
+        return dict(self.counts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class CsvReportSink(_FileReportSink):
+    """One CSV row per error, written as soon as the error is emitted."""
+
+    def __init__(self, path, include_context=True):
+        super().__init__(path, include_context)
+        # utf-8-sig so Excel opens the file with the right encoding
+        self.file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(REPORT_COLUMNS)
+
+    def emit(self, error):
+        self.writer.writerow(_row(error, self.include_context))
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class JsonLinesReportSink(_FileReportSink):
+    """One JSON object per error (ValidationError.to_dict layout)."""
+
+    def __init__(self, path, include_context=True):
+        super().__init__(path, include_context)
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def emit(self, error):
+        record = error.to_dict()
+        if not self.include_context:
+            record["context"] = ""
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class ExcelReportSink(_FileReportSink):
+    """
+    openpyxl write-only workbook: a Summary sheet with per-file counts plus
+    one sheet per category. Rows are streamed to a temporary file by
+    openpyxl, so memory does not grow with the number of errors; the
+    workbook is assembled when close() is called.
+    """
+
+    def __init__(self, path, include_context=True):
+        super().__init__(path, include_context)
+        from openpyxl import Workbook
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        self._illegal = ILLEGAL_CHARACTERS_RE
+        self.workbook = Workbook(write_only=True)
+        self.summary = self.workbook.create_sheet("Summary")
+        self.summary.append(["File", "Issues"])
+        self.sheets = {}  # category -> [sheet, rows written]
+        for category in EXCEL_CATEGORIES:
+            self._sheet(category)
+        self.closed = False
+
+    def _sheet(self, category):
+        entry = self.sheets.get(category)
+        if entry is None or entry[1] >= EXCEL_MAX_ROWS:
+            # Spill to "<category> (2)", ... once a sheet is full
+            part = 1 if entry is None else entry[2] + 1
+            title = category if part == 1 else f"{category} ({part})"
+            sheet = self.workbook.create_sheet(title[:31])
+            sheet.append(REPORT_COLUMNS)
+            entry = self.sheets[category] = [sheet, 1, part]
+        return entry
+
+    def _clean(self, value):
+        # Control characters in a cell make openpyxl refuse the whole row
+        return self._illegal.sub("", value) if isinstance(value, str) else value
+
+    def emit(self, error):
+        entry = self._sheet(error.category)
+        entry[0].append([self._clean(value) for value in _row(error, self.include_context)])
+        entry[1] += 1
+
+    def end_file(self, file_id, error_count):
+        super().end_file(file_id, error_count)
+        self.summary.append([file_id, error_count])
+
+    def close(self):
+        if not self.closed:
+            self.summary.append(["Total", sum(self.counts.values())])
+            self.workbook.save(self.path)
+            self.closed = True
+
+
+class TeeSink(ErrorSink):
+    """Forwards every call to several sinks; result() is the first sink's."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def begin_file(self, file_id):
+        for sink in self.sinks:
+            sink.begin_file(file_id)
+
+    def emit(self, error):
+        for sink in self.sinks:
+            sink.emit(error)
+
+    def end_file(self, file_id, error_count):
+        for sink in self.sinks:
+            sink.end_file(file_id, error_count)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def result(self):
+        return self.sinks[0].result() if self.sinks else None
+
+
+REPORT_SINKS = {
+    ".csv": CsvReportSink,
+    ".jsonl": JsonLinesReportSink,
+    ".xlsx": ExcelReportSink,
+}
+
+
+def report_sink_for_path(path, include_context=True):
+    """Picks the report writer from the file extension (.csv, .jsonl, .xlsx)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in REPORT_SINKS:
+        raise ValueError(f"Unsupported report format '{extension}' "
+                         f"(expected one of {', '.join(sorted(REPORT_SINKS))})")
+    return REPORT_SINKS[extension](path, include_context)
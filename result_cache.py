@@ -0,0 +1,135 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from errors import ValidationError
+from config_snapshot import load_snapshot
+from config import CACHE_DIR, CACHE_MAX_BYTES
+
+# Bump when the stored error layout changes; checker changes need no bump,
+# CHECKER_SOURCES are part of the key
+# 3: parse and tag error positions refer to the raw file
+# 4: ENCODING errors for files that are not valid in their detected encoding
+# 5: error categories from lxml error codes
+# 6: entity names and substitutions from entity_registry's entity sets
+# 7: tag rules compiled by TagRules ('fnt*' covers fnt4, FNT12, ...)
+CACHE_FORMAT_VERSION = 7
+HASH_BLOCK_SIZE = 1024 * 1024
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Modules whose code decides the cached results (validator.py's imports)
+CHECKER_SOURCES = (
+    "validator.py", "parser.py", "entity_checker.py", "tag_checker.py", "tag_rules.py",
+    "stream_validator.py", "error_classifier.py", "errors.py", "line_index.py",
+    "file_loader.py", "entity_registry.py", "config_snapshot.py", "config.py",
+)
+
+
+@functools.lru_cache(maxsize=1)
+def code_fingerprint():
+    """Hash of the CHECKER_SOURCES contents; a missing source hashes as empty."""
+    digest = hashlib.sha256()
+    for name in CHECKER_SOURCES:
+        digest.update(name.encode("utf-8") + b"\0")
+        try:
+            with open(os.path.join(_MODULE_DIR, name), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+        digest.update(b"\1")
+    return digest.hexdigest()
+
+
+def config_fingerprint():
+    """
+    Hash of everything that influences validation results: config.py's
+    tables, the entity sets (entities/*.ent) and the checker code.
+    """
+    payload = f"{CACHE_FORMAT_VERSION}:{load_snapshot().fingerprint}:{code_fingerprint()}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ValidationCache:
+    """
+    On-disk cache of categorized errors keyed by file content hash plus the
+    config and code fingerprint. One JSON file per entry; entry mtime is
+    refreshed on every hit so evict() can drop least-recently-used entries
+    first.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fingerprint = config_fingerprint()
+
+    def key_for_file(self, file_path, variant=""):
+        """
+        Returns the cache key for a file, hashing it in blocks.
+        variant separates results of different validation modes.
+        """
+        digest = hashlib.sha256((self.fingerprint + variant).encode("utf-8"))
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        """Returns the stored ValidationError list, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                errors = json.load(f)
+            os.utime(path)  # Mark as recently used
+            return [ValidationError.from_dict(error) for error in errors]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, key, errors):
+        """Stores an error list; written atomically so workers can share the cache."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump([error.to_dict() for error in errors], f, ensure_ascii=False)
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _entries(self):
+        try:
+            with os.scandir(self.cache_dir) as it:
+                return [entry for entry in it if entry.name.endswith(".json")]
+        except FileNotFoundError:
+            return []
+
+    def evict(self):
+        """Deletes least-recently-used entries until the cache fits max_bytes."""
+        entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                   for entry in self._entries()]
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def purge(self):
+        """Deletes every cache entry."""
+        removed = 0
+        for entry in self._entries():
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
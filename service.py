@@ -0,0 +1,354 @@
+"""
+Long-lived validation service: keeps imports and worker processes warm so
+documents can be submitted one by one without starting Python per file.
+
+Usage:
+    python service.py --stdin [--workers N]          # JSON lines on stdin/stdout
+    python service.py --port 8765 [--host 127.0.0.1] # local HTTP
+
+Request (one JSON object per line, or the body of POST /validate):
+    {"id": 1, "path": "Samples/23-4031.FNT"}
+    {"id": 2, "name": "upload.FNT", "content": "<Page 1>..."}
+    optional "recover": true
+Response:
+    {"id": 1, "status": "ok", "file": "23-4031.FNT", "issues": 6,
+     "seconds": 0.01, "errors": {"Reptag": [{...}, ...], ...}}
+    {"id": 1, "status": "error" | "busy", "message": "..."}
+Health and metrics: GET /health, GET /metrics, or {"op": "health"} /
+{"op": "metrics"} on stdin.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MAX_PENDING = 64
+DEFAULT_MAX_BODY_BYTES = 64 * 1024 * 1024
+HTTP_STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class ServiceBusy(Exception):
+    """Raised when max_pending documents are already queued or running."""
+
+
+def _warm_worker(snapshot=None):
+    # Pay the lxml/config import cost once per worker, not on the first document;
+    # the config and entity tables come from the parent instead of being reloaded
+    if snapshot is not None:
+        from config_snapshot import install_snapshot
+        install_snapshot(snapshot)
+    import validator  # noqa: F401
+
+
+def _validate_request(path=None, content=None, name=None, recover=False):
+    """Worker task: returns (file_id, [error dicts], seconds)."""
+    from validator import validate_file, validate_content
+    start = time.perf_counter()
+    if content is not None:
+        file_id = name or "<content>"
+        errors = validate_content(content, file_id, recover)
+    else:
+        file_id = os.path.basename(path)
+        errors = validate_file(path, recover=recover)
+    return file_id, [error.to_dict() for error in errors], time.perf_counter() - start
+
+
+class ServiceMetrics:
+    """Counters reported by /metrics."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.received = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        self.issues_by_category = {}
+
+    def snapshot(self, pending, max_pending, workers):
+        return {
+            "uptime_s": round(time.time() - self.started, 3),
+            "workers": workers,
+            "pending": pending,
+            "max_pending": max_pending,
+            "received": self.received,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_seconds": round(self.busy_seconds / self.completed, 6) if self.completed else None,
+            "issues_by_category": dict(self.issues_by_category),
+        }
+
+
+class ValidationService:
+    """
+    Accepts documents, runs validator.validate_file/validate_content in a
+    process pool and answers with errors grouped by category.
+    At most max_pending documents are queued or running at once; beyond
+    that submit() raises ServiceBusy (HTTP 503), and the stdin loop stops
+    reading until a slot frees up.
+    """
+
+    def __init__(self, workers=None, max_pending=DEFAULT_MAX_PENDING, recover=False):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.recover = recover
+        self.pending = 0
+        self.metrics = ServiceMetrics()
+        self.executor = None
+
+    def start(self):
+        from config_snapshot import load_snapshot, snapshot_payload
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                            initargs=(snapshot_payload(load_snapshot()),))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def has_capacity(self):
+        return self.pending < self.max_pending
+
+    def health(self):
+        return {"status": "ok" if self.executor is not None else "stopped",
+                "pending": self.pending, "max_pending": self.max_pending}
+
+    def metrics_snapshot(self):
+        return self.metrics.snapshot(self.pending, self.max_pending, self.workers)
+
+    async def submit(self, request):
+        """Validates one request dict and returns the response dict."""
+        self.metrics.received += 1
+        request_id = request.get("id")
+        path, content = request.get("path"), request.get("content")
+        if (path is None) == (content is None):
+            self.metrics.failed += 1
+            return {"id": request_id, "status": "error",
+                    "message": "give exactly one of 'path' or 'content'"}
+        if not self.has_capacity():
+            self.metrics.rejected += 1
+            raise ServiceBusy(f"{self.pending} documents pending (limit {self.max_pending})")
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            file_id, errors, seconds = await loop.run_in_executor(
+                self.executor, _validate_request, path, content, request.get("name"),
+                bool(request.get("recover", self.recover))
+            )
+        except Exception as e:
+            # Unreadable file, bad encoding, broken worker: report, keep serving
+            self.metrics.failed += 1
+            return {"id": request_id, "status": "error", "message": f"{type(e).__name__}: {e}"}
+        finally:
+            self.pending -= 1
+
+        self.metrics.completed += 1
+        self.metrics.busy_seconds += seconds
+        grouped = {}
+        for error in errors:
+            grouped.setdefault(error["category"], []).append(error)
+        for category, group in grouped.items():
+            self.metrics.issues_by_category[category] = (
+                self.metrics.issues_by_category.get(category, 0) + len(group)
+            )
+        return {"id": request_id, "status": "ok", "file": file_id, "issues": len(errors),
+                "seconds": round(seconds, 6), "errors": grouped}
+
+    async def handle(self, request):
+        """submit() plus the health/metrics ops; never raises."""
+        op = request.get("op", "validate")
+        if op == "health":
+            return self.health()
+        if op == "metrics":
+            return self.metrics_snapshot()
+        if op != "validate":
+            return {"id": request.get("id"), "status": "error", "message": f"unknown op '{op}'"}
+        try:
+            return await self.submit(request)
+        except ServiceBusy as e:
+            return {"id": request.get("id"), "status": "busy", "message": str(e)}
+
+
+# ========== STDIN / STDOUT ==========
+async def serve_stdin(service, stdin=None, stdout=None):
+    """
+    Reads JSON requests line by line and writes responses as they finish
+    (not necessarily in input order; match them by "id").
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(service.max_pending)
+    tasks = set()
+
+    async def run(request):
+        try:
+            response = await service.handle(request)
+        finally:
+            slots.release()
+        stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+        stdout.flush()
+
+    while True:
+        # Backpressure: no new line is read while every slot is taken
+        await slots.acquire()
+        line = await loop.run_in_executor(None, stdin.readline)
+        if not line:
+            slots.release()
+            break
+        if not line.strip():
+            slots.release()
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            slots.release()
+            stdout.write(json.dumps({"status": "error", "message": f"bad request: {e}"}) + "\n")
+            stdout.flush()
+            continue
+        task = asyncio.create_task(run(request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+# ========== HTTP ==========
+async def _read_http_request(reader, max_body_bytes):
+    """Returns (method, path, headers, body) or None at end of connection."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise ValueError("malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > max_body_bytes:
+        raise OverflowError(f"body larger than {max_body_bytes} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+def _http_response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = [
+        f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}",
+        "Content-Type: application/json; charset=utf-8",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    if status == 503:
+        head.append("Retry-After: 1")
+    return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def _route(service, method, path, body):
+    if path == "/health":
+        return 200, service.health()
+    if path == "/metrics":
+        return 200, service.metrics_snapshot()
+    if path != "/validate":
+        return 404, {"status": "error", "message": f"no route {path}"}
+    if method != "POST":
+        return 405, {"status": "error", "message": "use POST"}
+    try:
+        request = json.loads(body or b"{}")
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+    except ValueError as e:
+        return 400, {"status": "error", "message": f"bad request: {e}"}
+    try:
+        response = await service.submit(request)
+    except ServiceBusy as e:
+        return 503, {"id": request.get("id"), "status": "busy", "message": str(e)}
+    return (200 if response["status"] == "ok" else 400), response
+
+
+def make_http_handler(service, max_body_bytes=DEFAULT_MAX_BODY_BYTES):
+    """asyncio.start_server callback serving /validate, /health and /metrics."""
+
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    parsed = await _read_http_request(reader, max_body_bytes)
+                except OverflowError as e:
+                    writer.write(_http_response(413, {"status": "error", "message": str(e)}, False))
+                    break
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    writer.write(_http_response(400, {"status": "error", "message": str(e)}, False))
+                    break
+                if parsed is None:
+                    break
+                method, path, headers, body = parsed
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, payload = await _route(service, method, path, body)
+                writer.write(_http_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return handle_connection
+
+
+async def serve_http(service, host="127.0.0.1", port=8765, max_body_bytes=DEFAULT_MAX_BODY_BYTES):
+    server = await asyncio.start_server(make_http_handler(service, max_body_bytes), host, port)
+    print(f"🌐 Validation service on http://{host}:{port} "
+          f"({service.workers} workers, max {service.max_pending} pending)", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Long-lived validation service")
+    mode = arg_parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--stdin", action="store_true", help="JSON lines on stdin/stdout")
+    mode.add_argument("--port", type=int, help="serve HTTP on this port")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("-j", "--workers", type=int, default=None,
+                            help="worker processes (default: all cores)")
+    arg_parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                            help="documents queued or running before new ones are refused")
+    arg_parser.add_argument("--max-body-mb", type=float, default=DEFAULT_MAX_BODY_BYTES / 1024 / 1024)
+    arg_parser.add_argument("--recover", action="store_true",
+                            help="default recover mode for requests that do not set it")
+    args = arg_parser.parse_args(argv)
+
+    service = ValidationService(args.workers, args.max_pending, args.recover)
+    service.start()
+    try:
+        if args.stdin:
+            asyncio.run(serve_stdin(service))
+        else:
+            asyncio.run(serve_http(service, args.host, args.port,
+                                   int(args.max_body_mb * 1024 * 1024)))
+    except KeyboardInterrupt:
+        print("\n👋 Service stopped", file=sys.stderr)
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+import os
+from collections import deque
+from lxml import etree
+from parser import preprocess, categorize_syntax_errors, map_error_positions, PositionMap
+from line_index import LineIndex, PageTable
+from entity_checker import check_entities
+from tag_checker import TagRuleWalker
+from file_loader import detect_encoding, iter_line_chunks, DETECT_BLOCK_SIZE, FALLBACK_ENCODING
+from errors import ValidationError, XML_SYNTAX, INVALID_ENTITY, TAG_RULE, ENCODING, STREAM_TRUNCATED, \
+    POST_RECOVERY_NOTE
+from config import CUSTOM_ENTITIES, STREAM_CHUNK_SIZE
+
+# libxml2's push parser halts on a start tag without a valid name even with
+# recover (an in-memory parse goes on): the rest of the document yields
+# neither events nor errors. Bad attribute names share the error type.
+HALTING_ERROR = (etree.ErrorTypes.ERR_NAME_REQUIRED, "StartTag: invalid element name")
+TRUNCATED_MESSAGE = ("Streaming recovery stops here; the rest of the file was not parsed "
+                     "(validate it without streaming)")
+
+
+def read_context_lines(file_path, line_numbers, encoding="utf-8"):
+    """Returns {line: stripped text} for the requested lines in one streaming pass."""
+    wanted = set(line_numbers)
+    context = {}
+    if not wanted:
+        return context
+    last = max(wanted)
+    with open(file_path, 'r', encoding=encoding, errors='replace') as f:
+        for line_num, line in enumerate(f, 1):
+            if line_num in wanted:
+                context[line_num] = line.strip().lstrip("\ufeff")
+            if line_num >= last:
+                break
+    return context
+
+
+class RecentPositionMaps:
+    """
+    PositionMaps of the last few fed pieces. libxml2 may report a position
+    a little behind the data just fed, so more than one piece is kept;
+    positions in older pieces keep their cleaned columns.
+    """
+
+    def __init__(self, keep=3):
+        self.maps = deque(maxlen=keep)
+
+    def add(self, position_map):
+        self.maps.append(position_map)
+
+    def _map_for(self, line):
+        for position_map in reversed(self.maps):
+            if position_map.covers(line):
+                return position_map
+        return None
+
+    def raw_position(self, line, column):
+        position_map = self._map_for(line)
+        return position_map.raw_position(line, column) if position_map else (line, column)
+
+    def element_column(self, line, tag, occurrence=0):
+        position_map = self._map_for(line)
+        return position_map.element_column(line, tag, occurrence) if position_map else 0
+
+    def closing_tag_column(self, line, tag):
+        position_map = self._map_for(line)
+        return position_map.closing_tag_column(line, tag) if position_map else 0
+
+
+class StreamingTagValidator:
+    """
+    Feeds preprocessed chunks into an XMLPullParser and runs the tag_checker
+    rules on start/end events. Finished elements are cleared and detached
+    once their tail is known, so memory stays flat for any document size.
+    The pull parser stops at the first fatal syntax error; with
+    recover=True it repairs the document like parse_xml(recover=True) and
+    the errors of each piece are mapped while its PositionMap is at hand,
+    up to a HALTING_ERROR (halted_at: its raw (line, column)).
+    """
+
+    def __init__(self, classifier=None, recover=False):
+        self.recover = recover
+        self.parser = etree.XMLPullParser(events=("start", "end"), recover=recover)
+        self.position_maps = RecentPositionMaps()
+        self.walker = TagRuleWalker(classifier, position_map=self.position_maps)
+        self.parse_errors = []
+        self.failed = False
+        # Entries of parser.feed_error_log already mapped, and their cleaned positions
+        self.logged = 0
+        self.logged_positions = set()
+        self.halted_at = None
+        # Ended elements whose tail may still be growing
+        self.pending = []
+        # XMLPullParser only reports through the thread-wide log; start it empty
+        etree.clear_error_log()
+        self._feed("<root>")
+
+    def _flush_pending(self):
+        for elem in self.pending:
+            self.walker.check_tail(elem)
+            parent = elem.getparent()
+            elem.clear(keep_tail=False)
+            if parent is not None:
+                parent.remove(elem)
+        self.pending = []
+
+    def _handle_events(self):
+        for event, elem in self.parser.read_events():
+            # Any new event means every pending tail is complete
+            if self.pending:
+                self._flush_pending()
+            if event == "start":
+                self.walker.start(elem)
+            else:
+                self.walker.end(elem)
+                self.pending.append(elem)
+
+    def _collect_recovered_errors(self):
+        log = self.parser.feed_error_log
+        if len(log) == self.logged or self.halted_at is not None:
+            return
+        entries = [log[i] for i in range(self.logged, len(log))]
+        self.logged = len(log)
+        for index, entry in enumerate(entries):
+            if (entry.type, entry.message.strip()) == HALTING_ERROR:
+                # Anything after it (e.g. at close) is an artefact of the halt
+                entries = entries[:index + 1]
+                self.halted_at = self.position_maps.raw_position(entry.line, entry.column)
+                break
+        # Same (line, column) dedup as categorize_syntax_errors, across pieces
+        fresh = [error for error in categorize_syntax_errors(entries)
+                 if (error[1], error[2]) not in self.logged_positions]
+        self.logged_positions.update((error[1], error[2]) for error in fresh)
+        self.parse_errors.extend(map_error_positions(fresh, self.position_maps))
+
+    def _feed(self, text):
+        if self.failed or self.halted_at is not None:
+            return
+        try:
+            self.parser.feed(text)
+            self._handle_events()
+            if self.recover:
+                self._collect_recovered_errors()
+        except etree.XMLSyntaxError as e:
+            self.failed = True
+            self.parse_errors = map_error_positions(
+                categorize_syntax_errors(e.error_log), self.position_maps
+            )
+
+    def feed(self, cleaned_text, position_map=None):
+        """Feeds one preprocessed piece; position_map maps it back to the raw file."""
+        if position_map is not None:
+            self.position_maps.add(position_map)
+        self._feed(cleaned_text)
+
+    def close(self):
+        """Finishes the parse; returns (parse_errors, tag_errors)."""
+        self._feed("</root>")
+        if not self.failed:
+            try:
+                self.parser.close()
+                self._handle_events()
+                if self.recover:
+                    self._collect_recovered_errors()
+            except etree.XMLSyntaxError as e:
+                self.failed = True
+                self.parse_errors = map_error_positions(
+                    categorize_syntax_errors(e.error_log), self.position_maps
+                )
+        self._flush_pending()
+        # Match parse_xml: tag rules only count when the document parsed
+        tag_errors = [] if self.failed else self.walker.errors
+        if self.recover and self.parse_errors:
+            tag_errors = [(cat, line, col, msg + POST_RECOVERY_NOTE) for cat, line, col, msg in tag_errors]
+        return self.parse_errors, tag_errors
+
+
+def _prepare_piece(first_line, piece, chunk_index):
+    preprocessed = preprocess(piece)
+    return preprocessed.text, PositionMap(preprocessed, chunk_index, first_line)
+
+
+def stream_validate_file(file_path, custom_entities=None, chunk_size=STREAM_CHUNK_SIZE,
+                         file_id=None, recover=False):
+    """
+    Streaming counterpart of validator.validate_file for huge documents.
+    Returns the same ValidationError list; context lines are read back in
+    one pass at the end since the document text is not kept.
+    recover as in validator.validate_file.
+    """
+    with open(file_path, 'rb') as f:
+        encoding, bom_length = detect_encoding(f.read(DETECT_BLOCK_SIZE))
+    tag_validator = StreamingTagValidator(recover=recover)
+    pages = PageTable()
+    entity_errors = []
+    decode_errors = []
+    last_piece = None
+
+    for first_line, piece in iter_line_chunks(file_path, chunk_size, encoding, bom_length,
+                                              decode_errors):
+        offset = first_line - 1
+        chunk_index = LineIndex(piece)
+        for line, label in zip(chunk_index.pages.page_lines, chunk_index.pages.page_labels):
+            pages.add(line + offset, label)
+
+        for category, line, col, msg in check_entities(
+            piece, custom_entities or CUSTOM_ENTITIES, line_index=chunk_index
+        ):
+            entity_errors.append((category, line + offset, col, msg))
+
+        # parse_xml drops trailing newlines before </root>; hold back the last piece
+        if last_piece is not None:
+            tag_validator.feed(*_prepare_piece(*last_piece))
+        last_piece = (first_line, piece, chunk_index)
+
+    if last_piece is not None:
+        cleaned, position_map = _prepare_piece(*last_piece)
+        tag_validator.feed(cleaned.rstrip("\r\n"), position_map)
+    parse_errors, tag_errors = tag_validator.close()
+
+    found = [(cat, line, col, ENCODING, msg) for cat, line, col, msg in decode_errors]
+    for cat, line, col, msg in parse_errors:
+        found.append((cat, line, col, XML_SYNTAX, msg.replace("XML Syntax error: ", "")))
+    if tag_validator.halted_at is not None:
+        found.append(("CheckSGM", *tag_validator.halted_at, STREAM_TRUNCATED, TRUNCATED_MESSAGE))
+    for _, line, col, msg in entity_errors:
+        found.append(("Repent", line, col, INVALID_ENTITY, msg))
+    for _, line, col, msg in tag_errors:
+        found.append(("Reptag", line, col, TAG_RULE, msg))
+
+    file_id = file_id or os.path.basename(file_path)
+    # After a decode error the file is most likely wholly in the fallback encoding
+    context = read_context_lines(file_path, (error[1] for error in found),
+                                 FALLBACK_ENCODING if decode_errors else encoding)
+    return [
+        ValidationError(cat, file_id, line, col, pages.page_for_line(line), code, msg,
+                        context=context.get(line, ""))
+        for cat, line, col, code, msg in found
+    ]
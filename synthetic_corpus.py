@@ -0,0 +1,138 @@
+"""
+Synthetic FNT/XML document generator for benchmarks.
+
+Usage:
+    python synthetic_corpus.py OUT_DIR [--count N] [--size-kb N] [--seed N] ...
+"""
+import argparse
+import os
+import random
+from config import CUSTOM_ENTITIES
+
+WORDS = (
+    "the court held that plaintiff defendant appeal district statute claim "
+    "panel order judgment review evidence motion record standard amendment "
+    "rights policy commission action enforcement law state federal argued"
+).split()
+
+# Misspellings of real entities, reported as Repent by check_entities
+INVALID_ENTITIES = ["mdsh", "nbps", "sectt", "eacut", "bogus", "copyy", "ndassh"]
+
+STYLE_TAGS = ["EM", "EMB", "EMU", "EMBI"]
+
+LINES_PER_PAGE = 40
+
+
+def _sentence(rng, words=10):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _inject_error(rng, line):
+    """Adds one structural defect to a line."""
+    kind = rng.choice(("mismatch", "fnt_outside", "unclosed_em"))
+    if kind == "mismatch":
+        return f"{line} <EM>{rng.choice(WORDS)}</EMB>"
+    if kind == "fnt_outside":
+        return f"{line} <fnt{rng.randint(1, 9)}>"
+    return f"{line} <EMU>{rng.choice(WORDS)}"
+
+
+def generate_document(size_kb=100, footnote_density=0.2, entity_rate=0.5,
+                      invalid_entity_ratio=0.1, error_rate=0.0, seed=0):
+    """
+    Returns an FNT document of roughly size_kb kilobytes.
+    - footnote_density: probability that a line carries a footnote reference
+    - entity_rate: probability that a line carries an entity reference
+    - invalid_entity_ratio: share of entity references that are invalid
+    - error_rate: probability that a line carries a structural tag error
+    """
+    rng = random.Random(seed)
+    valid_entities = sorted(CUSTOM_ENTITIES)
+    target = size_kb * 1024
+
+    lines = ["[CN]", "Synthetic v. Generator", "[DK]", f"No. {seed:02d}-0000.", "<Page 1>"]
+    size = sum(len(line) + 1 for line in lines)
+    footnotes = []
+    page = 1
+    line_count = 0
+
+    while size < target:
+        line = _sentence(rng, rng.randint(6, 12))
+        if rng.random() < 0.3:
+            tag = rng.choice(STYLE_TAGS)
+            line = f"<{tag}>{_sentence(rng, 3)}</{tag}> {line}"
+        if rng.random() < entity_rate:
+            if rng.random() < invalid_entity_ratio:
+                entity = rng.choice(INVALID_ENTITIES)
+            else:
+                entity = rng.choice(valid_entities)
+            line = f"{line} &{entity}; {rng.choice(WORDS)}"
+        if rng.random() < footnote_density:
+            footnotes.append(_sentence(rng, rng.randint(15, 40)))
+            size += len(footnotes[-1]) + 8
+            line = f"{line}<SUP>{len(footnotes)}</SUP>"
+        if error_rate and rng.random() < error_rate:
+            line = _inject_error(rng, line)
+        if line_count and line_count % LINES_PER_PAGE == 0:
+            page += 1
+            lines.append(f"<Page {page}>")
+            size += len(lines[-1]) + 1
+        if line_count % 8 == 0:
+            line = f"<P20>{line}</P20>"
+
+        lines.append(line)
+        size += len(line) + 1
+        line_count += 1
+
+    if footnotes:
+        lines.append("<FN>")
+        for number, text in enumerate(footnotes, 1):
+            lines.append(f"<fnt{number}> {text}")
+        lines.append("</FN>")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_corpus(out_dir, count=10, extension=".FNT", **params):
+    """Writes `count` documents (seeds 0..count-1) and returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    base_seed = params.pop("seed", 0)
+    paths = []
+    for i in range(count):
+        path = os.path.join(out_dir, f"synthetic-{i:04d}{extension}")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(generate_document(seed=base_seed + i, **params))
+        paths.append(path)
+    return paths
+
+
+def add_generator_arguments(arg_parser):
+    """Registers the generator parameters on an argparse parser."""
+    arg_parser.add_argument("--size-kb", type=int, default=100)
+    arg_parser.add_argument("--footnote-density", type=float, default=0.2)
+    arg_parser.add_argument("--entity-rate", type=float, default=0.5)
+    arg_parser.add_argument("--invalid-entity-ratio", type=float, default=0.1)
+    arg_parser.add_argument("--error-rate", type=float, default=0.0)
+    arg_parser.add_argument("--seed", type=int, default=0)
+
+
+def generator_params(args):
+    """Collects generator parameters from parsed arguments."""
+    return {
+        "size_kb": args.size_kb,
+        "footnote_density": args.footnote_density,
+        "entity_rate": args.entity_rate,
+        "invalid_entity_ratio": args.invalid_entity_ratio,
+        "error_rate": args.error_rate,
+        "seed": args.seed,
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic FNT corpus")
+    arg_parser.add_argument("out_dir")
+    arg_parser.add_argument("--count", type=int, default=10)
+    add_generator_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    paths = write_corpus(args.out_dir, args.count, **generator_params(args))
+    print(f"✅ Wrote {len(paths)} documents to {args.out_dir}")
@@ -1,97 +1,133 @@
+import warnings
 from lxml import etree
-from entity_checker import check_entities
-from config import SUPPORTED_TAGS, NON_CLOSING_TAGS, TAG_RELATIONSHIPS
-from lxml.etree import _Element
-import logging
+from tag_rules import (  # noqa: F401
+    TagClass, TagClassifier, DEFAULT_CLASSIFIER, TagRules, DEFAULT_RULES, rules_for, rules_for_non_closing,
+    CONFIG_SNAPSHOT,
+    CHILD_NEEDS_PARENT, CHILD_NOT_ALLOWED, CHILD_FORBIDDEN, CHILD_INVALID, CHILD_ERRORS,
+    TAG_NO_CLOSE, TAG_FRAME, TAG_SUPPORTED, TAG_NON_CLOSING, NO_PARENT,
+)
 
 
+class TagRuleWalker:
+    """
+    Checks start/end events against the compiled TagRules, so a tree walk
+    (or a streaming parser) checks every element in one pass. The
+    closing-tag check (Rule 2) needs the element's tail and is kept
+    separate for callers that only see the tail after the end event.
+    """
 
-logger = logging.getLogger(__name__)
+    def __init__(self, classifier=None, line_mapping=None, position_map=None, rules=None):
+        self.rules = rules or rules_for(classifier)
+        self.line_mapping = line_mapping
+        # parser.PositionMap: gives raw columns; without it columns are 0
+        self.position_map = position_map
+        self.errors = []
+        # Tag IDs of the open elements
+        self.open_ids = [NO_PARENT]
+        # One frame per open TAG_FRAME element: [line, col, has_invalid_child]
+        self.frames = []
+        # (line, tag) -> start tags seen so far, to tell same-line elements apart
+        self.line_tag_counts = {}
 
-def validate_tags(tree, allowed_tags=None, non_closing_tags=None, line_mapping=None):
-    errors = []
-    if tree is None:
-        return errors
-
-    root = tree.getroot()
-
-    def is_fnt_variant(tag):
-        """Returns True if tag is any fnt variant (fnt, fnt*, fnt1, fnt2, etc.)"""
-        tag_lower = tag.lower()
-        return (tag_lower.startswith('fnt') and 
-                (tag_lower in {'fnt', 'fnt*'} or 
-                 tag_lower[3:].isdigit()))  # Matches fnt followed by digits
-
-    def is_non_closing(tag):
-        """Returns True if tag is a non-closing tag (fnt*, fnr*, etc.)"""
-        tag_lower = tag.lower()
-        non_closing_tags_lower = {t.lower() for t in (non_closing_tags or NON_CLOSING_TAGS)}
-        return any(
-            tag_lower == base_tag.lower() or
-            (base_tag.endswith('*') and tag_lower.startswith(base_tag.rstrip('*').lower())) or
-            (base_tag[:-1].isdigit() and tag_lower == base_tag.lower()[:-1])
-            for base_tag in non_closing_tags_lower
-        )
+    def _position(self, elem, occurrence=0):
+        line = elem.sourceline or 0
+        col = 0
+        if self.position_map is not None:
+            col = self.position_map.element_column(line, elem.tag, occurrence)
+        orig_line = self.line_mapping.get(line, line) if self.line_mapping else line
+        return orig_line, col
 
-    # First pass: Validate all elements
-    for elem in root.iter():
+    def start(self, elem):
         tag = elem.tag
-        parent = elem.getparent()
-        parent_tag = parent.tag if parent is not None else None
+        if not isinstance(tag, str):
+            return  # Comments and processing instructions
+        rules = self.rules
+        tag_id = rules.ids.get(tag)
+        if tag_id is None:
+            tag_id = rules.tag_id(tag)
+        parent_id = self.open_ids[-1]
+        self.open_ids.append(tag_id)
+        occurrence = 0
+        if self.position_map is not None:
+            key = (elem.sourceline, tag)
+            occurrence = self.line_tag_counts.get(key, 0)
+            self.line_tag_counts[key] = occurrence + 1
 
-        line = elem.sourceline or 0
-        col = getattr(elem, "sourcepos", 0)
-        orig_line = line_mapping.get(line, line) if line_mapping else line
+        bits = rules.transitions[parent_id][tag_id]
+        if bits:
+            if bits & CHILD_ERRORS:
+                # Positions are only looked up for elements that get reported
+                orig_line, col = self._position(elem, occurrence)
+                for message in rules.child_errors(bits, parent_id, tag_id, tag):
+                    self.errors.append(("Reptag", orig_line, col, message))
+            if bits & CHILD_INVALID:
+                self.frames[-1][2] = True
+        if rules.flags[tag_id] & TAG_FRAME:
+            orig_line, col = self._position(elem, occurrence)
+            self.frames.append([orig_line, col, False])
 
-        # Rule 1: Any fnt variant must be inside FN
-        if is_fnt_variant(tag) and parent_tag != 'FN':
-            errors.append((
-                "Reptag",
-                orig_line,
-                col,
-                f"<{tag}> must be inside <FN> tags (found outside)"
-            ))
+    def end(self, elem):
+        if not isinstance(elem.tag, str):
+            return
+        tag_id = self.open_ids.pop()
+        if self.rules.flags[tag_id] & TAG_FRAME:
+            line, col, has_invalid_child = self.frames.pop()
+            if has_invalid_child:
+                self.errors.append(("Reptag", line, col, self.rules.frame_error(tag_id)))
 
+    def check_tail(self, elem):
         # Rule 2: fnt variants cannot have closing tags (even inside FN)
-        if is_fnt_variant(tag) and elem.tail and '</' + tag.lower() + '>' in elem.tail.lower():
-            errors.append((
+        tail = elem.tail
+        if not tail or '</' not in tail or not isinstance(elem.tag, str):
+            return
+        if (self.rules.flags[self.rules.tag_id(elem.tag)] & TAG_NO_CLOSE
+                and '</' + elem.tag.lower() + '>' in tail.lower()):
+            orig_line = self._position(elem)[0] if self.line_mapping else (elem.sourceline or 0)
+            col = 0
+            if self.position_map is not None:
+                # Point at the offending </tag>, else at the element itself
+                col = (self.position_map.closing_tag_column(elem.sourceline or 0, elem.tag)
+                       or self.position_map.element_column(elem.sourceline or 0, elem.tag))
+            self.errors.append((
                 "Reptag",
                 orig_line,
                 col,
-                f"<{tag}> is a non-closing tag (do not use </{tag}>)"
+                f"<{elem.tag}> is a non-closing tag (do not use </{elem.tag}>)"
             ))
 
-        # Rule 3: Only fnt variants allowed inside FN
-        if parent_tag == 'FN' and not is_fnt_variant(tag) and tag.lower() != 'fn':
-            errors.append((
-                "Reptag",
-                orig_line,
-                col,
-                f"Only <fnt*> tags allowed inside <FN>, found <{tag}>"
-            ))
 
-    # Second pass: Validate FN nesting structure
-    fn_stack = []
-    for event, elem in etree.iterwalk(tree, events=("start", "end")):
-        tag = elem.tag
-        line = elem.sourceline or 0
-        col = getattr(elem, "sourcepos", 0)
-        orig_line = line_mapping.get(line, line) if line_mapping else line
+def validate_tags(tree, allowed_tags=None, non_closing_tags=None, line_mapping=None, classifier=None,
+                  position_map=None, rules=None):
+    """
+    Checks the tag rules on a parsed tree; returns (category, line, col, msg)
+    tuples. rules (a TagRules) wins over classifier, which wins over
+    non_closing_tags; compiled rules are reused across calls.
+    allowed_tags is deprecated and ignored: no tag rule depends on
+    SUPPORTED_TAGS (lint.py reports unsupported tags).
+    """
+    if allowed_tags is not None:
+        warnings.warn("validate_tags(allowed_tags=...) is ignored and will be removed",
+                      DeprecationWarning, stacklevel=2)
+    errors = []
+    if tree is None:
+        return errors
+
+    # parse_xml returns an element; ElementTree callers pass a tree
+    root = tree.getroot() if hasattr(tree, "getroot") else tree
+
+    if rules is None:
+        if classifier is None and non_closing_tags is not None:
+            rules = rules_for_non_closing(frozenset(non_closing_tags))
+        else:
+            rules = rules_for(classifier)
 
+    # Single pass: every rule is a table lookup on start/end events of one iterwalk
+    walker = TagRuleWalker(line_mapping=line_mapping, position_map=position_map, rules=rules)
+    for event, elem in etree.iterwalk(root, events=("start", "end")):
         if event == "start":
-            if tag == 'FN':
-                fn_stack.append((elem, orig_line, col))
-        elif event == "end":
-            if tag == 'FN' and fn_stack:
-                fn_elem, fn_line, fn_col = fn_stack.pop()
-                # Check if FN contains any non-fnt elements
-                if any(not is_fnt_variant(child.tag) for child in fn_elem):
-                    errors.append((
-                        "Reptag",
-                        orig_line,
-                        col,
-                        f"<FN> contains invalid child elements"
-                    ))
+            walker.start(elem)
+        else:
+            walker.end(elem)
+            walker.check_tail(elem)
 
-    return errors
-    
\ No newline at end of file
+    return walker.errors
@@ -0,0 +1,146 @@
+"""
+The tag lexer shared by lint.py and page_validator: one compiled pattern
+that tokenizes raw text the way parser.Preprocessor and libxml2 see it,
+and the checks of a single token or of plain text that need no tree.
+Findings are (AT_*, category, code, message); NEEDS_PARSE marks what only
+the full parse can decide. Free of lxml.
+"""
+import re
+from errors import XML_SYNTAX, NEEDS_PARSE
+
+# One token per tag, comment, processing instruction or CDATA start. The
+# tag branches match parser.Preprocessor's rewrites, spelled out case by
+# case: the scan is several times faster without re.IGNORECASE. A '<' that
+# starts none of them matches alone (libxml2: "StartTag: invalid element
+# name"). Names are plain ASCII of at most 1000 characters: anything else
+# (a namespace prefix, a non-ASCII letter, a name near libxml2's 50000
+# limit) is left in rest, which then fails ATTRIBUTES_PATTERN.
+TAG_TOKEN_PATTERN = re.compile(
+    r"<(?:[^\S\n]*(?:(?P<page>[Pp][Aa][Gg][Ee][^\S\n]+\d+[^\S\n]*>)"
+    r"|(?P<empty>[Ff](?:[Nn][Rr]\*|[Nn][Tt]\*|[Mm][Tt]\*|[Nn][Tt]\d+|[Mm][Tt]\d+|[Nn][Tt]))\b[^>\n]*>)"
+    r"|(?P<close>/?)(?P<name>[A-Za-z_][A-Za-z0-9_.-]{0,999})(?P<rest>[^<>]*)>"
+    r"|(?P<comment>!--.*?-->)|(?P<markup>\?.*?\?>|!\[CDATA\[))?",
+    re.DOTALL,
+)
+CHAR_REF_PATTERN = re.compile(r"&#(?:x([0-9a-fA-F]+)|([0-9]+));|&#")
+# Characters XML 1.0 forbids; few documents contain any, so each is looked
+# for with a substring test before the regex runs
+CONTROL_CHARS = tuple(chr(c) for c in (*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20),
+                                       0xFFFE, 0xFFFF))
+CONTROL_PATTERN = re.compile("[" + re.escape("".join(CONTROL_CHARS)) + "]")
+# What may follow a tag name: quoted attributes with names like the tag
+# names above, then an optional '/'
+ATTRIBUTES_PATTERN = re.compile(
+    r"""(?:\s+[A-Za-z_][A-Za-z0-9_.-]{0,999}\s*=\s*(?:"[^"<]*"|'[^'<]*'))*\s*/?"""
+)
+# The same with any word characters and ':' in names: a rest only this one
+# accepts holds namespaced or non-ASCII names, which libxml2 may accept
+UNCHECKED_ATTRIBUTES_PATTERN = re.compile(
+    r"""[\w.:-]*(?:\s+[\w.:-]+\s*=\s*(?:"[^"<]*"|'[^'<]*'))*\s*/?"""
+)
+# Attribute names of a rest ATTRIBUTES_PATTERN accepted
+ATTRIBUTE_NAME_PATTERN = re.compile(r"""([^\s=]+)\s*=\s*(?:"[^"]*"|'[^']*')""")
+PI_TARGET_PATTERN = re.compile(r"\?([A-Za-z_][A-Za-z0-9_.-]*)(?:\s|\?>)")
+
+# libxml2's limits without XML_PARSE_HUGE, which parse_xml does not set:
+# element depth (less the wrapper element and a margin) and text length
+MAX_SAFE_DEPTH = 250
+MAX_SAFE_LENGTH = 10_000_000
+
+# Where a tag finding points in its token
+AT_START = 0
+AT_END = 1
+AT_REST = 2
+
+INVALID_NAME = (AT_START, "Reptag", XML_SYNTAX, "StartTag: invalid element name")
+UNCHECKED_NAME = (AT_START, "CheckSGM", NEEDS_PARSE, "Namespace prefix or non-ASCII name not checked by lint")
+
+
+def is_xml_char(codepoint):
+    return (codepoint in (0x9, 0xA, 0xD) or 0x20 <= codepoint <= 0xD7FF
+            or 0xE000 <= codepoint <= 0xFFFD or 0x10000 <= codepoint <= 0x10FFFF)
+
+
+def _is_unchecked_name(rest):
+    """True when rest continues a name with ':' or non-ASCII characters."""
+    return ":" in rest or not rest.isascii()
+
+
+def close_tag_findings(rest):
+    """Findings for a closing tag whose rest is not blank."""
+    if _is_unchecked_name(rest):
+        return [UNCHECKED_NAME]
+    return [(AT_REST, "CheckSGM", XML_SYNTAX, "expected '>'")]
+
+
+def start_tag_findings(rest):
+    """
+    Findings for the rest of a start tag, and whether the tag still opens
+    an element (False when libxml2 gives up on it or the name goes on in
+    rest, so its closing tag would not match either).
+    """
+    if not ATTRIBUTES_PATTERN.fullmatch(rest):
+        if not (_is_unchecked_name(rest) and UNCHECKED_ATTRIBUTES_PATTERN.fullmatch(rest)):
+            message = ("attributes construct error" if rest[0].isspace()
+                       else "error parsing attribute name")
+            return [(AT_REST, "CheckSGM", XML_SYNTAX, message)], False
+        return [UNCHECKED_NAME], rest[0].isspace()
+    if rest.count("=") < 2 and "xmlns" not in rest:
+        return [], True
+    findings = []
+    names = ATTRIBUTE_NAME_PATTERN.findall(rest)
+    seen = set()
+    for name in names:
+        if name in seen:
+            findings.append((AT_REST, "CheckSGM", XML_SYNTAX, f"Attribute {name} redefined"))
+        seen.add(name)
+    if any(name.startswith("xmlns") for name in names):
+        findings.append((AT_REST, "CheckSGM", NEEDS_PARSE, "Namespace declaration not checked by lint"))
+    return findings, True
+
+
+def comment_findings(comment):
+    body = comment[3:-3]
+    if "--" in body or body.endswith("-"):
+        return [(AT_START, "CheckSGM", XML_SYNTAX, "Double hyphen within comment")]
+    return []
+
+
+def markup_findings(markup):
+    """Findings for a processing instruction or a CDATA start."""
+    if not markup.startswith("?"):
+        return [(AT_START, "CheckSGM", NEEDS_PARSE, "CDATA section not checked by lint")]
+    target = PI_TARGET_PATTERN.match(markup)
+    if target is not None and target.group(1) == "xml":
+        return [(AT_START, "CheckSGM", XML_SYNTAX,
+                 "XML declaration allowed only at the start of the document")]
+    if target is None or target.group(1).lower().startswith("xml"):
+        return [(AT_START, "CheckSGM", NEEDS_PARSE, "Processing instruction not checked by lint")]
+    return []
+
+
+def text_findings(content):
+    """
+    (offset, category, code, message) for what the lexer sees outside tag
+    tokens: bad character references, ']]>' and control characters.
+    """
+    findings = []
+    if "&#" in content:
+        for match in CHAR_REF_PATTERN.finditer(content):
+            hex_value, decimal_value = match.groups()
+            if hex_value is None and decimal_value is None:
+                message = "CharRef: invalid decimal value"
+            else:
+                codepoint = int(hex_value, 16) if hex_value is not None else int(decimal_value)
+                if is_xml_char(codepoint):
+                    continue
+                message = f"xmlParseCharRef: invalid xmlChar value {codepoint}"
+            findings.append((match.start(), "Repent", XML_SYNTAX, message))
+    if "]]>" in content:
+        findings.append((content.index("]]>"), "CheckSGM", NEEDS_PARSE,
+                         "Sequence ']]>' not checked by lint"))
+    if any(char in content for char in CONTROL_CHARS):
+        for match in CONTROL_PATTERN.finditer(content):
+            findings.append((match.start(), "CheckSGM", XML_SYNTAX,
+                             f"PCDATA invalid Char value {ord(match.group(0))}"))
+    return findings
@@ -0,0 +1,288 @@
+"""
+Tag classification and the compiled tag rules (SUPPORTED_TAGS,
+NON_CLOSING_TAGS, TAG_RELATIONSHIPS). Kept free of lxml so lint.py can
+check tags without loading the parser; tag_checker walks parsed trees
+with these rules.
+"""
+from functools import lru_cache
+from collections import namedtuple
+from config_snapshot import load_snapshot
+
+CONFIG_SNAPSHOT = load_snapshot()
+ROOT_TAG = "root"  # parse_xml's wrapper element, named in end-of-document errors
+
+# Classification of one tag name, computed once per distinct name
+TagClass = namedtuple("TagClass", ["fnt_variant", "non_closing", "supported", "allowed_in_fn"])
+
+
+class TagClassifier:
+    """
+    Classifies tag names against SUPPORTED_TAGS, NON_CLOSING_TAGS and
+    TAG_RELATIONSHIPS. Lookup sets are built once; each distinct tag name
+    is classified once and kept in a bounded LRU cache.
+    """
+
+    def __init__(self, supported_tags=None, non_closing_tags=None,
+                 tag_relationships=None, cache_size=1024):
+        # Defaults come precomputed from the config snapshot
+        self.supported_tags = (CONFIG_SNAPSHOT.supported_tags if supported_tags is None
+                               else frozenset(supported_tags))
+        # 'fnt*' in SUPPORTED_TAGS covers fnt4, fnt162, ... (see _in_family)
+        self.supported_families = tuple(sorted(
+            t[:-1].lower() for t in self.supported_tags if t.endswith('*')
+        ))
+        self.non_closing_lower = (CONFIG_SNAPSHOT.non_closing_lower if non_closing_tags is None
+                                  else frozenset(t.lower() for t in non_closing_tags))
+        # Wildcard bases ('fnt*' -> 'fnt') and digit-suffixed bases, precomputed
+        self.non_closing_prefixes = tuple(t[:-1] for t in self.non_closing_lower if t.endswith('*'))
+        self.non_closing_digit_bases = frozenset(
+            t[:-1] for t in self.non_closing_lower if t[:-1].isdigit()
+        )
+        if tag_relationships is None:
+            self.fn_children = CONFIG_SNAPSHOT.fn_allowed_children
+        else:
+            self.fn_children = frozenset(
+                tag_relationships.get('FN', {}).get('allowed_children') or []
+            )
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    @staticmethod
+    def is_fnt_variant(tag):
+        """Returns True if tag is any fnt variant (fnt, fnt*, fnt1, fnt2, etc.)"""
+        tag_lower = tag.lower()
+        return (tag_lower.startswith('fnt') and
+                (tag_lower in {'fnt', 'fnt*'} or
+                 tag_lower[3:].isdigit()))  # Matches fnt followed by digits
+
+    def is_non_closing(self, tag):
+        """Returns True if tag is a non-closing tag (fnt*, fnr*, etc.)"""
+        tag_lower = tag.lower()
+        return (tag_lower in self.non_closing_lower or
+                tag_lower.startswith(self.non_closing_prefixes) or
+                tag_lower in self.non_closing_digit_bases)
+
+    def _classify(self, tag):
+        if not isinstance(tag, str):
+            return None  # Comments and processing instructions
+        fnt_variant = self.is_fnt_variant(tag)
+        return TagClass(
+            fnt_variant=fnt_variant,
+            non_closing=self.is_non_closing(tag),
+            supported=(tag in self.supported_tags
+                       or any(_in_family(tag, base) for base in self.supported_families)),
+            allowed_in_fn=fnt_variant or tag in self.fn_children,
+        )
+
+
+DEFAULT_CLASSIFIER = TagClassifier()
+
+
+# ========== RULE COMPILER ==========
+# Bits of a (parent, child) transition
+CHILD_NEEDS_PARENT = 1   # child's required_parent is another tag (Rule 1)
+CHILD_NOT_ALLOWED = 2    # parent's allowed_children exclude the child (Rule 3)
+CHILD_FORBIDDEN = 4      # child's forbidden_parent is this parent
+CHILD_INVALID = 8        # parent is reported as having invalid children when it ends
+CHILD_ERRORS = CHILD_NEEDS_PARENT | CHILD_NOT_ALLOWED | CHILD_FORBIDDEN
+
+# Per-tag flags
+TAG_NO_CLOSE = 1         # fnt variant: a closing tag is an error (Rule 2)
+TAG_FRAME = 2            # has allowed_children: tracked while open
+TAG_SUPPORTED = 4
+TAG_NON_CLOSING = 8
+
+# Tag ID of the document element's parent
+NO_PARENT = 0
+
+
+def _family(pattern):
+    """'fnt*' -> 'fnt'; None for a plain name."""
+    return pattern[:-1].lower() if pattern.endswith('*') else None
+
+
+def _in_family(name, base):
+    """True for base, base* and base followed by digits, in any case."""
+    lower = name.lower()
+    if not lower.startswith(base):
+        return False
+    suffix = lower[len(base):]
+    return suffix in ('', '*') or suffix.isdigit()
+
+
+def _matches(name, patterns):
+    return name in patterns or any(
+        _in_family(name, _family(p)) for p in patterns if p.endswith('*')
+    )
+
+
+class TagRules:
+    """
+    SUPPORTED_TAGS, NON_CLOSING_TAGS and TAG_RELATIONSHIPS compiled into
+    integer tag IDs, a flag byte per tag and a parent x child transition
+    table of CHILD_* bits, so an element costs two lookups whatever the
+    number of rules.
+
+    A relationship key or allowed_children name ending in '*' covers a tag
+    family ('fnt*': fnt, fnt*, fnt1, FNT2, ...) and applies to members
+    without an entry of their own. Compiled keys: required_parent,
+    forbidden_parent and allowed_children (required_children,
+    allowed_siblings and parent_requirements carry no rules yet).
+    Every configured name has its own ID. Other names share one ID per
+    behaviour (same families, flags and case-folded clash with a ruled
+    tag), so fnt1..fnt900 footnote tags cost one table row, not 900.
+    """
+
+    def __init__(self, supported_tags=None, non_closing_tags=None, tag_relationships=None,
+                 classifier=None):
+        if classifier is None:
+            classifier = (DEFAULT_CLASSIFIER if supported_tags is None and non_closing_tags is None
+                          else TagClassifier(supported_tags, non_closing_tags))
+        self.classifier = classifier
+        relationships = (CONFIG_SNAPSHOT.tag_relationships if tag_relationships is None
+                         else tag_relationships)
+        self.entries = {key: rules for key, rules in relationships.items() if not key.endswith('*')}
+        self.family_entries = tuple(
+            (_family(key), rules) for key, rules in relationships.items() if key.endswith('*')
+        )
+        self.family_bases = tuple(sorted(
+            {base for base, _ in self.family_entries}
+            | {_family(p) for rules in relationships.values()
+               for p in rules.get('allowed_children') or () if p.endswith('*')}
+        ))
+        self.ruled_lower = frozenset(key.lower() for key in self.entries)
+        self.ids = {}
+        self.classes = {}              # behaviour key -> shared tag ID
+        self.names = [None]            # tag ID -> name (None: NO_PARENT)
+        self.entry_of = [None]         # tag ID -> relationship entry or None
+        self.flags = bytearray(1)      # tag ID -> TAG_* bits
+        self.transitions = [bytearray(1)]  # [parent ID][child ID] -> CHILD_* bits
+        self.allowed_text = {}         # parent ID -> "<fnt*>" for Rule 3 messages
+
+        known = set(classifier.supported_tags) | set(self.entries)
+        for rules in relationships.values():
+            for key in ('required_parent', 'forbidden_parent'):
+                if rules.get(key):
+                    known.add(rules[key])
+            known.update(name for name in rules.get('allowed_children') or ()
+                         if not name.endswith('*'))
+        for name in sorted(known):
+            self.ids[name] = self._add(name)
+
+    def tag_id(self, name):
+        tag_id = self.ids.get(name)
+        if tag_id is None:
+            key = self._behaviour(name)
+            tag_id = self.classes.get(key)
+            if tag_id is None:
+                tag_id = self.classes[key] = self._add(name)
+            self.ids[name] = tag_id
+        return tag_id
+
+    def _behaviour(self, name):
+        """Everything the transitions and flags of an unconfigured name depend on."""
+        lower = name.lower()
+        return (tuple(base for base in self.family_bases if _in_family(name, base)),
+                lower if lower in self.ruled_lower else None,
+                self._flags(name, self._entry(name)))
+
+    def _entry(self, name):
+        entry = self.entries.get(name)
+        if entry is None:
+            for base, rules in self.family_entries:
+                if _in_family(name, base):
+                    return rules
+        return entry
+
+    def _flags(self, name, entry):
+        info = self.classifier.classify(name)
+        flags = 0
+        if info.fnt_variant:
+            flags |= TAG_NO_CLOSE
+        if info.supported:
+            flags |= TAG_SUPPORTED
+        if info.non_closing:
+            flags |= TAG_NON_CLOSING
+        if entry and entry.get('allowed_children'):
+            flags |= TAG_FRAME
+        return flags
+
+    def _add(self, name):
+        """Appends a tag ID for name (and its row and column); the caller maps names to it."""
+        tag_id = len(self.names)
+        entry = self._entry(name)
+        self.names.append(name)
+        self.entry_of.append(entry)
+        self.flags.append(self._flags(name, entry))
+        # One new column in every row, then the new tag's row
+        for parent_id, row in enumerate(self.transitions):
+            row.append(self._transition(parent_id, tag_id))
+        self.transitions.append(bytearray(
+            self._transition(tag_id, child_id) for child_id in range(tag_id + 1)
+        ))
+        return tag_id
+
+    def _transition(self, parent_id, child_id):
+        parent, child = self.names[parent_id], self.names[child_id]
+        if child is None:
+            return 0
+        parent_rules = self.entry_of[parent_id] or {}
+        child_rules = self.entry_of[child_id] or {}
+        bits = 0
+        required = child_rules.get('required_parent')
+        if required and parent != required:
+            bits |= CHILD_NEEDS_PARENT
+        allowed = parent_rules.get('allowed_children')
+        if allowed and not _matches(child, allowed):
+            bits |= CHILD_INVALID
+            # A nested copy of the parent is only reported by the parent
+            if child.lower() != parent.lower():
+                bits |= CHILD_NOT_ALLOWED
+        forbidden = child_rules.get('forbidden_parent')
+        if forbidden and parent == forbidden and not bits & CHILD_NOT_ALLOWED:
+            bits |= CHILD_FORBIDDEN
+        return bits
+
+    def _allowed_text(self, parent_id):
+        text = self.allowed_text.get(parent_id)
+        if text is None:
+            allowed = self.entry_of[parent_id]['allowed_children']
+            families = [p for p in allowed if p.endswith('*')]
+            shown = families + [p for p in allowed if not p.endswith('*') and not _matches(p, families)]
+            text = self.allowed_text[parent_id] = ", ".join(f"<{p}>" for p in shown)
+        return text
+
+    def child_errors(self, bits, parent_id, child_id, tag):
+        """Messages for the CHILD_ERRORS bits of a transition, in rule order."""
+        messages = []
+        if bits & CHILD_NEEDS_PARENT:
+            required = self.entry_of[child_id]['required_parent']
+            messages.append(f"<{tag}> must be inside <{required}> tags (found outside)")
+        if bits & CHILD_NOT_ALLOWED:
+            messages.append(f"Only {self._allowed_text(parent_id)} tags allowed inside "
+                            f"<{self.names[parent_id]}>, found <{tag}>")
+        if bits & CHILD_FORBIDDEN:
+            messages.append(f"<{tag}> must not be inside <{self.names[parent_id]}>")
+        return messages
+
+    def frame_error(self, tag_id):
+        """Message for a TAG_FRAME element that had a CHILD_INVALID child."""
+        return f"<{self.names[tag_id]}> contains invalid child elements"
+
+
+DEFAULT_RULES = TagRules()
+
+
+@lru_cache(maxsize=16)
+def rules_for(classifier=None):
+    """DEFAULT_RULES, or rules compiled once per non-default classifier."""
+    if classifier is None or classifier is DEFAULT_CLASSIFIER:
+        return DEFAULT_RULES
+    return TagRules(classifier=classifier)
+
+
+@lru_cache(maxsize=16)
+def rules_for_non_closing(non_closing_tags):
+    """Rules for a frozenset of NON_CLOSING_TAGS; one classifier and TagRules per set."""
+    if non_closing_tags == CONFIG_SNAPSHOT.non_closing_tags:
+        return DEFAULT_RULES
+    return rules_for(TagClassifier(non_closing_tags=non_closing_tags))
@@ -1,127 +1,279 @@
 import os
-import re
-from collections import defaultdict
-from parser import parse_xml, preprocess_file_content
+import time
+import functools
+from parser import parse_xml, preprocess, POST_RECOVERY_NOTE, CONFIG_SNAPSHOT
+from config_snapshot import install_snapshot, snapshot_payload
+from line_index import LineIndex
+from file_loader import load_file, LoadedFile
 from entity_checker import check_entities
 from tag_checker import validate_tags
-from config import CUSTOM_ENTITIES, SUPPORTED_TAGS, NON_CLOSING_TAGS
-
-
-def validate_all_files(folder_path):
-    results = {}
-
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(('.fnt', '.xml')):
-            print(f"\n🔍 Scanning: {filename}")
-            file_path = os.path.join(folder_path, filename)
-
-            with open(file_path, 'r', encoding='utf-8') as f:
-                raw_content = f.read()
-
-            # Extract page numbers from P20 tags
-            page_numbers = {}
-            for match in re.finditer(r'<P20>(\d+)</P20>', raw_content):
-                page_numbers[match.start()] = match.group(1)
-
-            # Get cleaned content and line mapping
-            cleaned_content = preprocess_file_content(raw_content)
-            line_mapping = {}
-
-            # Parse cleaned content
-            tree, parse_errors, _ = parse_xml(cleaned_content)
-
-            categorized_errors = []
-            
-            # Process parse errors with page numbers and context
-            for error in parse_errors:
-                if len(error) == 4:
-                    cat, line, col, msg = error
-                    # Find closest page number
-                    page = next((p for pos, p in sorted(page_numbers.items()) if pos <= line*100), "?")
-                    msg = msg.replace("XML Syntax error: ", "")
-                    categorized_errors.append((cat, line, page, msg, raw_content.splitlines()[line-1].strip()))
-                else:
-                    line, col, msg = error
-                    page = next((p for pos, p in sorted(page_numbers.items()) if pos <= line*100), "?")
-                    msg = msg.replace("XML Syntax error: ", "")
-                    categorized_errors.append(("Reptag", line, page, msg, raw_content.splitlines()[line-1].strip()))
-
-            # Entity checks with page numbers and context
-            entity_errors = check_entities(raw_content, custom_entities=CUSTOM_ENTITIES)
-            for err in entity_errors:
-                if len(err) == 4:
-                    _, line, col, msg = err
-                    page = next((p for pos, p in sorted(page_numbers.items()) if pos <= line*100), "?")
-                    categorized_errors.append(("Repent", line, page, msg, raw_content.splitlines()[line-1].strip()))
-
-            # Tag validation with page numbers and context
-            if tree is not None:
-                tag_errors = validate_tags(
-                    tree,
-                    allowed_tags=SUPPORTED_TAGS,
-                    non_closing_tags=NON_CLOSING_TAGS,
-                    line_mapping=line_mapping
-                )
-                for err in tag_errors:
-                    if len(err) == 4:
-                        _, line, col, msg = err
-                        page = next((p for pos, p in sorted(page_numbers.items()) if pos <= line*100), "?")
-                        categorized_errors.append(("Reptag", line, page, msg, raw_content.splitlines()[line-1].strip()))
-
-            results[filename] = categorized_errors
-
-    return results
-
-
-def print_error_report(results):
-    """Prints the validation report with context and page numbers"""
-    print("\n" + "=" * 40)
-    print("✅ XML VALIDATION REPORT".center(40))
-    print("=" * 40)
-
-    for filename, errors in results.items():
-        if not errors:
-            print(f"\n✅ {filename}: No errors found")
-            continue
-
-        print(f"\n❌ {filename}: {len(errors)} ISSUES FOUND")
-        
-        # Group errors by category
-        error_groups = defaultdict(list)
-        for error in errors:
-            if len(error) == 5:
-                category, line, page, msg, context = error
-                error_groups[category].append((line, page, msg, context))
-            else:
-                error_groups["Other"].append((0, "?", str(error), "No context available"))
-
-        # Print errors by category
-        for category, errors in error_groups.items():
-            # Color coding
-            colors = {
-                "Repent": "\033[91m",    # Red
-                "Reptag": "\033[93m",    # Yellow
-                "CheckSGM": "\033[96m",  # Cyan
-                "Other": "\033[90m"      # Gray
-            }
-            reset = "\033[0m"
-
-            print(f"\n{colors.get(category, '')}══ {category.upper()} ERRORS ({len(errors)}) ══{reset}")
-            
-            for line, page, msg, context in errors:
-                print(f"  [Page {page}, Line {line}] {msg}")
-                print(f"       Context: '{context[:100]}'...")
-                print()  # Blank line after each error
-
-    # Print summary
-    total_files = len(results)
-    total_errors = sum(len(errs) for errs in results.values())
-    print("\n" + "=" * 40)
-    print(f"📊 SUMMARY: {total_files} files scanned, {total_errors} total issues")
-    print("=" * 40)
+from stream_validator import stream_validate_file
+from instrumentation import Instrumentation, NULL_INSTRUMENTATION
+from errors import (
+    ValidationError, ListSink, emit_file, file_ids, print_error_report,  # noqa: F401
+    XML_SYNTAX, INVALID_ENTITY, TAG_RULE, UNEXPECTED, ENCODING,
+)
+from config import (
+    CUSTOM_ENTITIES, NON_CLOSING_TAGS, STREAMING_THRESHOLD_BYTES, VALIDATED_EXTENSIONS,
+)
+
+
+def _uses_streaming(file_path, streaming_threshold):
+    return streaming_threshold is not None and os.path.getsize(file_path) >= streaming_threshold
+
+
+def validate_file(file_path, streaming_threshold=STREAMING_THRESHOLD_BYTES, recover=False,
+                  instrumentation=None, file_id=None):
+    """
+    Runs the parse/entity/tag pipeline on one file and returns its errors
+    as a list of errors.ValidationError.
+    Files of streaming_threshold bytes or more go through the streaming
+    validator (None disables streaming).
+    Without recover, validation stops at the first fatal syntax error.
+    With recover=True, all syntax errors are collected in one pass and the
+    entity and tag checks still run on the recovered tree; tag findings on
+    a repaired tree are marked with POST_RECOVERY_NOTE, everything else is
+    certain. Streamed files recover chunk by chunk, so libxml2 may repair
+    them a little differently from an in-memory parse.
+    instrumentation (see instrumentation.Instrumentation) records each stage.
+    file_id labels the errors; defaults to the file name.
+    """
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+    file_id = file_id or os.path.basename(file_path)
+
+    if _uses_streaming(file_path, streaming_threshold):
+        with instrumentation.stage(file_id, "stream_validate") as probe:
+            categorized_errors = stream_validate_file(file_path, CUSTOM_ENTITIES, file_id=file_id,
+                                                      recover=recover)
+            probe.errors = len(categorized_errors)
+        return categorized_errors
+
+    with instrumentation.stage(file_id, "read"):
+        loaded = load_file(file_path)
+
+    return validate_loaded(loaded, file_id, recover, instrumentation)
+
+
+def validate_content(raw_content, file_id, recover=False, instrumentation=None,
+                     custom_entities=CUSTOM_ENTITIES, rules=None):
+    """
+    In-memory part of validate_file for content that is already a string
+    (e.g. piped from convert_sgml_to_xml); file_id labels the errors.
+    """
+    return validate_loaded(LoadedFile.from_text(raw_content), file_id, recover, instrumentation,
+                           custom_entities, rules)
+
+
+def validate_loaded(loaded, file_id, recover=False, instrumentation=None,
+                    custom_entities=CUSTOM_ENTITIES, rules=None):
+    """
+    Pipeline on a file_loader.LoadedFile. Line/page tables and the entity
+    scan run on the memory-mapped bytes when the encoding allows it; only
+    the preprocessor and parser work on the decoded text.
+    custom_entities and rules (tag_rules.TagRules) default to config's.
+    """
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+
+    # Decode first: a UTF-8 file with bad bytes switches loaded.encoding
+    with instrumentation.stage(file_id, "decode"):
+        raw_content = loaded.text
+
+    # Line starts and page boundaries, built once per document
+    with instrumentation.stage(file_id, "line_index"):
+        scan_buffer = loaded.scan_buffer
+        line_index = LineIndex(scan_buffer, loaded.encoding)
+
+    # Preprocess once; parse_xml reuses the cleaned buffer
+    with instrumentation.stage(file_id, "preprocess"):
+        preprocessed = preprocess(raw_content)
+
+    # Parse cleaned content
+    with instrumentation.stage(file_id, "parse") as probe:
+        # PositionMap needs character offsets; a byte index is not reusable
+        tree, parse_errors, position_map = parse_xml(
+            raw_content, preprocessed, recover=recover,
+            line_index=None if line_index.binary else line_index
+        )
+        probe.errors = len(parse_errors)
+    post_recovery = recover and bool(parse_errors)
+
+    categorized_errors = []
+
+    def add_error(category, line, col, code, msg):
+        # Context is read from line_index only when someone asks for it
+        categorized_errors.append(ValidationError(
+            category, file_id, line, col, line_index.page_for_line(line), code, msg,
+            source=line_index
+        ))
+
+    for cat, line, col, msg in loaded.decode_errors:
+        add_error(cat, line, col, ENCODING, msg)
+
+    # Process parse errors with page numbers
+    for cat, line, col, msg in parse_errors:
+        code = UNEXPECTED if msg.startswith("Unexpected error") else XML_SYNTAX
+        add_error(cat, line, col, code, msg.replace("XML Syntax error: ", ""))
+
+    # Entity checks with page numbers
+    with instrumentation.stage(file_id, "check_entities") as probe:
+        entity_errors = check_entities(scan_buffer, custom_entities=custom_entities, line_index=line_index)
+        probe.errors = len(entity_errors)
+    for _, line, col, msg in entity_errors:
+        add_error("Repent", line, col, INVALID_ENTITY, msg)
+
+    # Tag validation with page numbers
+    if tree is not None:
+        with instrumentation.stage(file_id, "validate_tags") as probe:
+            tag_errors = validate_tags(
+                tree,
+                non_closing_tags=NON_CLOSING_TAGS,
+                position_map=position_map,
+                rules=rules
+            )
+            probe.errors = len(tag_errors)
+        for _, line, col, msg in tag_errors:
+            add_error("Reptag", line, col, TAG_RULE, msg + POST_RECOVERY_NOTE if post_recovery else msg)
+
+    return categorized_errors
+
+
+def _timed_validate_file(file_path, streaming_threshold=STREAMING_THRESHOLD_BYTES, cache=None,
+                         recover=False, instrumentation=None, file_id=None):
+    """
+    Validates one file and returns (file_id, errors, seconds, cached).
+    With a cache, unchanged files return their stored errors without parsing.
+    """
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+    file_id = file_id or os.path.basename(file_path)
+    start = time.perf_counter()
+    key = None
+    if cache is not None:
+        with instrumentation.stage(file_id, "cache_lookup") as probe:
+            # Streamed files may recover differently from in-memory ones
+            variant = "stream" if _uses_streaming(file_path, streaming_threshold) else ""
+            if recover:
+                variant += "recover"
+            key = cache.key_for_file(file_path, variant=variant)
+            errors = cache.get(key)
+            if errors is not None:
+                probe.errors = len(errors)
+        if errors is not None:
+            # The entry may have been stored for a copy of the file elsewhere
+            for error in errors:
+                error.file_id = file_id
+            return file_id, errors, time.perf_counter() - start, True
+
+    errors = validate_file(file_path, streaming_threshold, recover, instrumentation, file_id)
+    if cache is not None:
+        cache.put(key, errors)
+    return file_id, errors, time.perf_counter() - start, False
+
+
+def _worker_validate_file(task, instrument=False, trace_memory=False, **options):
+    """
+    Pool task on a (file_path, file_id) pair: _timed_validate_file plus the
+    stage records made in the worker, returned as
+    (file_id, errors, seconds, cached, records).
+    """
+    file_path, file_id = task
+    instrumentation = Instrumentation(trace_memory) if instrument else None
+    result = _timed_validate_file(file_path, instrumentation=instrumentation, file_id=file_id, **options)
+    return result + (instrumentation.records if instrument else [],)
+
+
+def list_folder_files(folder_path):
+    """Returns the .FNT/.XML files of folder_path, sorted by name."""
+    return [
+        os.path.join(folder_path, f)
+        for f in sorted(os.listdir(folder_path))
+        if f.lower().endswith(VALIDATED_EXTENSIONS)
+    ]
+
+
+def validate_all_files(folder_path, workers=1, chunksize=4, timings=None,
+                       streaming_threshold=STREAMING_THRESHOLD_BYTES, cache=None, recover=False,
+                       instrumentation=None, sink=None, verbose=True):
+    """
+    Validates every .FNT/.XML file in folder_path; see validate_files.
+    Returns: sink.result(); for the default ListSink, {filename: [errors]}
+    sorted by filename
+    """
+    return validate_files(list_folder_files(folder_path), workers, chunksize, timings,
+                          streaming_threshold, cache, recover, instrumentation, sink, verbose)
+
+
+def validate_files(file_paths, workers=1, chunksize=4, timings=None,
+                   streaming_threshold=STREAMING_THRESHOLD_BYTES, cache=None, recover=False,
+                   instrumentation=None, sink=None, verbose=True, ids=None):
+    """
+    Validates the given files.
+    - workers: process count (None = all cores, 1 = serial, in-process)
+    - chunksize: files handed to a worker per dispatch
+    - timings: optional dict filled with per-file wall time in seconds
+    - streaming_threshold: file size (bytes) from which streaming mode is used
+    - cache: optional result_cache.ValidationCache; None bypasses caching
+    - recover: report every syntax error and keep checking (see validate_file)
+    - instrumentation: optional Instrumentation; worker records are merged into it
+    - sink: optional errors.ErrorSink receiving each file's errors as soon as
+      the file is done; defaults to a ListSink
+    - verbose: print a progress line per file
+    - ids: the file_id of each file; defaults to errors.file_ids(file_paths),
+      the paths relative to the files' common folder
+    Returns: sink.result()
+    """
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+    sink = sink if sink is not None else ListSink()
+    file_paths = list(file_paths)
+    ids = list(ids) if ids is not None else file_ids(file_paths)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(file_paths))
+
+    if workers <= 1:
+        for file_path, file_id in zip(file_paths, ids):
+            if verbose:
+                print(f"\n🔍 Scanning: {file_id}")
+            filename, errors, elapsed, cached = _timed_validate_file(
+                file_path, streaming_threshold, cache, recover, instrumentation, file_id
+            )
+            emit_file(sink, filename, errors)
+            if timings is not None:
+                timings[filename] = elapsed
+            if verbose:
+                print(f"   ⏱ {elapsed:.3f}s{' (cached)' if cached else ''}")
+    else:
+        # Imported here: serial runs and worker start-up do not need it
+        import multiprocessing
+        # Results arrive in completion order; ListSink.result() re-sorts them.
+        # Workers get the config and entity tables from here, not from disk.
+        with multiprocessing.Pool(processes=workers, initializer=install_snapshot,
+                                  initargs=(snapshot_payload(CONFIG_SNAPSHOT),)) as pool:
+            task = functools.partial(
+                _worker_validate_file,
+                instrument=instrumentation.enabled,
+                trace_memory=instrumentation.trace_memory,
+                streaming_threshold=streaming_threshold, cache=cache, recover=recover
+            )
+            for filename, errors, elapsed, cached, records in pool.imap_unordered(
+                task, zip(file_paths, ids), chunksize=max(1, chunksize)
+            ):
+                instrumentation.extend(records)
+                if verbose:
+                    print(f"🔍 Scanned: {filename} ({len(errors)} issues, {elapsed:.3f}s"
+                          f"{', cached' if cached else ''})")
+                emit_file(sink, filename, errors)
+                if timings is not None:
+                    timings[filename] = elapsed
+
+    if cache is not None:
+        cache.evict()
+
+    sink.close()
+    return sink.result()
 
 
 if __name__ == "__main__":
-    folder = r"C:\Users\nbs\OneDrive\Desktop\UnifiedXMLvalidator\Samples"
-    results = validate_all_files(folder)
-    print_error_report(results)
\ No newline at end of file
+    import sys
+    from cli import main
+    sys.exit(main())
\ No newline at end of file
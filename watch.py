@@ -0,0 +1,182 @@
+import argparse
+import os
+import time
+from collections import Counter
+from validator import validate_file, print_error_report
+from file_loader import load_file
+from line_index import LineIndex
+from errors import ValidationError, ENCODING
+from config import STREAMING_THRESHOLD_BYTES, VALIDATED_EXTENSIONS
+
+try:
+    # Optional: block on filesystem events instead of sleeping between polls
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+
+def diff_errors(old_errors, new_errors):
+    """Returns (added, resolved) error lists between two validations of a file."""
+    old_counts = Counter(e.key() for e in old_errors)
+    new_counts = Counter(e.key() for e in new_errors)
+    added_keys = new_counts - old_counts
+    resolved_keys = old_counts - new_counts
+
+    added = []
+    for error in new_errors:
+        key = error.key()
+        if added_keys[key] > 0:
+            added_keys[key] -= 1
+            added.append(error)
+    resolved = []
+    for error in old_errors:
+        key = error.key()
+        if resolved_keys[key] > 0:
+            resolved_keys[key] -= 1
+            resolved.append(error)
+    return added, resolved
+
+
+class FolderWatcher:
+    """
+    Keeps the latest results for every .FNT/.XML file of a folder in memory
+    and revalidates only files whose mtime or size changed since the last scan.
+    With incremental=True each file keeps a page_validator.IncrementalValidator,
+    so a save re-checks only the pages that changed (recover-mode results;
+    a document the page lexer cannot settle is revalidated whole).
+    """
+
+    def __init__(self, folder_path, streaming_threshold=STREAMING_THRESHOLD_BYTES, incremental=False):
+        self.folder_path = folder_path
+        self.streaming_threshold = streaming_threshold
+        self.incremental = incremental
+        self.snapshot = {}  # filename -> (mtime_ns, size)
+        self.results = {}   # filename -> errors
+        self.page_validators = {}  # filename -> IncrementalValidator
+
+    def _validate(self, filename):
+        file_path = os.path.join(self.folder_path, filename)
+        if not self.incremental:
+            return validate_file(file_path, self.streaming_threshold)
+        from page_validator import IncrementalValidator
+        with load_file(file_path) as loaded:
+            content = loaded.text
+            decode_errors = loaded.decode_errors
+        page_validator = self.page_validators.get(filename)
+        if page_validator is None:
+            page_validator = self.page_validators[filename] = IncrementalValidator(filename)
+        errors = page_validator.validate(content)
+        if decode_errors:
+            # Reported first, as validate_file does
+            line_index = LineIndex(content)
+            errors = [
+                ValidationError(category, filename, line, column, line_index.page_for_line(line),
+                                ENCODING, message, source=line_index)
+                for category, line, column, message in decode_errors
+            ] + errors
+        return errors
+
+    def _stat_folder(self):
+        current = {}
+        with os.scandir(self.folder_path) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(VALIDATED_EXTENSIONS):
+                    stat = entry.stat()
+                    current[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return current
+
+    def refresh(self):
+        """
+        Rescans the folder and revalidates changed files.
+        Returns {filename: (added, resolved)} for files whose errors changed;
+        deleted files report all their errors as resolved.
+        """
+        current = self._stat_folder()
+        delta = {}
+
+        for filename in sorted(current):
+            if self.snapshot.get(filename) == current[filename]:
+                continue
+            try:
+                errors = self._validate(filename)
+            except (OSError, UnicodeDecodeError):
+                # Mid-save: keep the previous stat so the next scan retries the file
+                previous = self.snapshot.get(filename)
+                if previous is None:
+                    del current[filename]
+                else:
+                    current[filename] = previous
+                continue
+            added, resolved = diff_errors(self.results.get(filename, []), errors)
+            # Kept between scans: resolve context so the document text can be freed
+            self.results[filename] = [error.resolve() for error in errors]
+            if added or resolved or filename not in self.snapshot:
+                delta[filename] = (added, resolved)
+
+        for filename in set(self.snapshot) - set(current):
+            delta[filename] = ([], self.results.pop(filename, []))
+            self.page_validators.pop(filename, None)
+
+        self.snapshot = current
+        return delta
+
+
+def print_delta_report(delta):
+    """Prints errors added/resolved per changed file."""
+    for filename, (added, resolved) in sorted(delta.items()):
+        print(f"\n🔄 {filename}: +{len(added)} new, -{len(resolved)} resolved")
+        for error in added:
+            print(f"  \033[91m+ [{error.category}] [Page {error.page}, Line {error.line}] "
+                  f"{error.message}\033[0m")
+        for error in resolved:
+            print(f"  \033[92m- [{error.category}] [Page {error.page}, Line {error.line}] "
+                  f"{error.message}\033[0m")
+
+
+def _wait_for_change(inotify, interval):
+    if inotify is not None:
+        # Returns early on a write; the timeout doubles as the polling fallback
+        inotify.read(timeout=int(interval * 1000), read_delay=20)
+    else:
+        time.sleep(interval)
+
+
+def watch_folder(folder_path, interval=0.5, on_delta=print_delta_report,
+                 streaming_threshold=STREAMING_THRESHOLD_BYTES, use_inotify=True, incremental=False):
+    """Validates folder_path once, then revalidates edited files until interrupted."""
+    watcher = FolderWatcher(folder_path, streaming_threshold, incremental)
+    watcher.refresh()
+    print_error_report(watcher.results)
+
+    inotify = None
+    if use_inotify and INotify is not None:
+        inotify = INotify()
+        inotify.add_watch(folder_path, inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO |
+                          inotify_flags.CREATE | inotify_flags.DELETE)
+    print(f"\n👀 Watching {folder_path} ({'inotify' if inotify else 'polling'}, Ctrl+C to stop)")
+
+    try:
+        while True:
+            _wait_for_change(inotify, interval)
+            start = time.perf_counter()
+            delta = watcher.refresh()
+            if delta:
+                on_delta(delta)
+                print(f"   ⏱ revalidated in {time.perf_counter() - start:.3f}s")
+    except KeyboardInterrupt:
+        print("\n👋 Watch stopped")
+    finally:
+        if inotify is not None:
+            inotify.close()
+    return watcher.results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Revalidate edited files as they are saved")
+    arg_parser.add_argument("folder")
+    arg_parser.add_argument("--interval", type=float, default=0.5, help="seconds between polls")
+    arg_parser.add_argument("--poll", action="store_true", help="never use inotify")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="re-check only the edited pages of a file")
+    args = arg_parser.parse_args()
+    watch_folder(args.folder, args.interval, use_inotify=not args.poll, incremental=args.incremental)